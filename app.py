@@ -83,6 +83,8 @@ if "final_parts" not in st.session_state:
     st.session_state.final_parts = {}  # school -> {"brut":int,"new":int,"maj":int,"uniques":int}
 if "final_emitted" not in st.session_state:
     st.session_state.final_emitted = set()  # schools déjà synthétisées
+if "progress_parts" not in st.session_state:
+    st.session_state.progress_parts = {}  # school -> (done, total) ; écoles en parallèle
 
 # ------------------------------ ECOLES ------------------------------
 ECOLES = ["TOUTES", "BRASSART", "CREAD", "EFAP", "EFJ", "ESEC", "ICART", "Ecole bleue"]
@@ -91,6 +93,10 @@ st.session_state.selected_school = st.selectbox(
     ECOLES,
     index=ECOLES.index(st.session_state.selected_school),
 )
+st.checkbox(
+    "Reprendre le scraping web interrompu (URLs déjà faites sautées)",
+    key="resume_web",
+)
 
 # ------------------------------ LOGS UI ------------------------------
 logs_box = st.container()
@@ -215,13 +221,16 @@ def append_log(msg: str):
     if st.session_state.last_norm_msg == norm:
         return
 
-    # ✅ Detect progress events: "PROGRESS i/n"
+    # ✅ Detect progress events: "PROGRESS i/n" ou "PROGRESS i/n ECOLE" (écoles en parallèle)
     if norm.startswith("PROGRESS "):
         try:
-            _, ratio = norm.split(" ", 1)
-            done, total = ratio.split("/")
-            done = int(done)
-            total = int(total)
+            parts = norm.split(" ", 2)
+            done, total = parts[1].split("/")
+            school = parts[2] if len(parts) > 2 else ""
+            st.session_state.progress_parts[school] = (int(done), int(total))
+            # avancement global = somme des URLs traitées / somme des URLs des écoles déjà démarrées
+            done = sum(d for d, _ in st.session_state.progress_parts.values())
+            total = sum(t for _, t in st.session_state.progress_parts.values())
             pct = int(done * 100 / total)
             if "progress_bar" in st.session_state and st.session_state.progress_bar:
                 st.session_state.progress_bar.progress(pct)
@@ -272,6 +281,7 @@ def _start_run(task: str, school: str):
         st.session_state.last_norm_msg = None
         st.session_state.last_key = None
         st.session_state.final_parts = {}
+        st.session_state.progress_parts = {}
         st.session_state.final_emitted = set()
 
         append_log(f"— RUN {_now_hms()} • {task.upper()} • {school} —")
@@ -286,7 +296,8 @@ def _start_run(task: str, school: str):
 
         try:
             if task == "web":
-                script_web.run(logger=logger, school_filter=school)
+                script_web.run(logger=logger, school_filter=school,
+                               resume=st.session_state.get("resume_web", False))
             elif task == "gmb":
                 gmb.run(logger=logger, school_filter=school)
             elif task == "summary":
@@ -0,0 +1,87 @@
+# bench_parsers.py
+# Compare les backends HTML (html.parser / lxml / selectolax) sur les pages enregistrées
+# - vérifie que chaque backend produit EXACTEMENT les mêmes avis que html.parser
+# - mesure le temps parse + extraction par page
+#
+# Usage (depuis la racine du repo) :
+#     python bench/bench_parsers.py [--repeat 50]
+
+import os
+import sys
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import script_web  # noqa: E402
+from html_backend import available_backends, parse_html  # noqa: E402
+
+FIXTURES_DIR = os.path.join(ROOT, "bench", "fixtures")
+
+# fichier -> (url d'origine simulée, extracteur)
+PAGES = {
+    "diplomeo.html": (
+        "https://diplomeo.com/avis-brassart_tours_l_ecole_des_metiers_de_la_creation-11679",
+        lambda soup, url: script_web.extract_reviews_diplomeo(
+            soup, url, *script_web.parse_etablissement_ville_diplomeo(url)
+        ),
+    ),
+    "capitainestudy.html": (
+        "https://www.capitainestudy.fr/ecoles-et-grandes-ecoles/cinema-audiovisuel/brassart-tours/",
+        lambda soup, url: script_web.extract_reviews_capstudy(soup, url),
+    ),
+    "custplace.html": (
+        "https://fr.custplace.com/ecole-brassart-tours-tours-10",
+        lambda soup, url: script_web.extract_reviews_cust(soup, url, *script_web.resolve_etab_ville(url)),
+    ),
+}
+
+
+def load_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def extract(backend, html, url, extractor):
+    return extractor(parse_html(html, backend), url)
+
+
+def bench_page(backend, html, url, extractor, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        extract(backend, html, url, extractor)
+    return (time.perf_counter() - start) / repeat
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark des backends HTML des extracteurs")
+    ap.add_argument("--repeat", type=int, default=30)
+    args = ap.parse_args(argv)
+
+    backends = available_backends()
+    print(f"Backends disponibles : {', '.join(backends)}\n")
+    print(f"{'page':<22}{'backend':<14}{'avis':>6}{'ms/page':>10}{'x ref':>8}  identique")
+
+    all_ok = True
+    for name, (url, extractor) in PAGES.items():
+        html = load_fixture(name)
+        reference = extract("html.parser", html, url, extractor)
+        ref_time = None
+        for backend in backends:
+            records = extract(backend, html, url, extractor)
+            same = records == reference
+            all_ok = all_ok and same
+            t = bench_page(backend, html, url, extractor, args.repeat)
+            ref_time = ref_time or t
+            print(f"{name:<22}{backend:<14}{len(records):>6}{t * 1000:>10.2f}{ref_time / t:>8.2f}  {'oui' if same else 'NON'}")
+
+    if not all_ok:
+        print("\n❌ Au moins un backend ne produit pas les mêmes avis que html.parser")
+        return 1
+    print("\n✅ Tous les backends produisent des avis identiques")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,282 @@
+# bench_suite.py
+# Benchmark hors-ligne des étapes coûteuses (aucun accès réseau, ni site ni Google) :
+# - parsing + extraction par plateforme (pages enregistrées dans bench/fixtures) : pages/s et avis/s
+# - map_gmb_review_to_row sur une réponse GMB enregistrée (bench/fixtures/gmb_reviews.json)
+# - index + diff de script_web (load de l'index existant puis diff_reviews) à 1k / 10k / 100k lignes,
+#   avec l'index en dicts et avec l'index compact de sheet_index (rechargé depuis son .npz et validé
+#   sur la fin de la colonne uid) ; `cells_read` = cellules à télécharger du sheet avant le diff
+# Les résultats sont écrits en JSON (--out) ; --compare affiche l'écart avec un rapport précédent.
+#
+# Usage (depuis la racine du repo) :
+#     python bench/bench_suite.py [--repeat 30] [--rows 1000,10000,100000] [--out bench/report.json]
+#     python bench/bench_suite.py --compare bench/report_avant.json
+
+import os
+import sys
+import json
+import time
+import random
+import tempfile
+import argparse
+import platform
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import gmb  # noqa: E402
+import script_web  # noqa: E402
+from sheet_index import (  # noqa: E402
+    SheetIndex, UidView, SoftView, column_state, column_token, tail_start, tail_token,
+)
+from html_backend import available_backends, parse_html  # noqa: E402
+from bench_parsers import PAGES, FIXTURES_DIR, load_fixture  # noqa: E402
+
+GMB_FIXTURE = "gmb_reviews.json"
+GMB_LOCATION = "accounts/116511838451568052671/locations/6606885751693815006"
+DEFAULT_ROWS = (1000, 10000, 100000)
+DEFAULT_OUT = os.path.join(ROOT, "bench", "report.json")
+
+
+def timed(fn, repeat):
+    """Durée moyenne (s) d'un appel à fn sur `repeat` exécutions."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+# ----------------------------------------------------------------
+# Parsing des pages
+# ----------------------------------------------------------------
+def bench_parsers(repeat, backends):
+    out = []
+    for name, (url, extractor) in PAGES.items():
+        html = load_fixture(name)
+        for backend in backends:
+            n_reviews = len(extractor(parse_html(html, backend), url))
+            t = timed(lambda: extractor(parse_html(html, backend), url), repeat)
+            out.append({
+                "page": name,
+                "backend": backend,
+                "reviews_per_page": n_reviews,
+                "seconds_per_page": t,
+                "pages_per_sec": 1 / t,
+                "reviews_per_sec": n_reviews / t,
+            })
+    return out
+
+
+# ----------------------------------------------------------------
+# Mapping GMB
+# ----------------------------------------------------------------
+def bench_gmb_mapping(repeat):
+    with open(os.path.join(FIXTURES_DIR, GMB_FIXTURE), "r", encoding="utf-8") as f:
+        reviews = json.load(f).get("reviews", [])
+    account_id, location_id = gmb.parse_resource_name(GMB_LOCATION)
+
+    def run():
+        for rv in reviews:
+            gmb.map_gmb_review_to_row(rv, "BRASSART", account_id, location_id, "Tours")
+
+    t = timed(run, repeat)
+    return {"reviews": len(reviews), "seconds_per_batch": t, "reviews_per_sec": len(reviews) / t}
+
+
+# ----------------------------------------------------------------
+# Index + diff (script_web)
+# ----------------------------------------------------------------
+class NullSpreadsheet:
+    """Classeur factice : absorbe les appels groupés de sheets_writer."""
+
+    id = "bench"
+
+    def values_batch_update(self, body):
+        return None
+
+    def batch_update(self, body):
+        return None
+
+
+class NullSheet:
+    """Onglet factice : absorbe les écritures de SheetWriter.flush()."""
+
+    title = "TEST"
+
+    def __init__(self):
+        self.spreadsheet = NullSpreadsheet()
+
+    def batch_update(self, data, **kwargs):
+        return None
+
+    def append_rows(self, rows, **kwargs):
+        return None
+
+
+def make_dataset(n_rows, seed=0):
+    """
+    -> (colonnes de l'onglet existant, avis scrapés).
+    Les avis scrapés reprennent toutes les lignes : ~90 % identiques (uid connu),
+    ~5 % retrouvés par clé souple avec une date modifiée, ~5 % nouveaux.
+    """
+    rnd = random.Random(seed)
+    sites = ("diplomeo", "capitainestudy", "custplace")
+    cols = {name: [] for name in script_web.INDEX_COLUMNS}
+    scraped = []
+    for i in range(n_rows):
+        site = sites[i % 3]
+        prenom = f"Prenom{i}"
+        texte = f"Avis numéro {i} : " + "très bonne école, bon accompagnement. " * rnd.randint(1, 6)
+        url = f"https://{site}.example/avis/{i // 20}"
+        date, annee = f"2024-{i % 12 + 1:02d}-01", "2024"
+        uid = script_web.compute_uid(site, url, prenom, texte)
+        for name, value in zip(script_web.INDEX_COLUMNS, (uid, site, prenom, texte, date, annee)):
+            cols[name].append(value)
+
+        r = {"uid": uid, "site": site, "prenom": prenom, "texte": texte, "date": date, "annee": annee, "url": url}
+        kind = rnd.random()
+        if kind < 0.05:    # même avis, date corrigée -> MAJ
+            r = dict(r, uid=r["uid"] + "-moved", date="2025-01-01", annee="2025")
+        elif kind < 0.10:  # nouvel avis
+            r = dict(r, uid=r["uid"] + "-new", prenom=prenom + "bis")
+        scraped.append(r)
+    return cols, scraped
+
+
+def _compact_index(cols, folder):
+    """Index compact enregistré au run précédent (construit et sauvegardé hors chrono)."""
+    rows = zip(cols["uid"], cols["site"], cols["prenom"], cols["texte"], cols["date"], cols["annee"])
+    entries = [
+        (i, uid, script_web.soft_key_from_values(site, prenom, texte), date, annee)
+        for i, (uid, site, prenom, texte, date, annee) in enumerate(rows, start=2)
+    ]
+    count, tail = column_state(cols["uid"])
+    SheetIndex.build("bench", entries, column_token(count, tail), folder, tail).save()
+
+
+def bench_index_diff(n_rows, per_url=20, compact=False):
+    cols, scraped = make_dataset(n_rows)
+    col_index = {name: i + 1 for i, name in enumerate(script_web.EXPECTED_HEADERS)}
+
+    with tempfile.TemporaryDirectory() as folder:
+        if compact:
+            _compact_index(cols, folder)
+        t0 = time.perf_counter()
+        if compact:
+            index = SheetIndex.load("bench", folder)
+            # validation : fin de la colonne uid (ce que load_sheet_index relit du sheet)
+            first = tail_start(index.count())
+            read = cols["uid"][first - 1:]
+            assert tail_token(first, read) == index.token
+            existing_uid, existing_soft = UidView(index), SoftView(index)
+            cells_read = len(read)
+        else:
+            existing_uid, existing_soft = script_web._index_from_columns(cols)
+            cells_read = n_rows * len(script_web.INDEX_COLUMNS)
+        t1 = time.perf_counter()
+
+    writer = script_web.SheetWriter(NullSheet(), col_index)
+    run_soft_seen = set()
+    found = new = updated = 0
+    for start in range(0, len(scraped), per_url):
+        f, n, u = script_web.diff_reviews(
+            scraped[start:start + per_url], existing_uid, existing_soft, run_soft_seen, writer
+        )
+        found, new, updated = found + f, new + n, updated + u
+    writer.flush()
+    t2 = time.perf_counter()
+
+    return {
+        "rows": n_rows,
+        "index": "compact" if compact else "dict",
+        "cells_read": cells_read,
+        "index_seconds": t1 - t0,
+        "diff_seconds": t2 - t1,
+        "total_seconds": t2 - t0,
+        "rows_per_sec": n_rows / (t2 - t0),
+        "new": new,
+        "updated": updated,
+    }
+
+
+# ----------------------------------------------------------------
+# Rapport
+# ----------------------------------------------------------------
+def _key(section, entry):
+    if section == "parsers":
+        return f"{entry['page']}/{entry['backend']}"
+    if section == "index_diff":
+        return f"{entry['rows']}/{entry.get('index', 'dict')}"
+    return section
+
+
+def compare(report, previous):
+    """Ratio de débit nouveau / ancien pour chaque mesure présente dans les deux rapports."""
+    metrics = {"parsers": "pages_per_sec", "gmb_mapping": "reviews_per_sec", "index_diff": "rows_per_sec"}
+    lines = []
+    for section, metric in metrics.items():
+        new_entries = report.get(section) or []
+        old_entries = previous.get(section) or []
+        if isinstance(new_entries, dict):
+            new_entries, old_entries = [new_entries], [old_entries] if old_entries else []
+        old = {_key(section, e): e for e in old_entries}
+        for e in new_entries:
+            k = _key(section, e)
+            if k in old and old[k].get(metric):
+                lines.append(f"{section:<12}{k:<34}{e[metric] / old[k][metric]:>8.2f}x")
+    return lines
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark hors-ligne : parsing, mapping GMB, index + diff")
+    ap.add_argument("--repeat", type=int, default=30)
+    ap.add_argument("--rows", default=",".join(str(n) for n in DEFAULT_ROWS),
+                    help="tailles d'onglet simulées pour l'index + diff (séparées par des virgules)")
+    ap.add_argument("--out", default=DEFAULT_OUT, help="rapport JSON")
+    ap.add_argument("--compare", help="rapport JSON précédent à comparer")
+    args = ap.parse_args(argv)
+
+    backends = available_backends()
+    rows = [int(n) for n in args.rows.split(",") if n.strip()]
+
+    report = {
+        "meta": {
+            "date": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "repeat": args.repeat,
+            "backends": backends,
+        },
+        "parsers": bench_parsers(args.repeat, backends),
+        "gmb_mapping": bench_gmb_mapping(args.repeat),
+        "index_diff": [bench_index_diff(n, compact=c) for n in rows for c in (False, True)],
+    }
+
+    print(f"{'page':<22}{'backend':<14}{'pages/s':>10}{'avis/s':>12}")
+    for e in report["parsers"]:
+        print(f"{e['page']:<22}{e['backend']:<14}{e['pages_per_sec']:>10.1f}{e['reviews_per_sec']:>12.0f}")
+    g = report["gmb_mapping"]
+    print(f"\nmap_gmb_review_to_row : {g['reviews_per_sec']:.0f} avis/s ({g['reviews']} avis)")
+    print(f"\n{'lignes':>8}{'index':>9}{'cellules lues':>15}{'index (s)':>12}{'diff (s)':>12}{'lignes/s':>12}")
+    for e in report["index_diff"]:
+        print(f"{e['rows']:>8}{e['index']:>9}{e['cells_read']:>15}{e['index_seconds']:>12.3f}"
+              f"{e['diff_seconds']:>12.3f}{e['rows_per_sec']:>12.0f}")
+
+    folder = os.path.dirname(args.out)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n📝 Rapport : {args.out}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        print("\nDébit par rapport au rapport précédent (>1 = plus rapide) :")
+        for line in compare(report, previous):
+            print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
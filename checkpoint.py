@@ -0,0 +1,84 @@
+# checkpoint.py
+# Point de reprise d'une collecte web : un fichier JSON par école (.cache/checkpoints/<école>.json)
+# - URLs terminées (toutes leurs pages diffées)
+# - écritures pas encore envoyées au sheet (MAJ + nouvelles lignes du SheetWriter ;
+#   en mode stock SQLite elles sont déjà dans le stock et ne sont pas recopiées ici)
+# Réécrit de façon atomique (fichier temporaire + os.replace) après chaque URL, après chaque
+# paquet envoyé et en cas d'erreur ; supprimé quand l'école se termine sans URL en erreur.
+# En mode reprise : les écritures en attente sont rejouées, puis les URLs terminées sautées.
+
+import os
+import re
+import json
+from datetime import datetime
+
+DEFAULT_CHECKPOINT_DIR = os.path.join(".cache", "checkpoints")
+
+
+def _file_name(ecole: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", ecole.strip()) or "ecole"
+
+
+class RunCheckpoint:
+    """État de reprise d'une école (voir l'en-tête du module)."""
+
+    def __init__(self, ecole, sheet_id, folder=DEFAULT_CHECKPOINT_DIR):
+        self.ecole = ecole
+        self.sheet_id = sheet_id
+        self.path = os.path.join(folder, _file_name(ecole) + ".json")
+        self.started = datetime.now().isoformat(timespec="seconds")
+        self.done_urls = []
+        self.pending = {}
+
+    @classmethod
+    def load(cls, ecole, sheet_id, folder=DEFAULT_CHECKPOINT_DIR):
+        """Point de reprise enregistré pour cette école (et ce sheet), ou None."""
+        cp = cls(ecole, sheet_id, folder)
+        try:
+            with open(cp.path, "r", encoding="utf-8") as f:
+                data = json.load(f) or {}
+        except (OSError, ValueError):
+            return None
+        if data.get("sheet_id") != sheet_id:
+            return None
+        cp.started = data.get("started") or cp.started
+        cp.done_urls = list(data.get("done_urls") or [])
+        cp.pending = data.get("pending") or {}
+        return cp
+
+    def is_done(self, url) -> bool:
+        return url in self.done_urls
+
+    def pending_count(self) -> int:
+        return sum(len(v) for v in self.pending.values())
+
+    def save(self, pending=None):
+        """Enregistre l'état (pending = écritures en attente du writer, si fourni)."""
+        if pending is not None:
+            self.pending = pending
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        data = {
+            "ecole": self.ecole,
+            "sheet_id": self.sheet_id,
+            "started": self.started,
+            "saved": datetime.now().isoformat(timespec="seconds"),
+            "done_urls": self.done_urls,
+            "pending": self.pending,
+        }
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def mark_done(self, url, pending=None):
+        if url not in self.done_urls:
+            self.done_urls.append(url)
+        self.save(pending)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
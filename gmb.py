@@ -16,15 +16,25 @@ Fichiers requis dans le dossier :
 
 import os
 import re
+import json
 import yaml
+import time
+import argparse
+import threading
 from datetime import datetime
 from dateutil import tz
 
 import gspread
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request, AuthorizedSession
 
+from review_store import open_store, ensure_fresh, sync_to_sheet
+from sheets_writer import configure_scheduler, get_scheduler
+import sheets_client
+
 # -------- CONFIG --------
 GMB_YAML_FILE = "gmb.yaml"
 CLIENT_SECRET_FILE = "client_secret.json"
@@ -36,6 +46,11 @@ SCOPE_GMB = ["https://www.googleapis.com/auth/business.manage"]
 BASE_URL_V4 = "https://mybusiness.googleapis.com/v4"
 BASE_URL_V1 = "https://mybusinessbusinessinformation.googleapis.com/v1"
 
+DEFAULT_FETCH_WORKERS = 1  # locations interrogées en parallèle (gmb.yaml -> fetch.workers)
+WATERMARK_FILE = os.path.join(".cache", "gmb_watermarks.json")  # dernier updateTime vu par location
+LOCATION_CACHE_FILE = os.path.join(".cache", "gmb_locations.json")  # ville par location_id
+DEFAULT_LOCATION_TTL_DAYS = 30
+
 EXPECTED_HEADERS = [
     "uid", "prenom", "note", "date", "annee", "formation", "texte",
     "url", "etablissement", "ville", "reponse_1", "reponse_2",
@@ -50,16 +65,9 @@ def _get_gspread_client():
     """
     - En mode Streamlit : utilise st.secrets["gcp_service_account"]
     - Sinon : lit un fichier service account local (via $GSPREAD_SA_JSON ou SERVICE_ACCOUNT_JSON)
+    Client partagé par tout le process (voir sheets_client).
     """
-    try:
-        import streamlit as st  # import local pour éviter la dépendance hors Streamlit
-        if "gcp_service_account" in st.secrets:
-            return gspread.service_account_from_dict(dict(st.secrets["gcp_service_account"]))
-    except Exception:
-        pass
-
-    cred_path = os.getenv("GSPREAD_SA_JSON", SERVICE_ACCOUNT_JSON)
-    return gspread.service_account(filename=cred_path)
+    return sheets_client.get_client(SERVICE_ACCOUNT_JSON)
 
 
 # ----------------------------------------------------------------
@@ -112,14 +120,19 @@ def ensure_headers(ws):
     except Exception:
         header = []
     if header != EXPECTED_HEADERS:
-        ws.update("A1", [EXPECTED_HEADERS])
+        scheduler = get_scheduler()
+        scheduler.update(ws, "A1", [EXPECTED_HEADERS])
+        scheduler.flush(ws.spreadsheet)
 
 
 # ---- YAML -------------------------------------------------------
-def load_gmb_yaml(path: str):
+def load_gmb_config(path: str) -> dict:
     with open(path, "r", encoding="utf-8") as f:
-        raw = yaml.safe_load(f) or {}
-    return (raw.get("gmb") or [])
+        return yaml.safe_load(f) or {}
+
+
+def load_gmb_yaml(path: str):
+    return (load_gmb_config(path).get("gmb") or [])
 
 
 # ----------------------------------------------------------------
@@ -179,10 +192,13 @@ def get_user_credentials() -> Credentials:
     return creds
 
 
-def build_session(creds: Credentials) -> AuthorizedSession:
+def build_session(creds: Credentials, pool_size: int = DEFAULT_FETCH_WORKERS) -> AuthorizedSession:
     s = AuthorizedSession(creds)
     # FR = empêche Google de renvoyer les avis traduits
     s.headers.update({"Accept-Language": "fr"})
+    # une connexion keep-alive par worker : la session est partagée entre threads
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(10, pool_size))
+    s.mount("https://", adapter)
     return s
 
 
@@ -191,11 +207,12 @@ def build_session(creds: Credentials) -> AuthorizedSession:
 # ----------------------------------------------------------------
 def get_sheet(sheet_id: str, tab_name: str = "TEST"):
     gc = _get_gspread_client()
-    sh = gc.open_by_key(sheet_id)
     try:
-        ws = sh.worksheet(tab_name)
+        ws = sheets_client.get_worksheet(sheet_id, tab_name, gc)
     except gspread.exceptions.WorksheetNotFound:
-        ws = sh.add_worksheet(title=tab_name, rows="100", cols="20")
+        sh = sheets_client.open_spreadsheet(sheet_id, gc)
+        ws = get_scheduler().execute(sh.add_worksheet, title=tab_name, rows="100", cols="20")
+        sheets_client.remember_worksheet(sheet_id, ws)
     ensure_headers(ws)
     return ws
 
@@ -210,23 +227,100 @@ def parse_resource_name(resource: str):
     return m.group(1), m.group(2)
 
 
-def list_reviews_for_location(session, account_id: str, location_id: str, page_size: int = 100):
+def list_reviews_for_location(session, account_id: str, location_id: str, page_size: int = 100, since=None):
+    """
+    Avis d'une location, page par page.
+    since = filigrane (updateTime ISO) : avis demandés du plus récent au plus ancien, et on
+    arrête de paginer dès qu'on passe sous le filigrane (les avis à la même date sont renvoyés,
+    le dédoublonnage par uid les écarte).
+    """
     name = f"accounts/{account_id}/locations/{location_id}"
+    since_dt = _parse_ts(since) if since else None
     page_token = None
     while True:
         params = {"pageSize": page_size}
+        if since_dt is not None:
+            params["orderBy"] = "updateTime desc"
         if page_token:
             params["pageToken"] = page_token
         resp = session.get(f"{BASE_URL_V4}/{name}/reviews", params=params)
         resp.raise_for_status()
         data = resp.json() or {}
         for r in data.get("reviews", []):
+            if since_dt is not None and _review_ts(r) < since_dt:
+                return
             yield r
         page_token = data.get("nextPageToken")
         if not page_token:
             break
 
 
+# ---- Filigranes (mode incrémental)
+def _parse_ts(value):
+    """Horodatage RFC 3339 de l'API ('2024-05-01T10:00:00.123Z') -> datetime (None si illisible)."""
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except Exception:
+        return None
+
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=tz.tzutc())
+
+
+def _review_ts(review: dict):
+    return _parse_ts(review.get("updateTime") or review.get("createTime")) or _EPOCH
+
+
+def latest_update(reviews, current=None):
+    """Plus récent updateTime parmi `reviews` (et `current`), au format de l'API."""
+    best, best_dt = current, _parse_ts(current) if current else None
+    for r in reviews:
+        value = r.get("updateTime") or r.get("createTime")
+        dt = _parse_ts(value)
+        if dt is not None and (best_dt is None or dt > best_dt):
+            best, best_dt = value, dt
+    return best
+
+
+def utc_now_ts() -> str:
+    """Heure courante au format des horodatages de l'API ('2024-05-01T10:00:00.123Z')."""
+    return datetime.now(tz.tzutc()).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def location_watermark(reviews, current=None, started=None):
+    """
+    Filigrane d'une location lue jusqu'au bout : plus récent updateTime, sinon `started` (début
+    de la lecture). Une location sans avis a donc aussi son filigrane : sans lui, batchGetReviews
+    relirait tout son compte à chaque run.
+    """
+    return latest_update(reviews, current) or started
+
+
+_WATERMARK_LOCK = threading.Lock()
+
+
+def load_watermarks() -> dict:
+    try:
+        with open(WATERMARK_FILE, "r", encoding="utf-8") as f:
+            return json.load(f) or {}
+    except Exception:
+        return {}
+
+
+def save_watermarks(updates: dict):
+    """Fusionne {location: updateTime} dans le fichier (à appeler seulement après écriture au sheet)."""
+    if not updates:
+        return
+    with _WATERMARK_LOCK:
+        state = load_watermarks()
+        state.update({k: v for k, v in updates.items() if v})
+        folder = os.path.dirname(WATERMARK_FILE)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(WATERMARK_FILE, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False, indent=2)
+
+
 # ---- Auto-ville
 def get_city_v1(session: AuthorizedSession, location_id: str) -> str:
     try:
@@ -276,6 +370,173 @@ def autodetect_city(session, account_id: str, location_id: str) -> str:
     return city
 
 
+def _city_from_v1(data: dict) -> str:
+    for key in ("storefrontAddress", "address"):
+        addr = data.get(key, {}) or {}
+        city = addr.get("locality") or addr.get("localityName") or addr.get("sublocality")
+        if city:
+            return clean(city)
+    return ""
+
+
+def list_account_cities(session, account_id: str, page_size: int = 100) -> dict:
+    """Toutes les locations d'un compte en un appel paginé (API v1) -> {location_id: ville}."""
+    out, page_token = {}, None
+    while True:
+        params = {"readMask": "name,storefrontAddress", "pageSize": page_size}
+        if page_token:
+            params["pageToken"] = page_token
+        r = session.get(f"{BASE_URL_V1}/accounts/{account_id}/locations", params=params)
+        if r.status_code != 200:
+            break
+        data = r.json() or {}
+        for loc in data.get("locations", []) or []:
+            location_id = str(loc.get("name", "")).rsplit("/", 1)[-1]
+            city = _city_from_v1(loc)
+            if location_id and city:
+                out[location_id] = city
+        page_token = data.get("nextPageToken")
+        if not page_token:
+            break
+    return out
+
+
+class LocationCache:
+    """
+    Ville des locations GMB, persistée sur disque avec un TTL (les villes ne changent presque jamais).
+    Remplie en bloc au démarrage (une liste v1 par compte), partagée par toutes les écoles ;
+    `python gmb.py --refresh-locations` force le rechargement.
+    """
+
+    def __init__(self, path=LOCATION_CACHE_FILE, ttl_days=DEFAULT_LOCATION_TTL_DAYS):
+        self.path = path
+        self.ttl = float(ttl_days) * 86400
+        self._lock = threading.Lock()
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f) or {}
+        except Exception:
+            self.entries = {}
+
+    def city(self, location_id: str) -> str:
+        with self._lock:
+            entry = self.entries.get(location_id) or {}
+        if time.time() - float(entry.get("fetched_at", 0)) >= self.ttl:
+            return ""
+        return entry.get("city", "")
+
+    def put(self, location_id: str, city: str):
+        if not city:
+            return
+        with self._lock:
+            self.entries[location_id] = {"city": city, "fetched_at": time.time()}
+
+    def fill(self, session, resources, force=False) -> int:
+        """Charge en bloc (par compte) les villes absentes ou périmées. -> nb de locations résolues."""
+        by_account = {}
+        for resource in resources:
+            try:
+                account_id, location_id = parse_resource_name(resource)
+            except Exception:
+                continue
+            if force or not self.city(location_id):
+                by_account.setdefault(account_id, set()).add(location_id)
+
+        resolved = 0
+        for account_id, wanted in by_account.items():
+            cities = list_account_cities(session, account_id)
+            for location_id, city in cities.items():
+                self.put(location_id, city)
+            resolved += len(wanted & set(cities))
+        self.save()
+        return resolved
+
+    def save(self):
+        with self._lock:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, ensure_ascii=False, indent=2)
+
+
+def _location_cache(cfg: dict) -> LocationCache:
+    conf = (cfg or {}).get("locations") or {}
+    return LocationCache(
+        path=conf.get("cache_path") or LOCATION_CACHE_FILE,
+        ttl_days=conf.get("ttl_days", DEFAULT_LOCATION_TTL_DAYS),
+    )
+
+
+def batch_get_reviews(session, account_id: str, location_ids, page_size: int = 50, since=None) -> dict:
+    """
+    accounts.locations.batchGetReviews : avis de plusieurs locations d'un même compte
+    dans un seul flux paginé -> {location_id: [avis]}. Lève une exception si l'appel échoue.
+    since = filigrane commun au groupe (le plus ancien) : même arrêt que list_reviews_for_location.
+    """
+    out = {str(l): [] for l in location_ids}
+    names = [f"accounts/{account_id}/locations/{l}" for l in out]
+    since_dt = _parse_ts(since) if since else None
+    page_token = None
+    while True:
+        body = {"locationNames": names, "pageSize": page_size, "ignoreRatingOnlyReviews": False}
+        if since_dt is not None:
+            body["orderBy"] = "updateTime desc"
+        if page_token:
+            body["pageToken"] = page_token
+        resp = session.post(f"{BASE_URL_V4}/accounts/{account_id}/locations:batchGetReviews", json=body)
+        resp.raise_for_status()
+        data = resp.json() or {}
+        for item in data.get("locationReviews", []) or []:
+            review = item.get("review") or {}
+            if since_dt is not None and _review_ts(review) < since_dt:
+                return out
+            location_id = str(item.get("name", "")).rsplit("/", 1)[-1]
+            if location_id in out:
+                out[location_id].append(review)
+        page_token = data.get("nextPageToken")
+        if not page_token:
+            break
+    return out
+
+
+def _resolve_city(session, account_id: str, location_id: str, ville: str = "", locations=None) -> str:
+    ville_used = ville or (locations.city(location_id) if locations else "")
+    if not ville_used:
+        ville_used = autodetect_city(session, account_id, location_id)
+        if locations:
+            locations.put(location_id, ville_used)
+    return ville_used
+
+
+def fetch_location(session, account_id: str, location_id: str, ville: str = "", since=None, locations=None):
+    """Partie réseau d'une location (exécutée dans un worker) -> (ville, avis bruts)."""
+    ville_used = _resolve_city(session, account_id, location_id, ville, locations)
+    reviews = list(list_reviews_for_location(session, account_id, location_id, since=since))
+    return ville_used, reviews
+
+
+def fetch_account(session, account_id: str, items, watermarks=None, locations=None) -> dict:
+    """
+    Partie réseau de plusieurs locations d'un compte via batchGetReviews (exécutée dans un worker).
+    items = [(resource, location_id, ville)] -> {resource: (ville, avis bruts)}
+    """
+    watermarks = watermarks or {}
+    marks = [watermarks.get(resource) for resource, _, _ in items]
+    # une location sans filigrane -> flux complet ; sinon on s'arrête au plus ancien filigrane
+    since = None if not all(marks) else min(marks, key=lambda m: _parse_ts(m) or _EPOCH)
+    by_location = batch_get_reviews(session, account_id, [loc for _, loc, _ in items], since=since)
+
+    out = {}
+    for resource, location_id, ville in items:
+        reviews = by_location.get(location_id, [])
+        own = _parse_ts(watermarks.get(resource)) if watermarks.get(resource) else None
+        if own is not None:
+            reviews = [r for r in reviews if _review_ts(r) >= own]
+        out[resource] = (_resolve_city(session, account_id, location_id, ville, locations), reviews)
+    return out
+
+
 # ---- Mapping Review → Row
 def map_gmb_review_to_row(review: dict, ecole_name: str, account_id: str, location_id: str, ville_val: str = ""):
     reviewer = review.get("reviewer", {}) or {}
@@ -336,7 +597,7 @@ def append_rows_no_duplicates(ws, rows_with_uid):
             existing.add(uid)
 
     if to_add:
-        ws.append_rows(to_add, value_input_option="RAW")
+        get_scheduler().append_rows(ws, to_add, value_input_option="RAW")
     return len(to_add)
 
 
@@ -369,23 +630,84 @@ def _row_to_values(row_dict):
     return [row_dict.get(k, "") for k in EXPECTED_HEADERS]
 
 
+def _incremental_enabled(cfg: dict) -> bool:
+    return bool(((cfg or {}).get("incremental") or {}).get("enabled", False))
+
+
+def _batch_enabled(cfg: dict) -> bool:
+    return bool(((cfg or {}).get("fetch") or {}).get("batch", False))
+
+
+def _fetch_workers(cfg: dict) -> int:
+    try:
+        return max(1, int(((cfg or {}).get("fetch") or {}).get("workers", DEFAULT_FETCH_WORKERS)))
+    except (TypeError, ValueError):
+        return DEFAULT_FETCH_WORKERS
+
+
 # ----------------------------------------------------------------
-def main(school_filter=None, logger=print):
-    gmb_entries = load_gmb_yaml(GMB_YAML_FILE)
+def _selected_entries(gmb_entries, school_filter=None):
+    filt = (school_filter or "").strip().lower()
+    use_filter = bool(filt and filt != "toutes")
+    return [
+        e for e in gmb_entries
+        if not use_filter or normalize_ecole((e.get("name", "") or "").strip()) == normalize_ecole(filt)
+    ]
+
+
+def refresh_locations(logger=print):
+    """Recharge le cache des villes pour toutes les locations de gmb.yaml (ignore le TTL)."""
+    cfg = load_gmb_config(GMB_YAML_FILE)
+    resources = [res for e in cfg.get("gmb") or [] for res, _ in _iter_locations_from_entry(e)]
+    session = build_session(get_user_credentials())
+    locations = _location_cache(cfg)
+    resolved = locations.fill(session, resources, force=True)
+    logger(f"📍 Villes GMB rechargées : {resolved}/{len(resources)} location(s)")
+
+
+def main(school_filter=None, logger=print, full_resync=False):
+    """full_resync=True : ignore les filigranes et relit tous les avis de chaque location."""
+    cfg = load_gmb_config(GMB_YAML_FILE)
+    gmb_entries = cfg.get("gmb") or []
     if not gmb_entries:
         logger("❌ Aucun bloc 'gmb' trouvé")
         return
 
+    workers = _fetch_workers(cfg)
     creds = get_user_credentials()
-    session = build_session(creds)
+    session = build_session(creds, pool_size=workers)
+    store = open_store(cfg)  # stock SQLite local (None si désactivé dans gmb.yaml)
+    configure_scheduler(cfg)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gmb")
+    watermarks = None if full_resync or not _incremental_enabled(cfg) else load_watermarks()
+
+    # villes : cache disque (TTL), complété en bloc pour les locations sans `ville` dans le YAML
+    locations = _location_cache(cfg)
+    missing = [res for e in _selected_entries(gmb_entries, school_filter)
+               for res, ville in _iter_locations_from_entry(e) if not ville]
+    if missing:
+        locations.fill(session, missing)
+    if watermarks is None:
+        logger("🔁 GMB : resynchronisation complète (filigranes ignorés)")
+    try:
+        _main_entries(gmb_entries, session, store, executor, school_filter, logger, watermarks, locations,
+                      batch=_batch_enabled(cfg))
+    finally:
+        locations.save()
+        executor.shutdown(wait=True, cancel_futures=True)
+        if store is not None:
+            store.close()
 
-    filt = (school_filter or "").strip().lower()
-    use_filter = bool(filt and filt != "toutes")
 
-    for entry in gmb_entries:
+def _main_entries(gmb_entries, session, store, executor, school_filter=None, logger=print,
+                  watermarks=None, locations=None, batch=True):
+    """
+    watermarks = {location: dernier updateTime écrit} (None = collecte complète).
+    locations  = LocationCache des villes (None = détection à chaque run).
+    batch      = locations d'un même compte lues ensemble via batchGetReviews.
+    """
+    for entry in _selected_entries(gmb_entries, school_filter):
         name = (entry.get("name", "") or "").strip()
-        if use_filter and normalize_ecole(name) != normalize_ecole(filt):
-            continue
 
         sheet_id = entry.get("sheet_id", "")
         locs = _iter_locations_from_entry(entry)
@@ -397,23 +719,64 @@ def main(school_filter=None, logger=print):
         ws = get_sheet(sheet_id, tab_name="TEST")
         ensure_headers(ws)
 
-        existing = _get_existing_uids(ws)
+        if store is not None:
+            ensure_fresh(store, sheet_id, ws, header=EXPECTED_HEADERS, logger=logger)
+            existing = store.uids(sheet_id)
+        else:
+            existing = _get_existing_uids(ws)
         total_found, total_new = 0, 0
         pending_rows = []  # tous les nouveaux à insérer à la fin
+        new_marks = {}     # filigranes à enregistrer une fois les lignes écrites
 
+        # 1) appels API en parallèle (workers bornés, session partagée) :
+        #    un batchGetReviews par compte ayant plusieurs locations, sinon une liste par location
+        parsed, by_account = [], {}
+        started = utc_now_ts()  # avant les appels : un avis publié pendant la lecture sera relu
         for resource, ville in locs:
             try:
                 account_id, location_id = parse_resource_name(resource)
             except Exception:
                 logger(f"❌ location invalide: {resource}")
                 continue
+            parsed.append((resource, account_id, location_id, ville))
+            by_account.setdefault(account_id, []).append((resource, location_id, ville))
+
+        def submit_single(resource, account_id, location_id, ville):
+            since = (watermarks or {}).get(resource)
+            return executor.submit(fetch_location, session, account_id, location_id, ville, since, locations)
+
+        batch_futs = {
+            account_id: executor.submit(fetch_account, session, account_id, items, watermarks, locations)
+            for account_id, items in by_account.items()
+            if batch and len(items) > 1
+        }
+        single_futs = {
+            resource: submit_single(resource, account_id, location_id, ville)
+            for resource, account_id, location_id, ville in parsed
+            if account_id not in batch_futs
+        }
+
+        def result_for(resource, account_id):
+            fut = batch_futs.get(account_id)
+            if fut is not None:
+                try:
+                    return fut.result()[resource]
+                except Exception as e:
+                    # batch indisponible -> lecture location par location pour ce compte
+                    logger(f"⚠️ batchGetReviews accounts/{account_id} en échec ({e}) → lecture par location")
+                    del batch_futs[account_id]
+                    for res, loc, ville in by_account[account_id]:
+                        single_futs[res] = submit_single(res, account_id, loc, ville)
+            return single_futs[resource].result()
+
+        # 2) fusion dans l'ordre du YAML, dédup contre `existing` dans ce thread uniquement
+        for resource, account_id, location_id, _ in parsed:
+            ville_used, reviews = result_for(resource, account_id)
+            new_marks[resource] = location_watermark(reviews, (watermarks or {}).get(resource), started)
 
-            ville_used = ville or autodetect_city(session, account_id, location_id)
-
-            # lister les avis pour CETTE location
             count_found = 0
             new_here = 0
-            for rev in list_reviews_for_location(session, account_id, location_id):
+            for rev in reviews:
                 row_list, uid = map_gmb_review_to_row(
                     rev, name, account_id, location_id, ville_val=ville_used
                 )
@@ -433,8 +796,14 @@ def main(school_filter=None, logger=print):
             logger(f"🏷️ {resource} ({ville_used or '—'}) → {count_found} avis | +{new_here} nouveaux")
 
         # push des nouveaux (toutes locations de l'école)
-        if pending_rows:
-            ws.append_rows(pending_rows, value_input_option="RAW")
+        if store is not None:
+            for row_list in pending_rows:
+                store.add_new(sheet_id, dict(zip(EXPECTED_HEADERS, row_list)))
+            sync_to_sheet(store, sheet_id, ws, {name: i + 1 for i, name in enumerate(EXPECTED_HEADERS)})
+        elif pending_rows:
+            get_scheduler().append_rows(ws, pending_rows, value_input_option="RAW")
+        # les filigranes n'avancent qu'après l'écriture : un run interrompu reprendra ces avis
+        save_watermarks(new_marks)
 
         # résumé par école
         logger(f"📊 {name} → total {total_found} avis | +{total_new} nouveaux")
@@ -443,11 +812,25 @@ def main(school_filter=None, logger=print):
 
 
 # ----------------------------------------------------------------
-def run(logger=print, school_filter=None):
+def run(logger=print, school_filter=None, full_resync=False):
     import builtins
     _old_print = builtins.print
     try:
         builtins.print = logger
-        main(school_filter=school_filter, logger=logger)
+        main(school_filter=school_filter, logger=logger, full_resync=full_resync)
     finally:
         builtins.print = _old_print
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Avis Google Business Profile -> Google Sheets")
+    ap.add_argument("--school", default=None, help="école à traiter (défaut : toutes)")
+    ap.add_argument("--full-resync", action="store_true",
+                    help="ignore les filigranes et relit tous les avis de chaque location")
+    ap.add_argument("--refresh-locations", action="store_true",
+                    help="recharge le cache des villes des locations puis quitte")
+    args = ap.parse_args()
+    if args.refresh_locations:
+        refresh_locations()
+    else:
+        run(school_filter=args.school, full_resync=args.full_resync)
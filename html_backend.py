@@ -0,0 +1,145 @@
+# html_backend.py
+# Backends de parsing HTML interchangeables pour les extracteurs de script_web
+# - "html.parser" : BeautifulSoup + parser pur Python (comportement historique)
+# - "lxml"        : BeautifulSoup + parser lxml (C), même arbre bs4
+# - "selectolax"  : moteur Lexbor (C), enveloppé pour exposer la petite API bs4
+#                   utilisée par les extracteurs (select, select_one, get_text, get,
+#                   find, find_parent)
+# lxml et selectolax sont optionnels : s'ils ne sont pas installés on retombe sur html.parser.
+
+from bs4 import BeautifulSoup
+
+BACKENDS = ("html.parser", "lxml", "selectolax")
+DEFAULT_BACKEND = "html.parser"
+
+# Chaînes ignorées par bs4.get_text() (Script / Stylesheet / TemplateString)
+_SKIPPED_TEXT_PARENTS = {"script", "style", "template"}
+
+
+def available_backends():
+    """Backends réellement utilisables dans cet environnement."""
+    out = ["html.parser"]
+    try:
+        import lxml  # noqa: F401
+        out.append("lxml")
+    except ImportError:
+        pass
+    try:
+        from selectolax.lexbor import LexborHTMLParser  # noqa: F401
+        out.append("selectolax")
+    except ImportError:
+        pass
+    return out
+
+
+def resolve_backend(name=None) -> str:
+    """Nom de backend demandé -> backend disponible (fallback html.parser)."""
+    name = (name or DEFAULT_BACKEND).strip().lower()
+    if name not in BACKENDS or name not in available_backends():
+        return DEFAULT_BACKEND
+    return name
+
+
+def parse_html(html: str, backend=None):
+    """Parse une page avec le backend choisi ; renvoie un nœud racine à l'API bs4."""
+    backend = resolve_backend(backend)
+    if backend == "selectolax":
+        from selectolax.lexbor import LexborHTMLParser
+        return LexborNode(LexborHTMLParser(html or "").root)
+    return BeautifulSoup(html or "", backend)
+
+
+# ----------------------------------------------------------------
+# Adaptateur selectolax -> API bs4
+# ----------------------------------------------------------------
+class LexborNode:
+    """Nœud selectolax exposant les méthodes bs4 dont ont besoin les extracteurs."""
+
+    __slots__ = ("node",)
+
+    def __init__(self, node):
+        self.node = node
+
+    @property
+    def name(self):
+        return self.node.tag
+
+    def _wrap_many(self, nodes):
+        # Lexbor inclut le nœud lui-même dans css() ; bs4.select() ne cherche que dans les descendants
+        me = self.node.mem_id
+        return [LexborNode(n) for n in nodes if n.mem_id != me]
+
+    def select(self, css):
+        return self._wrap_many(self.node.css(css))
+
+    def select_one(self, css):
+        first = self.node.css_first(css)
+        if first is None:
+            return None
+        if first.mem_id != self.node.mem_id:
+            return LexborNode(first)
+        found = self.select(css)
+        return found[0] if found else None
+
+    def _strings(self):
+        for n in self.node.traverse(include_text=True):
+            if n.tag != "-text":
+                continue
+            parent = n.parent
+            if parent is not None and parent.tag in _SKIPPED_TEXT_PARENTS:
+                continue
+            yield n.text_content or ""
+
+    def get_text(self, separator="", strip=False):
+        strings = self._strings()
+        if strip:
+            strings = (s.strip() for s in strings)
+            strings = (s for s in strings if s)
+        return separator.join(strings)
+
+    def get(self, attr, default=None):
+        attrs = self.node.attributes
+        if attr not in attrs:
+            return default
+        value = attrs[attr] or ""
+        if attr == "class":
+            return value.split()
+        return value
+
+    @property
+    def string(self):
+        """Équivalent de bs4 Tag.string : texte si le nœud n'a qu'un seul enfant (récursivement)."""
+        node = self.node
+        while True:
+            children = list(node.iter(include_text=True))
+            if len(children) != 1:
+                return None
+            child = children[0]
+            if child.tag == "-text":
+                return child.text_content
+            if child.tag == "-comment":
+                return None
+            node = child
+
+    def find(self, name, string=None):
+        for candidate in self.select(name):
+            if string is None:
+                return candidate
+            value = candidate.string
+            if callable(string) and string(value):
+                return candidate
+            if not callable(string) and value == string:
+                return candidate
+        return None
+
+    def find_parent(self, name, class_=None):
+        parent = self.node.parent
+        while parent is not None:
+            if parent.tag == name:
+                if class_ is None:
+                    return LexborNode(parent)
+                classes = (parent.attributes.get("class") or "").split()
+                if class_ in classes:
+                    return LexborNode(parent)
+            parent = parent.parent
+        return None
@@ -0,0 +1,170 @@
+# http_cache.py
+# Cache HTTP persistant (SQLite) pour les scrapers web
+# - stocke le corps + ETag / Last-Modified de chaque page
+# - renvoie des requêtes conditionnelles (If-None-Match / If-Modified-Since)
+# - sur 304 : on rend le corps en cache, sans retélécharger la page
+# - TTL optionnel par hôte : pendant ce délai la copie locale est servie sans requête
+# - éviction LRU quand la taille totale dépasse max_bytes
+# - les entrées servies sans requête ne passent pas par le limiteur de débit (fetch)
+
+import os
+import time
+import sqlite3
+import threading
+from urllib.parse import urlparse
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "http_cache.sqlite")
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+
+
+class CachedResponse:
+    """Réponse servie depuis le cache (mêmes attributs que requests.Response utilisés par les scrapers)."""
+
+    def __init__(self, url, text, headers=None):
+        self.url = url
+        self.text = text
+        self.headers = headers or {}
+        self.status_code = 200
+        self.from_cache = True
+
+    @property
+    def content(self):
+        return self.text.encode("utf-8")
+
+    def raise_for_status(self):
+        return None
+
+
+class ResponseCache:
+    """
+    Cache de réponses GET sur disque, partagé entre threads.
+    ttl_for(host) -> secondes pendant lesquelles une entrée est servie sans revalidation (0 = toujours revalider).
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES, ttl_for=None):
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        self.ttl_for = ttl_for or (lambda host: 0)
+        self.stats = {"fresh": 0, "revalidated": 0, "downloaded": 0}
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                body TEXT NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                stored_at REAL NOT NULL,
+                last_used REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+            """
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_used)")
+        self._db.commit()
+        self._total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    # ---- accès bas niveau -------------------------------------------
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _lookup(self, url):
+        with self._lock:
+            return self._db.execute(
+                "SELECT body, etag, last_modified, stored_at FROM responses WHERE url = ?", (url,)
+            ).fetchone()
+
+    def _touch(self, url, revalidated=False):
+        now = time.time()
+        with self._lock:
+            if revalidated:
+                self._db.execute(
+                    "UPDATE responses SET stored_at = ?, last_used = ? WHERE url = ?", (now, now, url)
+                )
+            else:
+                self._db.execute("UPDATE responses SET last_used = ? WHERE url = ?", (now, url))
+            self._db.commit()
+
+    def _store(self, url, body, etag, last_modified):
+        now = time.time()
+        size = len(body.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._db.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (url, body, etag, last_modified, stored_at, last_used, size) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, body, etag, last_modified, now, now, size),
+            )
+            self._total += size - (old[0] if old else 0)
+            self._evict_locked()
+            self._db.commit()
+
+    def _evict_locked(self):
+        """Supprime les entrées les moins récemment utilisées jusqu'à repasser sous max_bytes."""
+        while self._total > self.max_bytes:
+            rows = self._db.execute(
+                "SELECT url, size FROM responses ORDER BY last_used ASC LIMIT 50"
+            ).fetchall()
+            if not rows:
+                self._total = 0
+                break
+            for url, size in rows:
+                self._db.execute("DELETE FROM responses WHERE url = ?", (url,))
+                self._total -= size
+                if self._total <= self.max_bytes:
+                    break
+
+    # ---- API ------------------------------------------------------------
+    def get(self, session, url, timeout=20, fetch=None):
+        """
+        GET avec revalidation. Renvoie une requests.Response ou une CachedResponse.
+        fetch(session, url, timeout=, headers=) remplace session.get pour les requêtes réseau.
+        """
+        entry = self._lookup(url)
+        headers = {}
+        if entry:
+            body, etag, last_modified, stored_at = entry
+            ttl = self.ttl_for((urlparse(url).netloc or "").lower()) or 0
+            if ttl and time.time() - stored_at < float(ttl):
+                self._touch(url)
+                self._count("fresh")
+                return CachedResponse(url, body)
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        if fetch is None:
+            r = session.get(url, timeout=timeout, headers=headers or None)
+        else:
+            r = fetch(session, url, timeout=timeout, headers=headers or None)
+
+        if r.status_code == 304 and entry:
+            self._touch(url, revalidated=True)
+            self._count("revalidated")
+            return CachedResponse(url, entry[0], headers=r.headers)
+
+        self._count("downloaded")
+        if r.status_code == 200:
+            etag = r.headers.get("ETag")
+            last_modified = r.headers.get("Last-Modified")
+            ttl = self.ttl_for((urlparse(url).netloc or "").lower()) or 0
+            if etag or last_modified or ttl:
+                self._store(url, r.text, etag, last_modified)
+        return r
+
+    def summary(self) -> str:
+        st = self.stats
+        return f"{st['fresh']} frais, {st['revalidated']} revalidés (304), {st['downloaded']} téléchargés"
+
+    def close(self):
+        with self._lock:
+            self._db.close()
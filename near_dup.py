@@ -0,0 +1,263 @@
+# near_dup.py
+# Détection de quasi-doublons sur le texte des avis (MinHash + LSH)
+# - texte normalisé (minuscules, sans accents ni ponctuation) découpé en n-grammes de caractères
+# - signature MinHash de `num_perm` valeurs (NumPy) : la part de valeurs égales entre deux
+#   signatures estime la similarité de Jaccard des deux textes
+# - LSH par bandes : la signature est coupée en `bands` morceaux ; deux avis ne sont comparés que
+#   s'ils partagent au moins un morceau -> coût d'une recherche indépendant de l'historique
+# Rattrape ce que la clé souple (site, prenom, texte exacts) laisse passer : avis republié avec
+# une petite retouche, texte un peu tronqué, même avis sur Custplace et Diplomeo.
+# Réglages : section `scraping.near_dup` du YAML (enabled, threshold, action, num_perm).
+#
+# Rapport (lecture seule) :
+#     python near_dup.py --school BRASSART [--threshold 0.8]
+
+import re
+import argparse
+import unicodedata
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+DEFAULT_NEAR_DUP = {
+    "enabled": False,
+    "threshold": 0.8,   # similarité de Jaccard estimée à partir de laquelle deux textes sont "proches"
+    "action": "report",  # report : signalé dans les logs mais écrit | skip : pas écrit
+    "num_perm": 128,
+    "shingle": 5,       # taille des n-grammes de caractères
+    "min_chars": 30,    # textes plus courts ignorés (trop peu de contenu pour conclure)
+}
+
+_SHIFT = np.uint64(32)
+_SHINGLE_PRIME = np.uint64(4294967291)  # plus grand premier < 2^32
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_text(texte: str) -> str:
+    """Minuscules, accents retirés, tout ce qui n'est pas lettre/chiffre ASCII -> un espace."""
+    t = unicodedata.normalize("NFKD", (texte or "").lower()).encode("ascii", "ignore").decode("ascii")
+    return _NON_WORD_RE.sub(" ", t).strip()
+
+
+def shingle_hashes(t: str, k: int):
+    """Empreintes (uint64 < 2^32) des n-grammes de k caractères distincts d'un texte normalisé (ASCII)."""
+    codes = np.frombuffer(t.encode("ascii"), dtype=np.uint8).astype(np.uint64)
+    # n-gramme lu comme un nombre en base 257 (exact tant que 257^k * 255 < 2^64, soit k <= 7)
+    powers = np.uint64(257) ** np.arange(k - 1, -1, -1, dtype=np.uint64)
+    return np.unique((sliding_window_view(codes, k) @ powers) % _SHINGLE_PRIME)
+
+
+def lsh_params(threshold: float, num_perm: int):
+    """(bandes, lignes par bande) dont le seuil de collision (1/b)^(1/r) est le plus proche de `threshold`."""
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        gap = abs((1 / bands) ** (1 / rows) - threshold)
+        if best is None or gap < best[0]:
+            best = (gap, bands, rows)
+    return best[1], best[2]
+
+
+def near_dup_settings(cfg: dict) -> dict:
+    conf = ((cfg or {}).get("scraping") or {}).get("near_dup") or {}
+    out = {**DEFAULT_NEAR_DUP, **conf}
+    out["enabled"] = bool(out["enabled"])
+    out["threshold"] = min(1.0, max(0.0, float(out["threshold"])))
+    out["action"] = "skip" if str(out["action"]).strip().lower() == "skip" else "report"
+    return out
+
+
+class NearDupIndex:
+    """
+    Index MinHash/LSH des textes d'un onglet.
+    add(key, texte) indexe un avis (key = n° de ligne, uid…) ; query(texte) -> [(key, similarité)]
+    des avis indexés dont la similarité estimée atteint `threshold`, du plus proche au moins proche.
+    """
+
+    def __init__(self, threshold=DEFAULT_NEAR_DUP["threshold"], num_perm=DEFAULT_NEAR_DUP["num_perm"],
+                 shingle=DEFAULT_NEAR_DUP["shingle"], min_chars=DEFAULT_NEAR_DUP["min_chars"],
+                 action=DEFAULT_NEAR_DUP["action"], seed=1):
+        self.threshold = float(threshold)
+        self.action = action
+        self.num_perm = int(num_perm)
+        self.shingle = min(7, max(1, int(shingle)))
+        self.min_chars = int(min_chars)
+        self.seed = int(seed)
+        self.bands, self.rows = lsh_params(self.threshold, self.num_perm)
+
+        rng = np.random.RandomState(seed)
+        self._a = rng.randint(0, 1 << 63, size=self.num_perm, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+        self._b = rng.randint(0, 1 << 63, size=self.num_perm, dtype=np.uint64) * np.uint64(2)
+
+        self.keys = []
+        self._sigs = np.empty((64, self.num_perm), dtype=np.uint32)
+        self._buckets = [{} for _ in range(self.bands)]
+        self.flagged = []  # (avis, key, similarité) repérés par check()
+
+    @classmethod
+    def from_settings(cls, settings: dict):
+        return cls(settings["threshold"], settings["num_perm"], settings["shingle"], settings["min_chars"],
+                   settings["action"])
+
+    def __len__(self):
+        return len(self.keys)
+
+    # ---- signatures ---------------------------------------------------------
+    def signature(self, texte: str):
+        """Signature MinHash (uint32[num_perm]) du texte, ou None s'il est trop court."""
+        t = normalize_text(texte)
+        if len(t) < self.min_chars:
+            return None
+        hv = shingle_hashes(t, self.shingle)
+        # hachage multiply-shift : (a*x + b) mod 2^64, 32 bits de poids fort (a impair, b < 2^64)
+        phv = (np.outer(hv, self._a) + self._b) >> _SHIFT
+        return phv.min(axis=0).astype(np.uint32)
+
+    def _band_keys(self, sig):
+        r = self.rows
+        return [sig[i * r:(i + 1) * r].tobytes() for i in range(self.bands)]
+
+    # ---- index --------------------------------------------------------------
+    def add(self, key, texte: str, sig=None) -> bool:
+        sig = self.signature(texte) if sig is None else sig
+        if sig is None:
+            return False
+        n = len(self.keys)
+        if n == len(self._sigs):
+            self._sigs = np.concatenate([self._sigs, np.empty_like(self._sigs)])
+        self._sigs[n] = sig
+        self.keys.append(key)
+        for bucket, band in zip(self._buckets, self._band_keys(sig)):
+            bucket.setdefault(band, []).append(n)
+        return True
+
+    def query(self, texte: str, sig=None):
+        sig = self.signature(texte) if sig is None else sig
+        if sig is None:
+            return []
+        candidates = set()
+        for bucket, band in zip(self._buckets, self._band_keys(sig)):
+            candidates.update(bucket.get(band, ()))
+        if not candidates:
+            return []
+        ids = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        sims = (self._sigs[ids] == sig).mean(axis=1)
+        keep = sims >= self.threshold
+        order = np.argsort(-sims[keep], kind="stable")
+        return [(self.keys[i], float(s)) for i, s in zip(ids[keep][order], sims[keep][order])]
+
+    def check(self, review: dict, key=None):
+        """
+        Avis entrant : plus proche avis déjà indexé (key, similarité) ou None.
+        L'avis est ensuite indexé sous `key` (uid par défaut) ; les quasi-doublons sont notés dans `flagged`.
+        """
+        sig = self.signature(review.get("texte", ""))
+        if sig is None:
+            return None
+        matches = self.query("", sig=sig)
+        self.add(key if key is not None else review.get("uid"), "", sig=sig)
+        if not matches:
+            return None
+        self.flagged.append((review, matches[0][0], matches[0][1]))
+        return matches[0]
+
+    def pop_flagged(self):
+        out, self.flagged = self.flagged, []
+        return out
+
+    # ---- persistance (sheet_index) -------------------------------------------
+    def params(self):
+        """Réglages dont dépendent les signatures (des signatures enregistrées ne valent que pour eux)."""
+        return (self.threshold, float(self.num_perm), float(self.shingle), float(self.min_chars), float(self.seed))
+
+    def export(self, key_of=None):
+        """
+        -> (signatures, n° de ligne) des avis indexés sous un n° de ligne ; key_of(clé) donne
+        la ligne des autres (uid d'un avis ajouté pendant le run), None = non exporté.
+        """
+        ids, rows = [], []
+        for i, key in enumerate(self.keys):
+            if not isinstance(key, (int, np.integer)):
+                key = key_of(key) if key_of else None
+            if key is None or key <= 0:
+                continue
+            ids.append(i)
+            rows.append(int(key))
+        return self._sigs[ids], np.asarray(rows, dtype=np.int64)
+
+    def restore(self, sigs, rows):
+        """Réindexe des signatures exportées (clé = n° de ligne)."""
+        for sig, row in zip(sigs, rows):
+            self.add(int(row), "", sig=sig)
+
+
+# ----------------------------------------------------------------
+# Rapport
+# ----------------------------------------------------------------
+def find_pairs(texts, index):
+    """texts = [(key, texte)] dans l'ordre du sheet -> [(key, key plus ancienne, similarité)]."""
+    pairs = []
+    for key, texte in texts:
+        sig = index.signature(texte)
+        if sig is None:
+            continue
+        matches = index.query("", sig=sig)
+        if matches:
+            pairs.append((key, matches[0][0], matches[0][1]))
+        index.add(key, "", sig=sig)
+    return pairs
+
+
+def report(sheet_id, settings, limit=50):
+    import sheets_client
+
+    ws = sheets_client.get_worksheet(sheet_id, "TEST")
+    header = ws.row_values(1)
+    cols = sheets_client.read_columns(ws, header, ("site", "prenom", "texte"))
+    if cols is None:
+        records = ws.get_all_records()
+        cols = {c: [str(r.get(c, "")) for r in records] for c in ("site", "prenom", "texte")}
+    rows = list(zip(cols["site"], cols["prenom"], cols["texte"]))
+
+    index = NearDupIndex.from_settings(settings)
+    pairs = find_pairs([(i, texte) for i, (_, _, texte) in enumerate(rows, start=2)], index)
+
+    print(f"🔎 {len(rows)} avis, {len(pairs)} quasi-doublon(s) (seuil {settings['threshold']:.0%})")
+    for row, first, sim in pairs[:limit]:
+        for rownum in (row, first):
+            site, prenom, texte = rows[rownum - 2]
+            texte = " ".join(texte.split())
+            texte = texte if len(texte) <= 70 else texte[:70] + "…"
+            prefix = f"  ≈ {sim:.0%}  ligne {rownum:>5}" if rownum == row else f"{'':9}ligne {rownum:>5}"
+            print(f"{prefix} | {site} | {prenom} | « {texte} »")
+    if len(pairs) > limit:
+        print(f"  … et {len(pairs) - limit} autre(s)")
+    return pairs
+
+
+def main(argv=None):
+    from script_web import _load_yaml, _select_ecoles
+
+    ap = argparse.ArgumentParser(description="Rapport des quasi-doublons de texte (MinHash/LSH)")
+    ap.add_argument("--school", default=None, help="école à analyser (défaut : toutes)")
+    ap.add_argument("--threshold", type=float, default=None, help="seuil de similarité (0-1)")
+    ap.add_argument("--limit", type=int, default=50, help="paires affichées par école")
+    args = ap.parse_args(argv)
+
+    cfg = _load_yaml()
+    settings = near_dup_settings(cfg)
+    if args.threshold is not None:
+        settings["threshold"] = min(1.0, max(0.0, args.threshold))
+    ecoles = cfg["ecoles"]
+    for ecole in _select_ecoles(ecoles, school_filter=args.school):
+        sheet_id = ((ecoles[ecole] or {}).get("sheet_id") or "").strip()
+        if not sheet_id:
+            continue
+        print(f"\n➡️  {ecole}")
+        report(sheet_id, settings, args.limit)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,19 +2,29 @@
 # Déduplication dans l'onglet TEST
 # Clé: (site, prenom, texte) -> on garde la 1re occurrence
 # - Met à jour date/année sur la 1re occurrence si un doublon apporte une valeur différente/non vide
-# - Supprime les doublons en BATCH (groupes contigus) pour éviter le quota 429
+# - Supprime les doublons en BATCH (groupes contigus) ; MAJ + suppressions passent par
+#   sheets_writer (appels fusionnés, quota suivi localement, backoff sur 429)
+# - --compact : table dédoublonnée calculée localement puis réécrite d'un bloc
+#   (sauvegarde de l'onglet, valeurs brutes et formules réécrites, une suppression des lignes de fin ;
+#   annulé si l'onglet a changé depuis la lecture)
+# - --dry-run : affiche les doublons / MAJ trouvés sans rien écrire
 
-import os, yaml, re, time
-import gspread
-from gspread.exceptions import APIError
+import os, yaml, re
+import argparse
+from datetime import datetime
 from gspread.utils import rowcol_to_a1
 
+from review_store import open_store
+from sheet_index import SheetIndex
+from sheets_writer import configure_scheduler, get_scheduler
+import sheets_client
+
 CREDENTIALS_FILE = "service_account.json"
 YAML_FILES = ["ecole.yaml", "ecoles.yaml"]
 
 # ------------ Utils ------------
 def clean(t):
-    return re.sub(r"\s+"," ", (t or "")).strip()
+    return re.sub(r"\s+"," ", str(t or "")).strip()
 
 def detect_site(url: str) -> str:
     u = (url or "").lower()
@@ -36,42 +46,20 @@ def load_yaml():
                 return yaml.safe_load(f)
     raise FileNotFoundError("Aucun YAML (ecole.yaml / ecoles.yaml)")
 
-def chunked(iterable, n):
-    buf = []
-    for x in iterable:
-        buf.append(x)
-        if len(buf) == n:
-            yield buf
-            buf = []
-    if buf: 
-        yield buf
-
-def retry_batch_update(sh, body, max_retries=3, wait_seconds=65):
-    """Appelle Spreadsheet.batch_update avec retry simple si 429."""
-    for attempt in range(1, max_retries+1):
-        try:
-            return sh.batch_update(body)
-        except APIError as e:
-            if "429" in str(e):
-                if attempt == max_retries:
-                    raise
-                time.sleep(wait_seconds)
-            else:
-                raise
-
 # ------------ Core ------------
-def dedupe_sheet(sheet_id):
-    gc = gspread.service_account(filename=CREDENTIALS_FILE)
-    ws = gc.open_by_key(sheet_id).worksheet("TEST")
-    sh = ws.spreadsheet  # pour batch_update (deleteDimension)
+def _cell_text(value) -> str:
+    return "" if value is None else str(value)
 
-    rows = ws.get_all_values()
-    if not rows:
-        print("Feuille vide.")
-        return
 
-    header = rows[0]
-    data   = rows[1:]
+def plan_dedupe(header, data):
+    """
+    Analyse les lignes (sans l'entête) -> dict :
+      kept       : lignes conservées, date/année de la 1re occurrence déjà corrigées
+      to_delete  : numéros de ligne des doublons (2-based)
+      duplicates : [(ligne du doublon, ligne conservée)]
+      updates    : MAJ de cellules {range, values} sur les lignes conservées
+      changes    : [(ligne, colonne, ancienne valeur, nouvelle valeur)]
+    """
     idx = {name: i for i, name in enumerate(header)}
 
     # Colonnes nécessaires
@@ -84,22 +72,27 @@ def dedupe_sheet(sheet_id):
     has_date  = "date"  in idx
     has_annee = "annee" in idx
 
-    seen = {}          # sk -> {"row": rownum, "date":..., "annee":...}
+    seen = {}          # sk -> {"row": rownum, "date":..., "annee":..., "values": ligne conservée}
+    kept = []          # lignes conservées, dans l'ordre
     to_delete = []     # row numbers (2-based)
+    duplicates = []    # (doublon, 1re occurrence)
     updates   = []     # simple cell updates (dates/annees)
-    updated_count = 0
+    changes   = []
 
     # Parcours des lignes
     for i, row in enumerate(data, start=2):  # 2..N (1 = header)
-        url   = row[idx["url"]]
-        site  = row[idx["site"]] if has_site else ""
+        row = list(row) + [""] * (len(header) - len(row))
+        # rendu FORMULA : nombres et booléens arrivent tels quels, les clés travaillent sur du texte
+        url   = _cell_text(row[idx["url"]])
+        site  = _cell_text(row[idx["site"]]) if has_site else ""
         if not site:
             site = detect_site(url)
 
-        prenom = row[idx["prenom"]]
-        texte  = row[idx["texte"]]
+        prenom = _cell_text(row[idx["prenom"]])
+        texte  = _cell_text(row[idx["texte"]])
         sk = soft_key(site, prenom, texte)
         if not sk.strip():
+            kept.append(row)
             continue
 
         date_val  = row[idx["date"]]  if has_date  else ""
@@ -110,35 +103,84 @@ def dedupe_sheet(sheet_id):
             first = seen[sk]
             tgt_row = first["row"]
 
-            if has_date:
-                old_date = first.get("date","") or ""
-                new_date = date_val or ""
-                if new_date and new_date != old_date:
+            for col, has_col, new_val in (("date", has_date, date_val), ("annee", has_annee, annee_val)):
+                if not has_col:
+                    continue
+                old_val = first.get(col,"") or ""
+                new_val = new_val or ""
+                if new_val and new_val != old_val:
                     updates.append({
-                        "range": rowcol_to_a1(tgt_row, idx["date"]+1),
-                        "values": [[new_date]],
+                        "range": rowcol_to_a1(tgt_row, idx[col]+1),
+                        "values": [[new_val]],
                     })
-                    first["date"] = new_date
-                    updated_count += 1
-
-            if has_annee:
-                old_annee = first.get("annee","") or ""
-                new_annee = annee_val or ""
-                if new_annee and new_annee != old_annee:
-                    updates.append({
-                        "range": rowcol_to_a1(tgt_row, idx["annee"]+1),
-                        "values": [[new_annee]],
-                    })
-                    first["annee"] = new_annee
-                    updated_count += 1
+                    changes.append((tgt_row, col, old_val, new_val))
+                    first[col] = new_val
+                    first["values"][idx[col]] = new_val
 
             to_delete.append(i)
+            duplicates.append((i, tgt_row))
         else:
-            seen[sk] = {"row": i, "date": date_val, "annee": annee_val}
+            seen[sk] = {"row": i, "date": date_val, "annee": annee_val, "values": row}
+            kept.append(row)
+
+    return {
+        "kept": kept,
+        "to_delete": to_delete,
+        "duplicates": duplicates,
+        "updates": updates,
+        "changes": changes,
+    }
+
+def print_plan(header, data, plan, limit=20):
+    """Simulation : ce que le nettoyage changerait, sans rien écrire."""
+    idx = {name: i for i, name in enumerate(header)}
+
+    def describe(rownum):
+        row = data[rownum - 2]
+        get = lambda col: row[idx[col]] if col in idx and idx[col] < len(row) else ""
+        texte = clean(get("texte"))
+        texte = texte if len(texte) <= 50 else texte[:50] + "…"
+        return f"{get('site') or detect_site(get('url'))} | {get('prenom')} | « {texte} »"
+
+    print(
+        f"🔎 Simulation : {len(data)} → {len(plan['kept'])} ligne(s) "
+        f"(-{len(plan['to_delete'])} doublon(s)), {len(plan['changes'])} valeur(s) date/année mise(s) à jour"
+    )
+    for dup, first in plan["duplicates"][:limit]:
+        print(f"  - ligne {dup} ({describe(dup)}) = doublon de la ligne {first}")
+    if len(plan["duplicates"]) > limit:
+        print(f"  … et {len(plan['duplicates']) - limit} autre(s) doublon(s)")
+    for rownum, col, old, new in plan["changes"][:limit]:
+        print(f"  ~ ligne {rownum} {col} : {old!r} → {new!r}")
+    if len(plan["changes"]) > limit:
+        print(f"  … et {len(plan['changes']) - limit} autre(s) MAJ")
+
+def dedupe_sheet(sheet_id, dry_run=False):
+    gc = sheets_client.get_client(CREDENTIALS_FILE, use_streamlit=False)
+    ws = sheets_client.get_worksheet(sheet_id, "TEST", gc)
+    sh = ws.spreadsheet  # pour batch_update (deleteDimension)
+
+    rows = ws.get_all_values()
+    if not rows:
+        print("Feuille vide.")
+        return
+
+    header = rows[0]
+    data   = rows[1:]
+    plan = plan_dedupe(header, data)
+    if dry_run:
+        print_plan(header, data, plan)
+        return
+
+    to_delete = plan["to_delete"]
+    updates = plan["updates"]
+    updated_count = len(plan["changes"])
+
+    scheduler = get_scheduler()
 
     # 1) Appliquer d'abord les MAJ (dates/années) — petit volume
     if updates:
-        ws.batch_update(updates)
+        scheduler.batch_update(ws, updates)
 
     # 2) Supprimer les doublons en BATCH, par plages contiguës
     if not to_delete:
@@ -174,30 +216,154 @@ def dedupe_sheet(sheet_id):
                 }
             })
 
-        # Pour éviter 429: on découpe en paquets (ex: 50 requêtes/paquet)
+        # mises en file après les MAJ : envoyées ensemble au flush (quota / 429 gérés par sheets_writer)
+        scheduler.requests(sh, requests)
         total_deleted = 0
-        for req_chunk in chunked(requests, 50):
-            retry_batch_update(sh, {"requests": req_chunk})
-            # somme des lignes supprimées dans ce chunk
-            for req in req_chunk:
-                start_i = req["deleteDimension"]["range"]["startIndex"]
-                end_i   = req["deleteDimension"]["range"]["endIndex"]
-                total_deleted += (end_i - start_i)
+        for req in requests:
+            start_i = req["deleteDimension"]["range"]["startIndex"]
+            end_i   = req["deleteDimension"]["range"]["endIndex"]
+            total_deleted += (end_i - start_i)
 
+    # MAJ puis suppressions : un values.batchUpdate + un spreadsheets.batchUpdate
+    scheduler.flush(sh)
+    if to_delete:
         print(f"🧹 {total_deleted} ligne(s) supprimée(s) (doublons).")
 
     if updated_count:
         print(f"♻️ {updated_count} valeur(s) mise(s) à jour (date/année).")
 
-def main():
+def _key_column(header, rows):
+    """Colonne uid (ou la 1re) telle que lue, sans les cellules vides de fin -> (n° de colonne, valeurs)."""
+    col = header.index("uid") if "uid" in header else 0
+    values = [str(r[col]) if col < len(r) else "" for r in rows]
+    while values and not values[-1]:
+        values.pop()
+    return col + 1, values
+
+def compact_sheet(sheet_id, dry_run=False, backup=True):
+    """
+    Mode compaction : la table dédoublonnée est calculée localement puis réécrite d'un bloc
+    (valeurs brutes + formules, puis une seule suppression des lignes de fin), quel que soit le
+    nombre de doublons éparpillés. Avant l'écriture, l'onglet est copié (duplicate_sheet) en sauvegarde.
+    Les lignes sont lues non formatées (FORMULA) : nombres / dates restent typés, formules conservées.
+    Si la colonne uid a changé depuis la lecture (ajout d'un scraper / GMB en parallèle…), rien n'est écrit.
+    """
+    gc = sheets_client.get_client(CREDENTIALS_FILE, use_streamlit=False)
+    ws = sheets_client.get_worksheet(sheet_id, "TEST", gc)
+    sh = ws.spreadsheet
+
+    rows = ws.get_all_values(value_render_option="FORMULA")
+    if not rows:
+        print("Feuille vide.")
+        return
+
+    header = rows[0]
+    data   = rows[1:]
+    plan = plan_dedupe(header, data)
+    if dry_run:
+        print_plan(header, data, plan)
+        return
+    if not plan["to_delete"] and not plan["changes"]:
+        print("✅ Aucun doublon trouvé.")
+        return
+
+    scheduler = get_scheduler()
+
+    # 0) Sauvegarde de l'onglet tel quel, juste à côté
+    name = None
+    if backup:
+        name = f"{ws.title}_sauvegarde_{datetime.now():%Y%m%d-%H%M%S}"
+        scheduler.execute(sh.duplicate_sheet, ws.id, insert_sheet_index=ws.index + 1, new_sheet_name=name)
+        print(f"💾 Sauvegarde : onglet « {name} »")
+
+    # 1) L'onglet a-t-il bougé depuis la lecture ? (lignes ajoutées / supprimées par un autre script)
+    key_col, read_keys = _key_column(header, data)
+    current = [str(v) for v in ws.col_values(key_col)[1:]]
+    while current and not current[-1]:
+        current.pop()
+    if current != read_keys:
+        print(
+            f"⛔ L'onglet a changé depuis la lecture ({len(read_keys)} → {len(current)} ligne(s) en colonne "
+            f"{header[key_col - 1] if header else key_col}) : compaction annulée, rien n'a été écrit. Relancer."
+        )
+        if name:
+            print(f"   (l'onglet « {name} » peut être supprimé)")
+        return
+
+    print(
+        "⚠️ Compaction : les lignes conservées sont réécrites à leur nouvelle position ; mise en forme, "
+        "notes et validations restent attachées aux anciennes lignes, et les formules réécrites "
+        "(USER_ENTERED) gardent leurs références relatives, qui pointent désormais d'autres lignes"
+        + (f" (onglet d'origine intact dans « {name} »)." if name else " (pas de sauvegarde : --no-backup).")
+    )
+
+    # 2) Table compacte réécrite en une fois à partir de la ligne 2 : valeurs brutes (RAW, types
+    #    conservés) puis les formules en USER_ENTERED pour qu'elles restent des formules
+    kept = plan["kept"]
+    width = max(len(header), max((len(r) for r in kept), default=0))
+    if kept:
+        values = [r + [""] * (width - len(r)) for r in kept]
+        scheduler.update(ws, f"A2:{rowcol_to_a1(len(kept) + 1, width)}", values)
+        formulas = [
+            {"range": rowcol_to_a1(i, j), "values": [[v]]}
+            for i, r in enumerate(values, start=2)
+            for j, v in enumerate(r, start=1)
+            if isinstance(v, str) and v.startswith("=")
+        ]
+        if formulas:
+            scheduler.batch_update(ws, formulas, value_input_option="USER_ENTERED")
+
+    # 3) Une seule suppression : les lignes de fin de l'ancienne table (pas de redimensionnement de
+    #    l'onglet, une ligne ajoutée entre-temps par un autre script remonte au lieu d'être coupée)
+    if len(rows) > len(kept) + 1:
+        scheduler.requests(sh, [{
+            "deleteDimension": {
+                "range": {"sheetId": ws.id, "dimension": "ROWS", "startIndex": len(kept) + 1, "endIndex": len(rows)}
+            }
+        }])
+    scheduler.flush(sh)
+
+    print(f"🧹 {len(plan['to_delete'])} ligne(s) supprimée(s) (doublons), onglet compacté à {len(kept)} ligne(s).")
+    if plan["changes"]:
+        print(f"♻️ {len(plan['changes'])} valeur(s) mise(s) à jour (date/année).")
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Déduplication des onglets TEST (clé site + prenom + texte)")
+    ap.add_argument("--school", default=None, help="école à traiter (défaut : toutes)")
+    ap.add_argument("--compact", action="store_true",
+                    help="réécrit la table dédoublonnée d'un bloc au lieu de supprimer les plages de doublons")
+    ap.add_argument("--dry-run", action="store_true", help="affiche les changements sans rien écrire")
+    ap.add_argument("--no-backup", action="store_true", help="(--compact) pas d'onglet de sauvegarde")
+    args = ap.parse_args(argv)
+
     cfg = load_yaml()
     ECOLES = cfg["ecoles"]
+    if args.school:
+        ECOLES = {k: v for k, v in ECOLES.items() if k.strip().lower() == args.school.strip().lower()}
+        if not ECOLES:
+            print(f"⚠️ École inconnue : {args.school}")
+            return
+    store = open_store(cfg)
+    configure_scheduler(cfg)
     total = 0
     for name, conf in ECOLES.items():
         print(f"\n➡️  Dédup {name}")
-        dedupe_sheet(conf["sheet_id"])
+        if args.compact:
+            compact_sheet(conf["sheet_id"], dry_run=args.dry_run, backup=not args.no_backup)
+        else:
+            dedupe_sheet(conf["sheet_id"], dry_run=args.dry_run)
         total += 1
-    print(f"\n✅ Nettoyage terminé pour {total} feuille(s).")
+        if args.dry_run:
+            continue
+        # lignes supprimées/décalées, onglet de sauvegarde ajouté -> handles, stock local et index à recharger
+        sheets_client.invalidate(conf["sheet_id"])
+        if store is not None:
+            store.invalidate(conf["sheet_id"])
+        SheetIndex(conf["sheet_id"]).discard()
+    if args.dry_run:
+        print(f"\n🔎 Simulation terminée pour {total} feuille(s) (rien n'a été écrit).")
+    else:
+        print(f"\n✅ Nettoyage terminé pour {total} feuille(s).")
 
 if __name__ == "__main__":
     main()
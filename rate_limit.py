@@ -0,0 +1,148 @@
+# rate_limit.py
+# Limiteur de débit adaptatif par hôte pour les scrapers web (remplace les pauses fixes)
+# - seau à jetons par hôte : `rate` requêtes/s, rafale de `burst` requêtes
+# - réponses saines : le débit remonte doucement (+increase req/s, plafonné à max_rate)
+# - 429 / 503 : débit divisé (x decrease), pause selon Retry-After (sinon backoff exponentiel)
+# - latence qui grimpe (> latency_factor x latence habituelle) : débit légèrement réduit
+# Réglages : section `scraping.rate_limit` du YAML, surchargeable par hôte (`hosts.<hôte>.rate_limit`).
+
+import time
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+THROTTLE_STATUSES = (429, 503)
+
+DEFAULT_RATE_LIMIT = {
+    "enabled": True,
+    "rate": 1.0,            # requêtes/s au démarrage
+    "min_rate": 0.2,
+    "max_rate": 4.0,
+    "burst": 1,
+    "increase": 0.1,        # req/s ajoutés après chaque réponse saine
+    "decrease": 0.5,        # facteur appliqué sur 429 / 503
+    "latency_factor": 3.0,  # au-delà de N x la latence habituelle, on ralentit
+    "max_retries": 3,       # nouvelles tentatives sur 429 / 503
+    "max_pause": 120,       # pause max (s) imposée par Retry-After / backoff
+}
+
+
+def parse_retry_after(value, now=None):
+    """En-tête Retry-After (secondes ou date HTTP) -> secondes d'attente, ou None."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    now = now or datetime.now(timezone.utc)
+    return max(0.0, (when - now).total_seconds())
+
+
+class HostLimiter:
+    """Seau à jetons adaptatif d'un hôte, partagé entre threads."""
+
+    def __init__(self, host, conf=None):
+        conf = {**DEFAULT_RATE_LIMIT, **(conf or {})}
+        self.host = host
+        self.min_rate = float(conf["min_rate"])
+        self.max_rate = max(self.min_rate, float(conf["max_rate"]))
+        self.rate = min(self.max_rate, max(self.min_rate, float(conf["rate"])))
+        self.burst = max(1.0, float(conf["burst"]))
+        self.increase = float(conf["increase"])
+        self.decrease = float(conf["decrease"])
+        self.latency_factor = float(conf["latency_factor"])
+        self.max_retries = int(conf["max_retries"])
+        self.max_pause = float(conf["max_pause"])
+
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.latency = None   # latence habituelle (moyenne mobile des réponses saines)
+        self.strikes = 0      # 429 / 503 consécutifs
+        self.stats = {"requests": 0, "throttled": 0, "slow": 0, "waited": 0.0}
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Bloque jusqu'à ce qu'une requête vers l'hôte soit autorisée."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            # chaque appel réserve son jeton : les threads suivants attendent leur tour
+            self.tokens -= 1
+            wait = max(self.blocked_until - now, -self.tokens / self.rate if self.tokens < 0 else 0.0)
+            self.stats["requests"] += 1
+            self.stats["waited"] += wait
+        if wait > 0:
+            time.sleep(wait)
+
+    def observe(self, status, latency, retry_after=None):
+        """Ajuste le débit d'après une réponse (statut HTTP, durée en s, en-tête Retry-After)."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if status in THROTTLE_STATUSES:
+                self.strikes += 1
+                self.stats["throttled"] += 1
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+                pause = parse_retry_after(retry_after)
+                if pause is None:
+                    pause = 2 ** (self.strikes - 1) / self.rate
+                self.blocked_until = max(self.blocked_until, now + min(pause, self.max_pause))
+                self.tokens = min(self.tokens, 0.0)
+                return
+
+            self.strikes = 0
+            if status >= 500:
+                return
+            if self.latency is not None and latency > self.latency_factor * self.latency:
+                self.stats["slow"] += 1
+                self.rate = max(self.min_rate, self.rate * (1 + self.decrease) / 2)
+            else:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+            self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+
+    def summary(self) -> str:
+        st = self.stats
+        out = f"{self.host} {self.rate:.2f} req/s ({st['requests']} req, attente {st['waited']:.0f}s"
+        if st["throttled"]:
+            out += f", {st['throttled']} x 429/503"
+        if st["slow"]:
+            out += f", {st['slow']} lentes"
+        return out + ")"
+
+
+class RateLimiters:
+    """Un HostLimiter par hôte, créé à la demande depuis la config globale + surcharges par hôte."""
+
+    def __init__(self, conf=None, host_conf=None):
+        self.conf = {**DEFAULT_RATE_LIMIT, **(conf or {})}
+        self.host_conf = host_conf or (lambda host: {})
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def for_host(self, host):
+        with self._lock:
+            limiter = self._limiters.get(host)
+            if limiter is None:
+                limiter = HostLimiter(host, {**self.conf, **(self.host_conf(host) or {})})
+                self._limiters[host] = limiter
+            return limiter
+
+    def summary(self) -> str:
+        with self._lock:
+            limiters = [self._limiters[h] for h in sorted(self._limiters)]
+        return " | ".join(l.summary() for l in limiters if l.stats["requests"]) or "aucune requête"
@@ -0,0 +1,330 @@
+# review_store.py
+# Stockage local des avis (SQLite), source de vérité des scripts
+# - une ligne SQLite par ligne de l'onglet TEST (numéro de ligne conservé)
+# - index sur uid et soft key -> plus besoin de relire tout le sheet à chaque run
+# - les nouveaux avis / MAJ sont d'abord écrits ici (dirty), puis poussés vers le sheet
+#   par sync_to_sheet() : seules les lignes modifiées partent vers Google Sheets
+# - empreinte de la colonne uid du sheet : si elle ne correspond plus (édition/suppression
+#   faite hors de nos scripts), l'onglet est rechargé depuis le sheet
+
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+
+DEFAULT_STORE_PATH = os.path.join(".cache", "reviews.sqlite")
+
+COLUMNS = [
+    "uid", "prenom", "note", "date", "annee", "formation", "texte",
+    "url", "etablissement", "ville", "reponse_1", "reponse_2",
+    "reponse_3", "site",
+]
+
+_UPDATED_RANGE_RE = re.compile(r"![A-Z]+(\d+)")
+
+
+def uid_fingerprint(uids) -> str:
+    """Empreinte de la colonne uid (ordre inclus), sans les cellules vides de fin de colonne."""
+    uids = [str(u or "").strip() for u in uids]
+    while uids and not uids[-1]:
+        uids.pop()
+    return hashlib.sha1("\n".join(uids).encode("utf-8")).hexdigest()
+
+
+def load_store_settings(cfg: dict) -> dict:
+    """Section `store` du YAML -> {"enabled": bool, "path": str}."""
+    conf = (cfg or {}).get("store") or {}
+    return {
+        "enabled": bool(conf.get("enabled", bool(conf))),
+        "path": conf.get("path") or DEFAULT_STORE_PATH,
+    }
+
+
+def open_store(cfg: dict):
+    """ReviewStore si la section `store` du YAML l'active, sinon None."""
+    settings = load_store_settings(cfg)
+    if not settings["enabled"]:
+        return None
+    return ReviewStore(settings["path"])
+
+
+class ReviewStore:
+    """Avis de chaque sheet (clé sheet_id), partagé entre threads."""
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        cols = ", ".join(f"{c} TEXT NOT NULL DEFAULT ''" for c in COLUMNS)
+        self._db.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS reviews (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sheet_id TEXT NOT NULL,
+                row INTEGER,
+                soft_key TEXT,
+                dirty_cols TEXT NOT NULL DEFAULT '',
+                {cols}
+            );
+            CREATE INDEX IF NOT EXISTS reviews_uid ON reviews(sheet_id, uid);
+            CREATE INDEX IF NOT EXISTS reviews_soft ON reviews(sheet_id, soft_key);
+            CREATE INDEX IF NOT EXISTS reviews_row ON reviews(sheet_id, row);
+            CREATE TABLE IF NOT EXISTS sheets (
+                sheet_id TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL
+            );
+            """
+        )
+        self._db.commit()
+
+    # ---- état d'un sheet ------------------------------------------------
+    def fingerprint(self, sheet_id):
+        with self._lock:
+            row = self._db.execute("SELECT fingerprint FROM sheets WHERE sheet_id = ?", (sheet_id,)).fetchone()
+        return row[0] if row else None
+
+    def refresh_fingerprint(self, sheet_id):
+        """Recalcule l'empreinte attendue du sheet à partir des lignes synchronisées."""
+        with self._lock:
+            uids = [u for (u,) in self._db.execute(
+                "SELECT uid FROM reviews WHERE sheet_id = ? AND row IS NOT NULL ORDER BY row", (sheet_id,)
+            )]
+            self._db.execute(
+                "INSERT OR REPLACE INTO sheets (sheet_id, fingerprint) VALUES (?, ?)",
+                (sheet_id, uid_fingerprint(uids)),
+            )
+            self._db.commit()
+
+    def is_fresh(self, sheet_id, sheet_uids) -> bool:
+        return self.fingerprint(sheet_id) == uid_fingerprint(sheet_uids)
+
+    def invalidate(self, sheet_id):
+        """Oublie l'onglet : le prochain run le rechargera depuis le sheet."""
+        with self._lock:
+            self._db.execute("DELETE FROM sheets WHERE sheet_id = ?", (sheet_id,))
+            self._db.commit()
+
+    def load_sheet(self, sheet_id, header, rows):
+        """
+        Remplace le contenu local par les lignes du sheet (get_all_values sans l'entête).
+        Les nouveaux avis pas encore poussés (row NULL) sont conservés s'ils ne sont pas déjà dans le sheet.
+        """
+        pos = {name: header.index(name) for name in COLUMNS if name in header}
+        records = []
+        for rownum, row in enumerate(rows, start=2):
+            values = [str(row[pos[c]]) if c in pos and pos[c] < len(row) else "" for c in COLUMNS]
+            records.append((sheet_id, rownum, *values))
+        sheet_uids = {rec[2 + COLUMNS.index("uid")] for rec in records}
+
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        with self._lock:
+            pending = self._db.execute(
+                "SELECT id, uid FROM reviews WHERE sheet_id = ? AND row IS NULL", (sheet_id,)
+            ).fetchall()
+            stale = [(i,) for i, uid in pending if uid in sheet_uids]
+            self._db.executemany("DELETE FROM reviews WHERE id = ?", stale)
+            self._db.execute("DELETE FROM reviews WHERE sheet_id = ? AND row IS NOT NULL", (sheet_id,))
+            self._db.executemany(
+                f"INSERT INTO reviews (sheet_id, row, {', '.join(COLUMNS)}) VALUES (?, ?, {placeholders})",
+                records,
+            )
+            self._db.commit()
+        self.refresh_fingerprint(sheet_id)
+
+    # ---- lecture ----------------------------------------------------------
+    def index_rows(self, sheet_id):
+        """(id, row, uid, soft_key, site, prenom, texte, date, annee) pour chaque avis connu."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT id, row, uid, soft_key, site, prenom, texte, date, annee "
+                "FROM reviews WHERE sheet_id = ? ORDER BY row IS NULL, row, id",
+                (sheet_id,),
+            ).fetchall()
+
+    def set_soft_keys(self, pairs):
+        """pairs = [(soft_key, id)] : mémorise les soft keys calculées par l'appelant."""
+        with self._lock:
+            self._db.executemany("UPDATE reviews SET soft_key = ? WHERE id = ?", pairs)
+            self._db.commit()
+
+    def uids(self, sheet_id):
+        with self._lock:
+            return {u for (u,) in self._db.execute(
+                "SELECT uid FROM reviews WHERE sheet_id = ? AND uid != ''", (sheet_id,)
+            )}
+
+    def column_values(self, sheet_id, names):
+        """Valeurs de quelques colonnes seulement (ex: note, site) -> liste de tuples."""
+        cols = [c for c in names if c in COLUMNS]
+        with self._lock:
+            return self._db.execute(
+                f"SELECT {', '.join(cols)} FROM reviews WHERE sheet_id = ? ORDER BY row IS NULL, row, id",
+                (sheet_id,),
+            ).fetchall()
+
+    # ---- écriture locale (dirty) -----------------------------------------
+    def add_new(self, sheet_id, values: dict, soft_key=None):
+        placeholders = ", ".join("?" for _ in COLUMNS)
+        with self._lock:
+            self._db.execute(
+                f"INSERT INTO reviews (sheet_id, row, soft_key, dirty_cols, {', '.join(COLUMNS)}) "
+                f"VALUES (?, NULL, ?, '*', {placeholders})",
+                (sheet_id, soft_key, *[str(values.get(c, "") or "") for c in COLUMNS]),
+            )
+            self._db.commit()
+
+    def update_fields(self, sheet_id, row, fields: dict):
+        fields = {k: v for k, v in fields.items() if k in COLUMNS}
+        if not fields:
+            return
+        with self._lock:
+            current = self._db.execute(
+                "SELECT id, dirty_cols FROM reviews WHERE sheet_id = ? AND row = ?", (sheet_id, row)
+            ).fetchone()
+            if not current:
+                return
+            dirty = set(filter(None, current[1].split(","))) | set(fields)
+            sets = ", ".join(f"{k} = ?" for k in fields)
+            self._db.execute(
+                f"UPDATE reviews SET {sets}, dirty_cols = ? WHERE id = ?",
+                (*[str(v or "") for v in fields.values()], ",".join(sorted(dirty)), current[0]),
+            )
+            self._db.commit()
+
+    def pending(self, sheet_id):
+        """
+        -> (updates, new_rows)
+           updates  = [(row, {colonne: valeur})] pour les lignes existantes modifiées
+           new_rows = [(id, [valeurs dans l'ordre COLUMNS])] pour les avis pas encore dans le sheet
+        """
+        with self._lock:
+            upd = self._db.execute(
+                f"SELECT row, dirty_cols, {', '.join(COLUMNS)} FROM reviews "
+                "WHERE sheet_id = ? AND row IS NOT NULL AND dirty_cols != '' ORDER BY row",
+                (sheet_id,),
+            ).fetchall()
+            new = self._db.execute(
+                f"SELECT id, {', '.join(COLUMNS)} FROM reviews WHERE sheet_id = ? AND row IS NULL ORDER BY id",
+                (sheet_id,),
+            ).fetchall()
+        updates = []
+        for rec in upd:
+            row, dirty, values = rec[0], rec[1].split(","), dict(zip(COLUMNS, rec[2:]))
+            updates.append((row, {c: values[c] for c in dirty if c in values}))
+        return updates, [(rec[0], list(rec[1:])) for rec in new]
+
+    def has_pending(self, sheet_id) -> bool:
+        """Des MAJ ou des nouveaux avis attendent-ils d'être poussés vers le sheet ?"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT 1 FROM reviews WHERE sheet_id = ? AND (row IS NULL OR dirty_cols != '') LIMIT 1",
+                (sheet_id,),
+            ).fetchone() is not None
+
+    def rows_for_uids(self, sheet_id, uids):
+        """{uid: n° de ligne} des avis déjà poussés vers le sheet parmi `uids`."""
+        uids = list(uids)
+        out = {}
+        with self._lock:
+            for start in range(0, len(uids), 500):
+                chunk = uids[start:start + 500]
+                marks = ", ".join("?" for _ in chunk)
+                out.update(self._db.execute(
+                    f"SELECT uid, row FROM reviews WHERE sheet_id = ? AND row IS NOT NULL AND uid IN ({marks})",
+                    (sheet_id, *chunk),
+                ).fetchall())
+        return out
+
+    def mark_updates_synced(self, sheet_id, rows):
+        with self._lock:
+            self._db.executemany(
+                "UPDATE reviews SET dirty_cols = '' WHERE sheet_id = ? AND row = ?",
+                [(sheet_id, r) for r in rows],
+            )
+            self._db.commit()
+
+    def mark_new_synced(self, ids, first_row):
+        """Les avis `ids` ont été ajoutés au sheet à partir de la ligne first_row (dans cet ordre)."""
+        with self._lock:
+            self._db.executemany(
+                "UPDATE reviews SET row = ?, dirty_cols = '' WHERE id = ?",
+                [(first_row + k, i) for k, i in enumerate(ids)],
+            )
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# ----------------------------------------------------------------
+# Synchro avec Google Sheets
+# ----------------------------------------------------------------
+def ensure_fresh(store, sheet_id, ws, header=None, logger=None) -> bool:
+    """
+    Vérifie que le contenu local correspond toujours au sheet (empreinte de la colonne uid).
+    Sinon recharge tout l'onglet. Renvoie True si un rechargement a eu lieu.
+    """
+    header = header or ws.row_values(1)
+    uid_col = header.index("uid") + 1 if "uid" in header else 1
+    sheet_uids = ws.col_values(uid_col)[1:]
+    if store.is_fresh(sheet_id, sheet_uids):
+        return False
+    values = ws.get_all_values()
+    store.load_sheet(sheet_id, values[0] if values else header, values[1:])
+    if logger:
+        logger(f"🗃️ Stock local rechargé depuis le sheet ({max(len(values) - 1, 0)} lignes)")
+    return True
+
+
+def first_appended_row(response):
+    """Numéro de la 1re ligne ajoutée, lu dans la réponse de values.append (updatedRange)."""
+    try:
+        rng = (response or {}).get("updates", {}).get("updatedRange", "")
+        m = _UPDATED_RANGE_RE.search(rng)
+        return int(m.group(1)) if m else None
+    except Exception:
+        return None
+
+
+def sync_to_sheet(store, sheet_id, ws, col_index):
+    """
+    Pousse vers le sheet uniquement ce qui a changé localement :
+    - MAJ de cellules sur les lignes existantes (un values.batchUpdate via sheets_writer)
+    - ajout des nouveaux avis (append_rows), puis mémorise leurs numéros de ligne
+    col_index = {colonne: index 1-based dans le sheet}. Renvoie (nb lignes MAJ, nb ajouts).
+    """
+    from gspread.utils import rowcol_to_a1
+    from sheets_writer import get_scheduler
+
+    scheduler = get_scheduler()
+    updates, new_rows = store.pending(sheet_id)
+
+    if updates:
+        payload = []
+        for row, fields in updates:
+            for col, value in fields.items():
+                if col in col_index:
+                    payload.append({"range": rowcol_to_a1(row, col_index[col]), "values": [[value]]})
+        if payload:
+            scheduler.batch_update(ws, payload, value_input_option="RAW")
+            scheduler.flush(ws.spreadsheet)
+        store.mark_updates_synced(sheet_id, [row for row, _ in updates])
+
+    if new_rows:
+        resp = scheduler.append_rows(ws, [values for _, values in new_rows], value_input_option="RAW")
+        first = first_appended_row(resp)
+        if first is None:
+            # numéros de ligne inconnus -> on recharge l'onglet au prochain run
+            store.invalidate(sheet_id)
+            return len(updates), len(new_rows)
+        store.mark_new_synced([i for i, _ in new_rows], first)
+
+    if updates or new_rows:
+        store.refresh_fingerprint(sheet_id)
+    return len(updates), len(new_rows)
+
@@ -7,16 +7,36 @@ import os
 import re
 import time
 import yaml
-import random
+import json
 import hashlib
+import queue
+import threading
+from collections import deque
+from itertools import islice
 import requests
-import gspread
-from bs4 import BeautifulSoup
+import soupsieve
+from bs4 import Tag
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, urljoin, urlunparse, parse_qs, urlencode
 from gspread.utils import rowcol_to_a1
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
+from http_cache import ResponseCache, DEFAULT_CACHE_PATH
+from html_backend import parse_html, resolve_backend, DEFAULT_BACKEND
+from rate_limit import RateLimiters, THROTTLE_STATUSES
+from sheets_writer import configure_scheduler, get_scheduler
+import sheets_client
+from sheets_client import read_columns
+from review_store import open_store, ensure_fresh, sync_to_sheet, first_appended_row
+from checkpoint import RunCheckpoint
+from near_dup import NearDupIndex, near_dup_settings
+from sheet_index import (
+    SheetIndex, UidView, SoftView, column_token, column_state, tail_start, tail_token, DEFAULT_INDEX_DIR,
+)
+
 # === CONFIG ===
 YAML_FILES = ["ecole.yaml", "ecoles.yaml"]  # on tente ecole.yaml puis ecoles.yaml
 CREDENTIALS_FILE = "service_account.json"   # gardé pour compat (fallback local)
@@ -24,8 +44,32 @@ CREDENTIALS_FILE = "service_account.json"   # gardé pour compat (fallback local
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0 Safari/537.36",
     "Accept-Language": "fr-FR,fr;q=0.9,en;q=0.8",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
 }
 
+# Concurrence par hôte si rien n'est précisé dans ecole.yaml (scraping.hosts.<hôte>.concurrency)
+DEFAULT_HOST_CONCURRENCY = 1
+# Pages Diplomeo récupérées en même temps pour une URL (scraping.hosts.<hôte>.page_window)
+DEFAULT_PAGE_WINDOW = 4
+
+# Sessions HTTP partagées (scraping.retry) : retry avec backoff sur erreurs transitoires
+DEFAULT_RETRY = {"total": 3, "backoff": 0.5}
+RETRY_STATUSES = (500, 502, 504)  # 503 / 429 : gérés par le limiteur de débit (Retry-After)
+DEFAULT_POOL_SIZE = 10  # connexions keep-alive max par hôte
+
+# Mode incrémental (scraping.incremental) : arrêt après N pages consécutives déjà connues
+DEFAULT_KNOWN_PAGES_STOP = 2
+DEFAULT_FULL_SWEEP_DAYS = 7
+FULL_SWEEP_FILE = os.path.join(".cache", "full_sweep.json")  # dernière collecte complète par école
+DEFAULT_SCHOOL_WORKERS = 1  # écoles traitées en parallèle (scraping.schools_concurrency)
+
+# Flux scraping -> sheet (scraping.stream) : pages en mémoire par URL, écriture par paquets
+DEFAULT_STREAM = {"buffer_pages": 4, "flush_rows": 200, "flush_seconds": 30}
+
+# Index compact persistant par onglet (scraping.index), voir sheet_index.py
+DEFAULT_INDEX = {"enabled": False, "path": DEFAULT_INDEX_DIR}
+
 EXPECTED_HEADERS = [
     "uid",
     "prenom",
@@ -48,17 +92,9 @@ def _get_gspread_client():
     """
     - En mode Streamlit : utilise st.secrets["gcp_service_account"]
     - Sinon : lit un fichier service account local (chemin via $GSPREAD_SA_JSON ou 'service_account.json')
+    Client partagé par tout le process (voir sheets_client).
     """
-    try:
-        import streamlit as st  # import local pour éviter la dépendance hors Streamlit
-        if "gcp_service_account" in st.secrets:
-            return gspread.service_account_from_dict(dict(st.secrets["gcp_service_account"]))
-    except Exception:
-        # On ignore toute erreur et on retombe sur le mode local
-        pass
-
-    cred_path = os.getenv("GSPREAD_SA_JSON", CREDENTIALS_FILE)
-    return gspread.service_account(filename=cred_path)
+    return sheets_client.get_client(CREDENTIALS_FILE)
 
 # === HELPERS ===
 def clean(t: str) -> str:
@@ -111,9 +147,11 @@ def normalize_ecole(name: str) -> str:
     return mapping.get(n, n.replace("-", " "))
 
 # === YEAR PARSER ===
+RELATIVE_DATE_RE = re.compile(r"il y a (\d+)\s*(mois|an|ans)")
+
 def parse_relative_date(text: str):
     now = datetime.now()
-    m = re.search(r"il y a (\d+)\s*(mois|an|ans)", (text or "").lower())
+    m = RELATIVE_DATE_RE.search((text or "").lower())
     if not m:
         return ""
     value, unit = int(m.group(1)), m.group(2)
@@ -190,10 +228,173 @@ def detect_etab_from_url(url: str) -> str:
             return etab
     return ""
 
+# === HTTP (cache de revalidation) ===
+HTTP_CACHE = None  # ResponseCache actif pendant run() si scraping.cache est activé dans le YAML
+
+def configure_http_cache(cfg, settings=None):
+    """(Ré)ouvre le cache HTTP disque selon la section `scraping.cache` du YAML."""
+    global HTTP_CACHE
+    if HTTP_CACHE is not None:
+        HTTP_CACHE.close()
+        HTTP_CACHE = None
+    conf = ((cfg or {}).get("scraping") or {}).get("cache") or {}
+    if not conf.get("enabled", bool(conf)):
+        return None
+    settings = settings or {}
+    HTTP_CACHE = ResponseCache(
+        path=conf.get("path") or DEFAULT_CACHE_PATH,
+        max_bytes=float(conf.get("max_mb", 200)) * 1024 * 1024,
+        ttl_for=lambda host: host_setting(settings, host, "cache_ttl", 0),
+    )
+    return HTTP_CACHE
+
+# === SESSIONS HTTP PARTAGÉES ===
+class CountingAdapter(HTTPAdapter):
+    """HTTPAdapter d'un hôte ; expose les compteurs urllib3 (requêtes / connexions ouvertes)."""
+
+    def connection_stats(self):
+        requests_count, connections = 0, 0
+        pools = self.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                requests_count += pool.num_requests
+                connections += pool.num_connections
+        return requests_count, connections
+
+class SessionPool:
+    """
+    Une requests.Session pour tout le process, avec un adapter (pool keep-alive + Retry) monté par hôte.
+    Les connexions TLS sont ainsi réutilisées d'une URL à l'autre, et d'un run à l'autre.
+    """
+
+    def __init__(self, settings=None, retry=None):
+        self.settings = settings or {}
+        self.retry = {**DEFAULT_RETRY, **(retry or {})}
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        self.adapters = {}
+        self._lock = threading.Lock()
+
+    def _make_retry(self):
+        return Retry(
+            total=int(self.retry["total"]),
+            backoff_factor=float(self.retry["backoff"]),
+            status_forcelist=RETRY_STATUSES,
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            respect_retry_after_header=False,  # 429 / 503 + Retry-After remontent au limiteur de débit
+            raise_on_status=False,  # les scrapers gèrent eux-mêmes status_code != 200
+        )
+
+    def mount(self, host):
+        """Monte l'adapter de l'hôte (à faire avant de partager la session entre threads)."""
+        with self._lock:
+            if host in self.adapters:
+                return self.adapters[host]
+            concurrency = int(host_setting(self.settings, host, "concurrency", DEFAULT_HOST_CONCURRENCY) or 1)
+            window = int(host_setting(self.settings, host, "page_window", 1) or 1)
+            adapter = CountingAdapter(
+                pool_connections=1,
+                pool_maxsize=max(DEFAULT_POOL_SIZE, concurrency * window),
+                max_retries=self._make_retry(),
+            )
+            for scheme in ("https://", "http://"):
+                self.session.mount(f"{scheme}{host}/", adapter)
+            self.adapters[host] = adapter
+            return adapter
+
+    def session_for(self, url):
+        host = host_of(url)
+        if host not in self.adapters:
+            self.mount(host)
+        return self.session
+
+    def stats(self) -> dict:
+        return {host: a.connection_stats() for host, a in list(self.adapters.items())}
+
+def reuse_summary(before: dict, after: dict) -> str:
+    """Résumé 'hôte: requêtes / connexions (réutilisation %)' entre deux instantanés de SessionPool.stats()."""
+    parts = []
+    for host, (reqs, conns) in sorted(after.items()):
+        r0, c0 = before.get(host, (0, 0))
+        reqs, conns = reqs - r0, conns - c0
+        if reqs <= 0:
+            continue
+        reuse = 100 * (reqs - conns) / reqs
+        parts.append(f"{host} {reqs} req / {conns} connexion(s) ({reuse:.0f}% réutilisées)")
+    return " | ".join(parts) or "aucune requête"
+
+_SESSION_POOL = None
+_SESSION_POOL_LOCK = threading.Lock()
+
+def configure_sessions(cfg=None, settings=None):
+    """Crée (ou garde) le SessionPool du process ; recréé seulement si le réglage retry change."""
+    global _SESSION_POOL
+    retry = {**DEFAULT_RETRY, **(((cfg or {}).get("scraping") or {}).get("retry") or {})}
+    with _SESSION_POOL_LOCK:
+        if _SESSION_POOL is None or _SESSION_POOL.retry != retry:
+            _SESSION_POOL = SessionPool(settings, retry)
+        else:
+            _SESSION_POOL.settings = settings or _SESSION_POOL.settings
+        return _SESSION_POOL
+
+def get_session(url):
+    """Session partagée pour cette URL (pool de l'hôte monté si besoin)."""
+    pool = _SESSION_POOL or configure_sessions()
+    return pool.session_for(url)
+
+def http_get(s, url, timeout=20):
+    """GET utilisé par tous les scrapers (passe par le cache HTTP s'il est configuré)."""
+    cache = HTTP_CACHE
+    if cache is None:
+        return limited_get(s, url, timeout=timeout)
+    return cache.get(s, url, timeout=timeout, fetch=limited_get)
+
+# === LIMITEUR DE DÉBIT PAR HÔTE ===
+RATE_LIMITS = None  # RateLimiters actif pendant run() (section scraping.rate_limit du YAML)
+
+def configure_rate_limits(cfg, settings=None):
+    """(Re)crée les limiteurs par hôte ; None si scraping.rate_limit.enabled vaut false."""
+    global RATE_LIMITS
+    conf = ((cfg or {}).get("scraping") or {}).get("rate_limit") or {}
+    if not conf.get("enabled", True):
+        RATE_LIMITS = None
+        return None
+    settings = settings or {}
+    RATE_LIMITS = RateLimiters(conf, lambda host: host_setting(settings, host, "rate_limit", {}))
+    return RATE_LIMITS
+
+def limited_get(s, url, timeout=20, headers=None):
+    """GET cadencé par le limiteur de l'hôte ; 429 / 503 -> pause (Retry-After) puis nouvelle tentative."""
+    limits = RATE_LIMITS
+    if limits is None:
+        return s.get(url, timeout=timeout, headers=headers)
+    limiter = limits.for_host(host_of(url))
+    for attempt in range(limiter.max_retries + 1):
+        limiter.acquire()
+        start = time.monotonic()
+        r = s.get(url, timeout=timeout, headers=headers)
+        limiter.observe(r.status_code, time.monotonic() - start, r.headers.get("Retry-After"))
+        if r.status_code not in THROTTLE_STATUSES:
+            break
+    return r
+
+# === PARSING HTML ===
+PARSER_BACKEND = DEFAULT_BACKEND  # scraping.parser dans le YAML : html.parser | lxml | selectolax
+
+def configure_parser(cfg) -> str:
+    """Choisit le backend HTML (fallback html.parser si la lib n'est pas installée)."""
+    global PARSER_BACKEND
+    wanted = ((cfg or {}).get("scraping") or {}).get("parser") or DEFAULT_BACKEND
+    PARSER_BACKEND = resolve_backend(wanted)
+    return PARSER_BACKEND
+
+def make_soup(html: str):
+    return parse_html(html, PARSER_BACKEND)
+
 # === GOOGLE SHEETS ===
 def get_sheet(sheet_id: str, worksheet_name: str = "TEST"):
-    gc = _get_gspread_client()
-    return gc.open_by_key(sheet_id).worksheet(worksheet_name)
+    return sheets_client.get_worksheet(sheet_id, worksheet_name, _get_gspread_client())
 
 def ensure_headers(sheet):
     try:
@@ -201,7 +402,238 @@ def ensure_headers(sheet):
     except Exception:
         header = []
     if not header:
-        sheet.update("A1", [EXPECTED_HEADERS])
+        scheduler = get_scheduler()
+        scheduler.update(sheet, "A1", [EXPECTED_HEADERS])
+        scheduler.flush(sheet.spreadsheet)
+
+# === INDEX DES AVIS EXISTANTS ===
+# colonnes nécessaires à l'index (pas de reponse_*, etab, ville…)
+INDEX_COLUMNS = ("uid", "site", "prenom", "texte", "date", "annee")
+
+def _index_from_columns(cols, near=None):
+    existing_uid = set()
+    existing_soft = {}
+    rows = zip(cols["uid"], cols["site"], cols["prenom"], cols["texte"], cols["date"], cols["annee"])
+    for i, (uid_val, site, prenom, texte, date, annee) in enumerate(rows, start=2):  # data commence à la ligne 2
+        uid_val = str(uid_val).strip()
+        if uid_val:
+            existing_uid.add(uid_val)
+        sk = soft_key_from_values(site, prenom, texte)
+        if sk:
+            existing_soft[sk] = {"row": i, "date": date or "", "annee": annee or ""}
+        if near is not None:
+            near.add(i, texte)
+    return existing_uid, existing_soft
+
+def load_existing_index(sheet, header=None, near=None):
+    """
+    Index de l'onglet lu directement dans le sheet :
+    -> (existing_uid, existing_soft) avec existing_soft[soft_key] = {"row", "date", "annee"}
+    Seules les colonnes INDEX_COLUMNS sont téléchargées ; si l'en-tête ne les contient pas
+    toutes (colonnes renommées / déplacées), on relit l'onglet complet avec get_all_records.
+    near : NearDupIndex à remplir avec les textes de l'onglet (clé = n° de ligne).
+    """
+    try:
+        cols = read_columns(sheet, header, INDEX_COLUMNS)
+        if cols is not None:
+            return _index_from_columns(cols, near)
+    except Exception:
+        pass
+
+    existing_uid = set()   # uids exacts (incluant l'URL)
+    existing_soft = {}     # soft_key(site, prenom, texte) -> info(row, date, annee)
+    try:
+        rows = sheet.get_all_records()
+        for i, row in enumerate(rows, start=2):  # data commence à la ligne 2
+            uid_val = str(row.get("uid", "")).strip()
+            if uid_val:
+                existing_uid.add(uid_val)
+            sk = soft_key_from_values(row.get("site", ""), row.get("prenom", ""), row.get("texte", ""))
+            if sk:
+                existing_soft[sk] = {
+                    "row": i,
+                    "date": row.get("date", "") or "",
+                    "annee": row.get("annee", "") or "",
+                }
+            if near is not None:
+                near.add(i, str(row.get("texte", "")))
+    except Exception:
+        pass
+    return existing_uid, existing_soft
+
+def load_existing_index_from_store(store, sheet_id, sheet, header=None, logger=print, near=None):
+    """Même index, lu dans le stock SQLite local (rechargé depuis le sheet seulement s'il a changé)."""
+    ensure_fresh(store, sheet_id, sheet, header=header, logger=logger)
+    existing_uid, existing_soft, missing = set(), {}, []
+    for id_, rownum, uid, sk, site, prenom, texte, date, annee in store.index_rows(sheet_id):
+        if uid:
+            existing_uid.add(uid)
+        if sk is None:
+            sk = soft_key_from_values(site, prenom, texte)
+            missing.append((sk, id_))
+        existing_soft[sk] = {"row": rownum, "date": date, "annee": annee}
+        if near is not None:
+            near.add(rownum or uid, texte)
+    if missing:
+        store.set_soft_keys(missing)
+    return existing_uid, existing_soft
+
+def _index_settings(cfg: dict) -> dict:
+    conf = ((cfg or {}).get("scraping") or {}).get("index") or {}
+    return {
+        "enabled": bool(conf.get("enabled", DEFAULT_INDEX["enabled"])),
+        "path": conf.get("path") or DEFAULT_INDEX["path"],
+    }
+
+def load_sheet_index(sheet, sheet_id, header, store=None, near=None, folder=DEFAULT_INDEX_DIR, logger=print):
+    """
+    Index compact de l'onglet (SheetIndex) : rechargé depuis `folder` tant que le sheet n'a pas
+    changé hors de nos scripts, reconstruit sinon (depuis le stock SQLite ou les colonnes
+    INDEX_COLUMNS du sheet). near : NearDupIndex à remplir (signatures enregistrées si possible).
+    Sheet direct : seule la fin de la colonne uid est relue pour valider l'index enregistré.
+    """
+    index = SheetIndex.load(sheet_id, folder)
+    token = None
+    if store is not None:
+        ensure_fresh(store, sheet_id, sheet, header=header, logger=logger)
+        fingerprint = None if store.has_pending(sheet_id) else store.fingerprint(sheet_id)
+        token = f"store:{fingerprint}" if fingerprint else None
+    elif index is not None and index.count() is not None:
+        uid_col = header.index("uid") + 1 if "uid" in header else 1
+        letter = rowcol_to_a1(1, uid_col).rstrip("0123456789")
+        first = tail_start(index.count())
+        got = sheet.get(f"{letter}{first + 1}:{letter}", major_dimension="COLUMNS")
+        token = tail_token(first, list(got[0]) if got else [])
+
+    if token and index is not None and index.token == token and (near is None or index.restore_near(near)):
+        logger(f"🗂️ Index rechargé depuis le cache ({len(index)} avis)")
+        return index
+
+    entries, tail = [], ()
+    if store is not None:
+        missing = []
+        for id_, rownum, uid, sk, site, prenom, texte, date, annee in store.index_rows(sheet_id):
+            if sk is None:
+                sk = soft_key_from_values(site, prenom, texte)
+                missing.append((sk, id_))
+            entries.append((rownum, uid, sk, date, annee))
+            if near is not None:
+                near.add(rownum or uid, texte)
+        if missing:
+            store.set_soft_keys(missing)
+    else:
+        try:
+            cols = read_columns(sheet, header, INDEX_COLUMNS)
+        except Exception:
+            cols = None
+        if cols is None:
+            records = sheet.get_all_records()
+            cols = {c: [str(r.get(c, "")) for r in records] for c in INDEX_COLUMNS}
+        rows = zip(cols["uid"], cols["site"], cols["prenom"], cols["texte"], cols["date"], cols["annee"])
+        for i, (uid, site, prenom, texte, date, annee) in enumerate(rows, start=2):
+            entries.append((i, uid, soft_key_from_values(site, prenom, texte), date, annee))
+            if near is not None:
+                near.add(i, texte)
+        # jeton pris sur la colonne uid qu'on vient de lire en entier
+        count, tail = column_state(cols["uid"])
+        token = column_token(count, tail)
+    index = SheetIndex.build(sheet_id, entries, token, folder, tail)
+    logger(f"🗂️ Index reconstruit ({len(index)} avis)")
+    return index
+
+# === ÉCRITURE VERS LE SHEET ===
+class SheetWriter:
+    """
+    Écriture directe : MAJ et ajouts accumulés, envoyés au sheet par flush().
+    flush_if_due() envoie par paquets pendant le scraping (N lignes en attente ou N secondes).
+    """
+
+    def __init__(self, sheet, col_index):
+        self.sheet = sheet
+        self.col_index = col_index
+        self.pending_updates = []   # batch_update payloads {range, values}
+        self.pending_new_rows = []  # lignes complètes à append
+        self.pending_keys = []      # (uid, soft key) de ces lignes, pour `index`
+        self.index = None           # SheetIndex tenu à jour des n° de ligne ajoutés (optionnel)
+        self.queued = 0             # lignes touchées depuis le dernier envoi
+        self.last_flush = time.monotonic()
+
+    def update(self, rownum, fields: dict):
+        self.queued += 1
+        for col, value in fields.items():
+            self.pending_updates.append({
+                "range": rowcol_to_a1(rownum, self.col_index[col]),
+                "values": [[value]],
+            })
+
+    def append(self, review: dict, soft_key=None):
+        self.queued += 1
+        self.pending_new_rows.append([review.get(k, "") for k in EXPECTED_HEADERS])
+        self.pending_keys.append((review.get("uid", ""), soft_key))
+
+    def flush(self):
+        self._send()
+        self.queued = 0
+        self.last_flush = time.monotonic()
+
+    def flush_if_due(self, max_rows, max_seconds) -> bool:
+        """Envoie ce qui attend si `max_rows` lignes sont en file ou si le dernier envoi date de `max_seconds`."""
+        if not self.queued:
+            return False
+        if self.queued >= max_rows or time.monotonic() - self.last_flush >= max_seconds:
+            self.flush()
+            return True
+        return False
+
+    def pending_state(self) -> dict:
+        """Écritures pas encore envoyées (sérialisables en JSON, pour le point de reprise)."""
+        return {"updates": list(self.pending_updates), "new_rows": list(self.pending_new_rows)}
+
+    def restore(self, state: dict):
+        """Remet en file des écritures sauvegardées par pending_state()."""
+        updates = (state or {}).get("updates") or []
+        new_rows = (state or {}).get("new_rows") or []
+        self.pending_updates.extend(updates)
+        self.pending_new_rows.extend(new_rows)
+        self.pending_keys.extend((row[0] if row else "", None) for row in new_rows)
+        self.queued += len(updates) + len(new_rows)
+
+    def _send(self):
+        # d'abord les MAJ, puis les ajouts (append_rows envoie les MAJ en attente avant d'ajouter)
+        scheduler = get_scheduler()
+        if self.pending_updates:
+            scheduler.batch_update(self.sheet, self.pending_updates, value_input_option="RAW")
+        if self.pending_new_rows:
+            resp = scheduler.append_rows(self.sheet, self.pending_new_rows, value_input_option="RAW")
+            if self.index is not None:
+                self.index.appended(self.pending_keys, first_appended_row(resp))
+        scheduler.flush(self.sheet.spreadsheet)
+        self.pending_updates, self.pending_new_rows, self.pending_keys = [], [], []
+
+class StoreSheetWriter(SheetWriter):
+    """Écrit dans le stock SQLite local (source de vérité) ; flush() ne pousse au sheet que ce qui a changé."""
+
+    def __init__(self, sheet, col_index, store, sheet_id):
+        super().__init__(sheet, col_index)
+        self.store = store
+        self.sheet_id = sheet_id
+
+    def update(self, rownum, fields: dict):
+        self.queued += 1
+        self.store.update_fields(self.sheet_id, rownum, fields)
+
+    def append(self, review: dict, soft_key=None):
+        self.queued += 1
+        self.store.add_new(self.sheet_id, review, soft_key)
+
+    def pending_state(self) -> dict:
+        return {}  # les écritures en attente vivent déjà dans le stock SQLite
+
+    def restore(self, state: dict):
+        pass
+
+    def _send(self):
+        sync_to_sheet(self.store, self.sheet_id, self.sheet, self.col_index)
 
 # === DIPLOMEO ===
 ITEM_SEL_DIP = 'li[data-cy="review-commun-list-item"]'
@@ -222,51 +654,13 @@ def parse_etablissement_ville_diplomeo(url: str):
     return normalize_ecole(detect_etab_from_url(url)), detect_city_from_url(url)
 
 def extract_reviews_diplomeo(soup, url, etab, ville):
-    data = []
-    for li in soup.select(ITEM_SEL_DIP):
-        prenom = clean(li.select_one("h3").get_text() if li.select_one("h3") else "")
-        note = clean(li.select_one('[data-cy="review-commun-list-item-rating"]').get_text()
-                     if li.select_one('[data-cy="review-commun-list-item-rating"]') else "")
-        date_rel = clean(li.select_one('[data-cy="review-commun-list-item-createdAt"]').get_text()
-                         if li.select_one('[data-cy="review-commun-list-item-createdAt"]') else "")
-        txt_long = li.select_one('[data-collapse-target="toCollapse2"]')
-        texte = clean(txt_long.get_text()) if txt_long and clean(txt_long.get_text()) else clean(li.get_text(" ", strip=True))
-        formation = clean(li.select_one('[data-collapse-target="toCollapse"] .tw-text-heading-xs').get_text()
-                          if li.select_one('[data-collapse-target="toCollapse"] .tw-text-heading-xs') else "")
-        annees = re.findall(r"\b(\d{4})\b", date_rel + " " + texte)
-        annee = ", ".join(sorted(set(annees))) if annees else ""
-        if not annee:
-            calc = parse_relative_date(date_rel)
-            if calc:
-                annee = calc
-        data.append({
-            "uid": compute_uid("web", url, prenom, texte),
-            "prenom": prenom,
-            "note": note,
-            "date": date_rel,
-            "annee": annee,
-            "formation": formation,
-            "texte": texte,
-            "url": url,
-            "etablissement": normalize_ecole(etab),
-            "ville": ville,
-            "reponse_1": "",
-            "reponse_2": "",
-            "reponse_3": "",
-            "site": "diplomeo"
-        })
-    return data
-
-def scrape_diplomeo(url):
-    s = requests.Session()
-    s.headers.update(HEADERS)
-    r = s.get(url, timeout=20)
-    r.raise_for_status()
-    soup = BeautifulSoup(r.text, "html.parser")
-    pag_node = soup.select_one('[data-pagination-paginate-path-value]')
-    if not pag_node:
-        return extract_reviews_diplomeo(soup, url, *parse_etablissement_ville_diplomeo(url))
+    return run_spec(SPEC_DIPLOMEO, soup, url, etab, ville)
 
+def plan_diplomeo_pages(pag_node, url, first_page=2):
+    """
+    Lit le nœud de pagination Diplomeo -> URLs des pages first_page..max.
+    Par défaut la page 1 n'est pas replanifiée : c'est la réponse de l'URL de base, déjà en main.
+    """
     paginate_path = pag_node.get("data-pagination-paginate-path-value")
     page_param = pag_node.get("data-pagination-page-parameter-value") or "page"
     max_value = pag_node.get("data-pagination-page-max-value") or 50
@@ -274,20 +668,58 @@ def scrape_diplomeo(url):
         max_value = int(max_value)
     except Exception:
         max_value = 50
+    base = urljoin(url, paginate_path)
+    return [set_query_param(base, page_param, p) for p in range(first_page, max_value + 1)]
 
+def iter_pages_windowed(fetch_page, page_urls, window=DEFAULT_PAGE_WINDOW):
+    """
+    Récupère les pages en parallèle, au plus `window` requêtes en vol.
+    fetch_page(u) -> liste d'avis (vide / None = fin de pagination).
+    Les pages sont rendues une à une dans l'ordre et s'arrêtent à la 1re page vide :
+    les pages précédentes sont conservées, les suivantes (déjà lancées) ignorées.
+    """
+    window = max(1, int(window or 1))
+    pending = iter(page_urls)
+    with ThreadPoolExecutor(max_workers=window, thread_name_prefix="diplomeo-page") as ex:
+        in_flight = deque(ex.submit(fetch_page, u) for u in islice(pending, window))
+        try:
+            while in_flight:
+                chunk = in_flight.popleft().result()
+                if not chunk:
+                    break
+                nxt = next(pending, None)
+                if nxt is not None:
+                    in_flight.append(ex.submit(fetch_page, nxt))
+                yield chunk
+        finally:
+            # fin de pagination ou générateur abandonné : les pages lancées en trop sont ignorées
+            for fut in in_flight:
+                fut.cancel()
+
+def iter_diplomeo(url, page_window=DEFAULT_PAGE_WINDOW):
+    """Avis Diplomeo d'une URL, page par page (une liste d'avis par page)."""
+    s = get_session(url)
+    r = http_get(s, url, timeout=20)
+    r.raise_for_status()
+    soup = make_soup(r.text)
     etab, ville = parse_etablissement_ville_diplomeo(url)
-    all_reviews = []
-    for p in range(1, max_value + 1):
-        page_url = set_query_param(urljoin(url, paginate_path), page_param, p)
-        rr = s.get(page_url, timeout=20)
+    first = extract_reviews_diplomeo(soup, url, etab, ville)
+    if first:
+        yield first
+    pag_node = soup.select_one('[data-pagination-paginate-path-value]')
+    if not pag_node:
+        return
+
+    def fetch_page(page_url):
+        rr = http_get(s, page_url, timeout=20)
         if rr.status_code != 200:
-            break
-        page_soup = BeautifulSoup(rr.text, "html.parser")
-        chunk = extract_reviews_diplomeo(page_soup, url, etab, ville)
-        if not chunk:
-            break
-        all_reviews.extend(chunk)
-    return all_reviews
+            return []
+        return extract_reviews_diplomeo(make_soup(rr.text), url, etab, ville)
+
+    # Page de base sans avis : on repasse par le chemin de pagination dès la page 1
+    first_page = 2 if first else 1
+    pages = plan_diplomeo_pages(pag_node, url, first_page=first_page)
+    yield from iter_pages_windowed(fetch_page, pages, page_window)
 
 # === CAPITAINE STUDY ===
 def extract_etab_ville_capstudy(soup):
@@ -301,76 +733,33 @@ def extract_etab_ville_capstudy(soup):
     return "", ""
 
 def extract_reviews_capstudy(soup, url):
-    reviews, current_review = [], None
-    etab, ville = extract_etab_ville_capstudy(soup)
-    for bloc in soup.select("li.comment"):
-        classes = set(bloc.get("class", []))
-        is_reply = "reply" in classes or bloc.find_parent("ul", class_="replies")
-        texte = clean(" ".join(p.get_text(" ", strip=True) for p in bloc.select("div.comment-body p")))
-        if is_reply:
-            if current_review and texte:
-                for i in range(1, 4):
-                    if not current_review.get(f"reponse_{i}"):
-                        current_review[f"reponse_{i}"] = texte
-                        break
-            continue
+    return run_spec(SPEC_CAPSTUDY, soup, url)
 
-        prenom = clean(bloc.select_one("h5.case27-secondary-text").get_text()) if bloc.select_one("h5.case27-secondary-text") else ""
-        date_rel = clean(bloc.select_one("span.comment-date").get_text()) if bloc.select_one("span.comment-date") else ""
-        annees = re.findall(r"\b(\d{4})\b", date_rel)
-        annee = ", ".join(annees) if annees else ""
-
-        note_val = 0.0
-        for i in bloc.select("div.listing-rating i, div.listing-review-rating i"):
-            classes = set(i.get("class", []))
-            if "star_half" in classes:
-                note_val += 0.5
-            elif "star" in classes and "star_border" not in classes:
-                note_val += 1.0
-        note = "pas de note" if note_val == 0 else str(note_val)
-
-        current_review = {
-            "uid": compute_uid("web", url, prenom, texte),
-            "prenom": prenom,
-            "note": note,
-            "date": date_rel,
-            "annee": annee,
-            "formation": "",
-            "texte": texte,
-            "url": url,
-            "etablissement": normalize_ecole(etab),
-            "ville": ville,
-            "reponse_1": "",
-            "reponse_2": "",
-            "reponse_3": "",
-            "site": "capitainestudy"
-        }
-        reviews.append(current_review)
-    return reviews
-
-def scrape_capstudy(url):
-    s = requests.Session()
-    s.headers.update(HEADERS)
-    page, all_reviews, seen = 1, [], set()
+def iter_capstudy(url, known=None, stop_after=DEFAULT_KNOWN_PAGES_STOP):
+    """Avis CapitaineStudy d'une URL, page par page (avis pas encore vus dans l'URL)."""
+    s = get_session(url)
+    page, seen = 1, set()
+    known_streak = 0
     while True:
         u = url if page == 1 else set_query_param(url, "page", page)
-        r = s.get(u, timeout=20)
+        r = http_get(s, u, timeout=20)
         if r.status_code != 200:
             break
-        soup = BeautifulSoup(r.text, "html.parser")
+        soup = make_soup(r.text)
         reviews = extract_reviews_capstudy(soup, url)
-        new_count = 0
+        fresh = []
         for r in reviews:
             if r["uid"] in seen:
                 continue
             seen.add(r["uid"])
-            all_reviews.append(r)
-            new_count += 1
-        if new_count == 0:
+            fresh.append(r)
+        if not fresh:
+            break
+        yield fresh
+        known_streak = known_streak + 1 if known and known.all_known(reviews) else 0
+        if known and known_streak >= stop_after:
             break
         page += 1
-        time.sleep(1)
-    return all_reviews
 
 # === CUSTPLACE ===
 def parse_etab_ville_cust(url):
@@ -397,74 +786,481 @@ def resolve_etab_ville(url):
     return normalize_ecole(etab), (ville or "").lower()
 
 def extract_reviews_cust(soup, url, etab, ville):
-    reviews = []
-    blocs = soup.select("article[data-view^='message']")
-    for bloc in blocs:
-        note, texte, prenom, date_rel, annee = "", "", "", "", ""
-        note_tag = bloc.select_one("div.aggregateRating")
-        if note_tag:
-            m = re.search(r"s-(\d+)", " ".join(note_tag.get("class", [])))
-            if m:
-                note = m.group(1)
-
-        txt_tag = bloc.select_one("p.mb-3")
-        if txt_tag:
-            texte = clean(txt_tag.get_text(" ", strip=True))
-
-        prenom_tag = bloc.select_one("span.opacity-60")
-        if prenom_tag:
-            prenom = clean(prenom_tag.get_text()).replace("Par ", "")
-
-        date_tag = bloc.find("span", string=lambda x: x and "expérience" in x.lower())
-        if date_tag:
-            date_rel = clean(date_tag.get_text())
-            m = re.search(r"(\d{4})", date_rel)
-            if m:
-                annee = m.group(1)
-
-        if prenom or texte:
-            reviews.append({
-                "uid": compute_uid("web", url, prenom, texte),
-                "prenom": prenom,
-                "note": note if note else "pas de note",
-                "date": date_rel,
-                "annee": annee,
-                "formation": "",
-                "texte": texte,
-                "url": url,
-                "etablissement": normalize_ecole(etab),
-                "ville": ville,
-                "reponse_1": "",
-                "reponse_2": "",
-                "reponse_3": "",
-                "site": "custplace"
-            })
-    return reviews
+    return run_spec(SPEC_CUST, soup, url, etab, ville)
 
-def scrape_cust(url):
-    s = requests.Session()
-    s.headers.update({**HEADERS, "Connection": "keep-alive"})
+def iter_cust(url, known=None, stop_after=DEFAULT_KNOWN_PAGES_STOP):
+    """Avis Custplace d'une URL, page par page (avis pas encore vus dans l'URL)."""
+    s = get_session(url)
     etab, ville = resolve_etab_ville(url)
-    page, all_reviews, seen = 1, [], set()
+    page, seen = 1, set()
+    known_streak = 0
     while True:
         u = url if page == 1 else set_query_param(url, "page", page)
-        r = s.get(u, timeout=30)
+        r = http_get(s, u, timeout=30)
         if r.status_code != 200:
             break
-        soup = BeautifulSoup(r.text, "html.parser")
+        soup = make_soup(r.text)
         reviews = extract_reviews_cust(soup, url, etab, ville)
-        new_count = 0
+        fresh = []
         for r in reviews:
             if r["uid"] in seen:
                 continue
             seen.add(r["uid"])
-            all_reviews.append(r)
-            new_count += 1
-        if new_count == 0:
+            fresh.append(r)
+        if not fresh:
+            break
+        yield fresh
+        known_streak = known_streak + 1 if known and known.all_known(reviews) else 0
+        if known and known_streak >= stop_after:
             break
         page += 1
-        time.sleep(1.5 + random.random())
-    return all_reviews
+
+# === EXTRACTION DÉCLARATIVE ===
+# Chaque plateforme est décrite par une ExtractionSpec compilée une seule fois à l'import :
+# sélecteur des blocs d'avis + champs (sélecteur, lecture, post-traitement, fallback).
+# run_spec() évalue chaque sélecteur UNE fois par bloc, quel que soit le backend HTML.
+YEAR_RE = re.compile(r"\b(\d{4})\b")
+FIRST_YEAR_RE = re.compile(r"(\d{4})")
+CUST_NOTE_RE = re.compile(r"s-(\d+)")
+
+def _read_text(node):
+    return node.get_text()
+
+def _read_text_strip(node):
+    return node.get_text(" ", strip=True)
+
+def _read_classes(node):
+    return node.get("class", [])
+
+READERS = {"text": _read_text, "text_strip": _read_text_strip, "classes": _read_classes}
+
+class Field:
+    """
+    Un champ d'avis.
+    - selector : CSS évalué une fois par bloc (None = le bloc lui-même)
+    - read     : "text" | "text_strip" | "classes" | callable(node)
+    - many     : True -> select() et post reçoit la liste des lectures
+    - post     : post-traitement de la lecture (clean par défaut)
+    - fallback : valeur (ou callable(bloc)) si rien n'est trouvé / résultat vide
+    """
+
+    __slots__ = ("name", "selector", "read", "many", "post", "fallback", "_compiled")
+
+    def __init__(self, name, selector=None, read="text", many=False, post=clean, fallback=""):
+        self.name = name
+        self.selector = selector
+        self.read = READERS[read] if isinstance(read, str) else read
+        self.many = many
+        self.post = post
+        self.fallback = fallback
+        # précompilation soupsieve pour les arbres bs4 (html.parser / lxml)
+        self._compiled = soupsieve.compile(selector) if selector else None
+
+    def _select(self, node):
+        if isinstance(node, Tag):
+            return self._compiled.select(node) if self.many else self._compiled.select_one(node)
+        return node.select(self.selector) if self.many else node.select_one(self.selector)
+
+    def extract(self, node):
+        if self.selector is None:
+            value = self.read(node)
+        else:
+            found = self._select(node)
+            if self.many:
+                value = [self.read(n) for n in found]
+            else:
+                value = self.read(found) if found is not None else None
+        if value is not None and self.post is not None:
+            value = self.post(value)
+        if value is None or value == "":
+            return self.fallback(node) if callable(self.fallback) else self.fallback
+        return value
+
+class ExtractionSpec:
+    """
+    Description d'une plateforme.
+    - item      : sélecteur CSS d'un bloc d'avis
+    - fields    : liste de Field
+    - build     : build(values, url, ctx) -> dict d'avis (ou None pour ignorer le bloc)
+    - context   : context(soup, url, etab, ville) -> dict de page (par défaut etab/ville reçus)
+    - is_reply  : is_reply(bloc) -> True si le bloc est une réponse au dernier avis
+    - reply     : Field lu sur les blocs réponse -> reponse_1..3 du dernier avis
+    """
+
+    def __init__(self, site, item, fields, build, context=None, is_reply=None, reply=None):
+        self.site = site
+        self.item = item
+        self.fields = tuple(fields)
+        self.build = build
+        self.context = context
+        self.is_reply = is_reply
+        self.reply = reply
+        self._item_compiled = soupsieve.compile(item)
+
+    def items(self, soup):
+        if isinstance(soup, Tag):
+            return self._item_compiled.select(soup)
+        return soup.select(self.item)
+
+def review_record(site, url, etab, ville, prenom="", note="", date="", annee="", formation="", texte=""):
+    return {
+        "uid": compute_uid("web", url, prenom, texte),
+        "prenom": prenom,
+        "note": note,
+        "date": date,
+        "annee": annee,
+        "formation": formation,
+        "texte": texte,
+        "url": url,
+        "etablissement": normalize_ecole(etab),
+        "ville": ville,
+        "reponse_1": "",
+        "reponse_2": "",
+        "reponse_3": "",
+        "site": site,
+    }
+
+def run_spec(spec, soup, url, etab="", ville=""):
+    """Exécute une ExtractionSpec sur une page -> liste d'avis (même format pour toutes les plateformes)."""
+    ctx = spec.context(soup, url, etab, ville) if spec.context else {"etab": etab, "ville": ville}
+    reviews, current = [], None
+    for node in spec.items(soup):
+        if spec.is_reply is not None and spec.is_reply(node):
+            if current is not None:
+                texte = spec.reply.extract(node)
+                if texte:
+                    for i in range(1, 4):
+                        if not current.get(f"reponse_{i}"):
+                            current[f"reponse_{i}"] = texte
+                            break
+            continue
+        values = {f.name: f.extract(node) for f in spec.fields}
+        rec = spec.build(values, url, ctx)
+        if rec is not None:
+            reviews.append(rec)
+            current = rec
+    return reviews
+
+# ---- Diplomeo
+def _build_diplomeo(v, url, ctx):
+    annees = YEAR_RE.findall(v["date"] + " " + v["texte"])
+    annee = ", ".join(sorted(set(annees))) if annees else ""
+    if not annee:
+        annee = parse_relative_date(v["date"]) or ""
+    return review_record("diplomeo", url, ctx["etab"], ctx["ville"], prenom=v["prenom"], note=v["note"],
+                         date=v["date"], annee=annee, formation=v["formation"], texte=v["texte"])
+
+SPEC_DIPLOMEO = ExtractionSpec(
+    site="diplomeo",
+    item=ITEM_SEL_DIP,
+    fields=[
+        Field("prenom", "h3"),
+        Field("note", '[data-cy="review-commun-list-item-rating"]'),
+        Field("date", '[data-cy="review-commun-list-item-createdAt"]'),
+        Field("texte", '[data-collapse-target="toCollapse2"]',
+              fallback=lambda li: clean(li.get_text(" ", strip=True))),
+        Field("formation", '[data-collapse-target="toCollapse"] .tw-text-heading-xs'),
+    ],
+    build=_build_diplomeo,
+)
+
+# ---- CapitaineStudy
+def _capstudy_note(classes_per_icon):
+    note_val = 0.0
+    for classes in classes_per_icon:
+        classes = set(classes)
+        if "star_half" in classes:
+            note_val += 0.5
+        elif "star" in classes and "star_border" not in classes:
+            note_val += 1.0
+    return "pas de note" if note_val == 0 else str(note_val)
+
+def _capstudy_is_reply(bloc):
+    return "reply" in bloc.get("class", []) or bloc.find_parent("ul", class_="replies") is not None
+
+def _capstudy_context(soup, url, etab, ville):
+    etab, ville = extract_etab_ville_capstudy(soup)
+    return {"etab": etab, "ville": ville}
+
+def _build_capstudy(v, url, ctx):
+    return review_record("capitainestudy", url, ctx["etab"], ctx["ville"], prenom=v["prenom"], note=v["note"],
+                         date=v["date"], annee=", ".join(YEAR_RE.findall(v["date"])), texte=v["texte"])
+
+CAPSTUDY_TEXTE = Field("texte", "div.comment-body p", read="text_strip", many=True,
+                       post=lambda parts: clean(" ".join(parts)))
+
+SPEC_CAPSTUDY = ExtractionSpec(
+    site="capitainestudy",
+    item="li.comment",
+    fields=[
+        CAPSTUDY_TEXTE,
+        Field("prenom", "h5.case27-secondary-text"),
+        Field("date", "span.comment-date"),
+        Field("note", "div.listing-rating i, div.listing-review-rating i", read="classes", many=True,
+              post=_capstudy_note),
+    ],
+    build=_build_capstudy,
+    context=_capstudy_context,
+    is_reply=_capstudy_is_reply,
+    reply=CAPSTUDY_TEXTE,
+)
+
+# ---- Custplace
+def _cust_note(classes):
+    m = CUST_NOTE_RE.search(" ".join(classes))
+    return m.group(1) if m else ""
+
+def _cust_experience_text(bloc):
+    span = bloc.find("span", string=lambda x: x and "expérience" in x.lower())
+    return span.get_text() if span is not None else None
+
+def _build_cust(v, url, ctx):
+    if not (v["prenom"] or v["texte"]):
+        return None
+    m = FIRST_YEAR_RE.search(v["date"])
+    return review_record("custplace", url, ctx["etab"], ctx["ville"], prenom=v["prenom"],
+                         note=v["note"] or "pas de note", date=v["date"], annee=m.group(1) if m else "",
+                         texte=v["texte"])
+
+SPEC_CUST = ExtractionSpec(
+    site="custplace",
+    item="article[data-view^='message']",
+    fields=[
+        Field("note", "div.aggregateRating", read="classes", post=_cust_note),
+        Field("texte", "p.mb-3", read="text_strip"),
+        Field("prenom", "span.opacity-60", post=lambda t: clean(t).replace("Par ", "")),
+        Field("date", read=_cust_experience_text),
+    ],
+    build=_build_cust,
+)
+
+# === DISPATCH PAR PLATEFORME ===
+def iter_url(url, settings=None, known=None, stop_after=DEFAULT_KNOWN_PAGES_STOP):
+    """
+    Avis d'une URL page par page (générateur : une liste d'avis par page).
+    known : KnownReviews (mode incrémental) -> CapitaineStudy / Custplace arrêtent de paginer
+    après `stop_after` pages consécutives ne contenant que des avis déjà dans le sheet.
+    """
+    if "diplomeo.com" in url:
+        window = host_setting(settings or {}, host_of(url), "page_window", DEFAULT_PAGE_WINDOW)
+        return iter_diplomeo(url, page_window=window)
+    if "capitainestudy" in url:
+        return iter_capstudy(url, known=known, stop_after=stop_after)
+    if "custplace" in url:
+        return iter_cust(url, known=known, stop_after=stop_after)
+    return iter(())
+
+# === MODE INCRÉMENTAL ===
+class KnownReviews:
+    """
+    Instantané (lecture seule) de l'index du sheet, partagé avec les threads de scraping.
+    Un avis est « connu » quand run() n'aurait rien à en faire :
+    uid exact déjà présent, ou soft key présente avec la même date/année.
+    """
+
+    def __init__(self, existing_uid, existing_soft):
+        if isinstance(existing_uid, UidView):
+            # index compact : copie des seuls ajouts du run, les tableaux sont partagés
+            snap = existing_uid.index.snapshot()
+            self.uids, self.soft = UidView(snap), SoftView(snap)
+            return
+        self.uids = frozenset(existing_uid)
+        self.soft = dict(existing_soft)
+
+    def is_known(self, review) -> bool:
+        if review["uid"] in self.uids:
+            return True
+        sk = soft_key_from_values(review.get("site", ""), review.get("prenom", ""), review.get("texte", ""))
+        info = self.soft.get(sk)
+        return info is not None and (info["date"], info["annee"]) == (
+            review.get("date", "") or "", review.get("annee", "") or ""
+        )
+
+    def all_known(self, reviews) -> bool:
+        return bool(reviews) and all(self.is_known(r) for r in reviews)
+
+def _incremental_settings(cfg: dict) -> dict:
+    conf = ((cfg or {}).get("scraping") or {}).get("incremental") or {}
+    return {
+        "enabled": bool(conf.get("enabled", False)),
+        "stop_after": max(1, int(conf.get("known_pages_stop", DEFAULT_KNOWN_PAGES_STOP))),
+        "full_sweep_days": float(conf.get("full_sweep_every_days", DEFAULT_FULL_SWEEP_DAYS)),
+    }
+
+def _load_sweep_state() -> dict:
+    try:
+        with open(FULL_SWEEP_FILE, "r", encoding="utf-8") as f:
+            return json.load(f) or {}
+    except Exception:
+        return {}
+
+def _save_sweep_state(state: dict):
+    folder = os.path.dirname(FULL_SWEEP_FILE)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(FULL_SWEEP_FILE, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+
+def _needs_full_sweep(ecole: str, incremental: dict, force=False) -> bool:
+    """Collecte complète si forcée, si l'incrémental est off, ou si la dernière date de plus de N jours."""
+    if force or not incremental["enabled"]:
+        return True
+    last = _load_sweep_state().get(ecole)
+    if not last:
+        return True
+    try:
+        age = datetime.now() - datetime.fromisoformat(last)
+    except Exception:
+        return True
+    return age.total_seconds() >= incremental["full_sweep_days"] * 86400
+
+_SWEEP_LOCK = threading.Lock()  # écoles en parallèle : lecture/écriture du fichier sérialisées
+
+def _record_full_sweep(ecole: str):
+    with _SWEEP_LOCK:
+        state = _load_sweep_state()
+        state[ecole] = datetime.now().isoformat(timespec="seconds")
+        _save_sweep_state(state)
+
+# === SCRAPING CONCURRENT PAR HÔTE ===
+def host_of(url: str) -> str:
+    return (urlparse(url).netloc or "").lower()
+
+def _host_settings(cfg: dict) -> dict:
+    """Lit la section optionnelle `scraping.hosts` du YAML -> {hôte: {réglages}}."""
+    hosts = ((cfg or {}).get("scraping") or {}).get("hosts") or {}
+    return {str(h).strip().lower(): (v or {}) for h, v in hosts.items()}
+
+def host_setting(settings: dict, host: str, key: str, default=None):
+    """
+    Réglage d'un hôte. 'diplomeo.com' couvre aussi 'www.diplomeo.com'
+    (match exact d'abord, puis suffixe de domaine).
+    """
+    conf = settings.get(host)
+    if conf is None:
+        for name, c in settings.items():
+            if host.endswith("." + name):
+                conf = c
+                break
+    value = (conf or {}).get(key)
+    return default if value is None else value
+
+class HostPools:
+    """
+    Un pool de threads par hôte, plafonné par `concurrency`.
+    Des hôtes différents tournent en parallèle, un même hôte ne dépasse jamais sa limite.
+    """
+
+    def __init__(self, settings=None, default_concurrency=DEFAULT_HOST_CONCURRENCY):
+        self.settings = settings or {}
+        self.default_concurrency = default_concurrency
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _pool_for(self, host):
+        with self._lock:
+            pool = self._pools.get(host)
+            if pool is None:
+                limit = host_setting(self.settings, host, "concurrency", self.default_concurrency)
+                try:
+                    limit = max(1, int(limit))
+                except Exception:
+                    limit = self.default_concurrency
+                pool = ThreadPoolExecutor(max_workers=limit, thread_name_prefix=f"scrape-{host}")
+                self._pools[host] = pool
+            return pool
+
+    def submit(self, url, fn, *args, **kwargs):
+        return self._pool_for(host_of(url)).submit(fn, *args, **kwargs)
+
+    def shutdown(self):
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+class PageStream:
+    """
+    Pages d'avis d'une URL (générateur iter_url) avancées une à une dans le pool de son hôte.
+    Au plus `max_pages` pages attendent en mémoire : tampon plein -> le générateur n'est plus
+    relancé tant que le consommateur n'a pas repris une page (backpressure). Les threads des
+    pools ne bloquent jamais sur le consommateur (pas d'interblocage entre écoles parallèles).
+    Itérer sur le flux rend les pages dans l'ordre ; une erreur du scraping arrête le flux
+    après les pages déjà lues et reste disponible dans `error`.
+    """
+
+    def __init__(self, pools, url, pages, max_pages=DEFAULT_STREAM["buffer_pages"]):
+        self.pools = pools
+        self.url = url
+        self.pages = pages
+        self.max_pages = max(1, int(max_pages))
+        self.buffer = deque()
+        self.error = None
+        self.finished = False
+        self.running = False
+        self._cond = threading.Condition()
+
+    def start(self):
+        with self._cond:
+            self._schedule()
+        return self
+
+    def _schedule(self):
+        # appelé sous self._cond : une seule étape du générateur en vol à la fois
+        if not self.running and not self.finished and len(self.buffer) < self.max_pages:
+            self.running = True
+            self.pools.submit(self.url, self._step)
+
+    def _step(self):
+        chunk, done, error = None, False, None
+        try:
+            chunk = next(self.pages)
+        except StopIteration:
+            done = True
+        except Exception as e:
+            done, error = True, e
+        with self._cond:
+            self.running = False
+            if self.finished:  # flux fermé par le consommateur pendant l'étape
+                self.pages.close()
+                return
+            if chunk is not None:
+                self.buffer.append(chunk)
+            if done:
+                self.finished, self.error = True, error
+            else:
+                self._schedule()
+            self._cond.notify_all()
+
+    def __iter__(self):
+        while True:
+            with self._cond:
+                while not self.buffer and not self.finished:
+                    self._cond.wait()
+                if not self.buffer:
+                    return
+                chunk = self.buffer.popleft()
+                self._schedule()
+            yield chunk
+
+    def close(self):
+        """Abandonne le flux (pages en attente jetées, générateur fermé)."""
+        with self._cond:
+            if self.finished and not self.buffer:
+                return
+            self.finished = True
+            self.buffer.clear()
+            if not self.running:
+                self.pages.close()
+            self._cond.notify_all()
+
+def _stream_settings(cfg: dict) -> dict:
+    conf = ((cfg or {}).get("scraping") or {}).get("stream") or {}
+    return {
+        "buffer_pages": max(1, int(conf.get("buffer_pages", DEFAULT_STREAM["buffer_pages"]))),
+        "flush_rows": max(1, int(conf.get("flush_rows", DEFAULT_STREAM["flush_rows"]))),
+        "flush_seconds": float(conf.get("flush_seconds", DEFAULT_STREAM["flush_seconds"])),
+    }
 
 # === CHARGEMENT YAML ===
 def _load_yaml():
@@ -497,7 +1293,12 @@ def _select_ecoles(ECOLES: dict, school_filter=None, ecoles_choisies=None):
     return keys
 
 # === MAIN (pour launcher) ===
-def run(logger=print, school_filter=None, ecoles_choisies=None):
+def run(logger=print, school_filter=None, ecoles_choisies=None, full_sweep=False, resume=False):
+    """
+    full_sweep=True : ignore le mode incrémental et repagine tout (rattrape les avis modifiés).
+    resume=True     : reprend les écoles interrompues (point de reprise dans .cache/checkpoints) :
+                      écritures en attente rejouées, URLs déjà terminées sautées.
+    """
     cfg = _load_yaml()
     ECOLES = cfg["ecoles"]
 
@@ -508,144 +1309,330 @@ def run(logger=print, school_filter=None, ecoles_choisies=None):
 
     logger(f"🎯 Filtre école: {school_filter or 'TOUTES'} | Écoles traitées: {', '.join(selected_keys)}")
 
+    settings = _host_settings(cfg)
+    pools = HostPools(settings)
+    cache = configure_http_cache(cfg, settings)
+    incremental = _incremental_settings(cfg)
+    parser = configure_parser(cfg)
+    wanted_parser = (cfg.get("scraping") or {}).get("parser")
+    if wanted_parser and wanted_parser != parser:
+        logger(f"⚠️ Parser HTML '{wanted_parser}' indisponible → {parser}")
+    stream = _stream_settings(cfg)
+    near_dup = near_dup_settings(cfg)
+    index = _index_settings(cfg)
+    sessions = configure_sessions(cfg, settings)
+    limits = configure_rate_limits(cfg, settings)
+    writes = configure_scheduler(cfg)
+    store = open_store(cfg)
     for ecole in selected_keys:
-        block = ECOLES[ecole] or {}
-        sheet_id = block.get("sheet_id", "").strip()
-        urls = block.get("urls", []) or []
-        if not sheet_id or not urls:
-            logger(f"⚠️ Bloc ignoré ({ecole}) — sheet_id ou urls manquants.")
+        for url in (ECOLES[ecole] or {}).get("urls", []) or []:
+            sessions.mount(host_of(url))
+    stats_before = sessions.stats()
+
+    def run_one(ecole, log):
+        full = _needs_full_sweep(ecole, incremental, force=full_sweep)
+        failed = _run_school(ecole, ECOLES[ecole], pools, log,
+                             incremental=None if full else incremental, store=store, stream=stream, resume=resume,
+                             near_dup=near_dup, index=index)
+        # une collecte complète avec des URLs en erreur ne compte pas : ces pages seront repaginées
+        if full and incremental["enabled"] and not failed:
+            _record_full_sweep(ecole)
+
+    workers = min(len(selected_keys), _school_workers(cfg))
+    try:
+        if workers <= 1:
+            for ecole in selected_keys:
+                run_one(ecole, logger)
+        else:
+            logger(f"🧵 {workers} école(s) en parallèle")
+            _run_schools_parallel(selected_keys, run_one, workers, logger)
+    finally:
+        pools.shutdown()
+        if store is not None:
+            store.close()
+        logger(f"🔌 Connexions HTTP : {reuse_summary(stats_before, sessions.stats())}")
+        if limits is not None:
+            logger(f"🚦 Débit : {limits.summary()}")
+        logger(f"📝 Écritures Sheets : {writes.summary()}")
+        if cache is not None:
+            logger(f"🗄️ Cache HTTP : {cache.summary()}")
+            configure_http_cache(None)
+
+def _school_workers(cfg) -> int:
+    """Taille du pool d'écoles (scraping.schools_concurrency, 1 = en série)."""
+    value = ((cfg or {}).get("scraping") or {}).get("schools_concurrency", DEFAULT_SCHOOL_WORKERS)
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return DEFAULT_SCHOOL_WORKERS
+
+def _run_schools_parallel(ecoles, run_one, workers, logger=print):
+    """
+    Une école par thread (chacune a son index et ses écritures en attente ; les pools HTTP
+    par hôte sont partagés, donc les plafonds par site restent globaux).
+    Les workers ne loggent pas eux-mêmes : leurs messages passent par une file vidée
+    ici, dans le thread appelant (le logger Streamlit n'est utilisable que depuis celui-ci).
+    """
+    events = queue.Queue()
+
+    def worker(ecole):
+        try:
+            run_one(ecole, lambda m: events.put((ecole, m)))
+        finally:
+            events.put((ecole, None))  # fin de l'école
+
+    errors = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ecole") as executor:
+        futures = {executor.submit(worker, ecole): ecole for ecole in ecoles}
+        remaining = len(ecoles)
+        while remaining:
+            ecole, msg = events.get()
+            if msg is None:
+                remaining -= 1
+                continue
+            logger(msg)
+        for fut, ecole in futures.items():
+            exc = fut.exception()
+            if exc is not None:
+                logger(f"❌ {ecole} → erreur: {exc}")
+                errors.append(exc)
+    if errors:
+        raise errors[0]
+
+def diff_reviews(reviews, existing_uid, existing_soft, run_soft_seen, writer, seen_local=None, near=None):
+    """
+    Compare les avis d'une URL (ou d'une page de l'URL) à l'index existant et prépare les
+    écritures dans `writer`. Met à jour existing_uid / existing_soft / run_soft_seen en place.
+    seen_local : uids déjà vus dans l'URL (pages précédentes du même flux).
+    near       : NearDupIndex ; un avis nouveau proche d'un avis connu est noté dans near.flagged
+                 (et n'est pas écrit si near.action == "skip").
+    -> (found, new_here, updated_here)
+    """
+    # 2) dédoublonne localement
+    uniq_url = []
+    if seen_local is None:
+        seen_local = set()
+    for r in reviews:
+        if r["uid"] in seen_local:
             continue
+        seen_local.add(r["uid"])
+        uniq_url.append(r)
 
-        logger(f"\n📚 Collecte pour {ecole}…")
+    found = len(uniq_url)
+    new_here, updated_here = 0, 0
 
-        # --- Préparer le sheet & les index existants
-        sheet = get_sheet(sheet_id)
-        ensure_headers(sheet)
-        header = sheet.row_values(1)
-        col_index = {name: header.index(name) + 1 for name in EXPECTED_HEADERS}  # 1-based
+    # 3) logique nouveau / update / ignore
+    for r in uniq_url:
+        sk = soft_key_from_values(r.get("site", ""), r.get("prenom", ""), r.get("texte", ""))
 
-        existing_uid = set()   # uids exacts (incluant l'URL)
-        existing_soft = {}     # soft_key(site, prenom, texte) -> info(row, date, annee)
-        try:
-            rows = sheet.get_all_records()
-            for i, row in enumerate(rows, start=2):  # data commence à la ligne 2
-                uid_val = str(row.get("uid", "")).strip()
-                if uid_val:
-                    existing_uid.add(uid_val)
-                sk = soft_key_from_values(row.get("site", ""), row.get("prenom", ""), row.get("texte", ""))
-                if sk:
-                    existing_soft[sk] = {
-                        "row": i,
-                        "date": row.get("date", "") or "",
-                        "annee": row.get("annee", "") or "",
-                    }
-        except Exception:
-            pass
+        if sk not in run_soft_seen:
+            run_soft_seen.add(sk)
 
-        # Ces deux listes seront envoyées au sheet APRES toutes les URLs
-        pending_updates = []   # batch_update payloads {range, values}
-        pending_new_rows = []  # lignes complètes à append
+        # déjà vu via uid exact
+        if r["uid"] in existing_uid:
+            continue
 
-        # Totaux par école
-        total_found, total_new, total_updated = 0, 0, 0
+        # existe via soft key ?
+        if sk in existing_soft:
+            info = existing_soft[sk]
+            new_date = r.get("date", "") or ""
+            new_annee = r.get("annee", "") or ""
 
-        # ➜ Uniques DU RUN (dédoublonnés via soft-key site+prenom+texte)
-        run_soft_seen = set()
+            if new_date != info["date"] or new_annee != info["annee"]:
+                rownum = info["row"]
+                if rownum:
+                    writer.update(rownum, {"date": new_date, "annee": new_annee})
+                    updated_here += 1
+
+                    # update cache
+                    existing_soft[sk] = dict(info, date=new_date, annee=new_annee)
+            continue
 
+        # quasi-doublon d'un avis connu (texte retouché / tronqué, autre plateforme)
+        if near is not None and near.check(r) is not None and near.action == "skip":
+            continue
+
+        # nouveau
+        writer.append(r, sk)
+        existing_uid.add(r["uid"])
+        existing_soft[sk] = {
+            "row": None,
+            "date": r.get("date", "") or "",
+            "annee": r.get("annee", "") or "",
+            "uid": r["uid"],
+        }
+        new_here += 1
+
+    return found, new_here, updated_here
+
+def _log_near_dups(url, near, logger, limit=3) -> int:
+    """Log des quasi-doublons repérés sur une URL -> nombre d'avis concernés."""
+    flagged = near.pop_flagged()
+    if flagged:
+        logger(f"🔁 {url} → {len(flagged)} quasi-doublon(s) de texte")
+        for review, key, sim in flagged[:limit]:
+            texte = clean(review.get("texte", ""))
+            texte = texte if len(texte) <= 60 else texte[:60] + "…"
+            where = f"ligne {key}" if isinstance(key, int) else "un avis pas encore dans le sheet"
+            logger(f"   ≈ {sim:.0%} de {where} : « {texte} »")
+    return len(flagged)
+
+def _run_school(ecole, block, pools, logger=print, incremental=None, store=None, stream=None, resume=False,
+                near_dup=None, index=None):
+    """
+    Collecte d'une école en flux : scraping concurrent par hôte, pages diffées dans l'ordre des
+    URLs au fur et à mesure, écritures envoyées par paquets (stream) pendant la collecte.
+    incremental : réglages du mode incrémental (None = collecte complète).
+    store       : ReviewStore local (None = index lu et écrit directement dans le sheet).
+    stream      : réglages scraping.stream (tampon de pages, taille / délai des paquets).
+    resume      : repart du point de reprise de l'école s'il existe (voir checkpoint.py).
+    near_dup    : réglages scraping.near_dup (quasi-doublons de texte, voir near_dup.py).
+    index       : réglages scraping.index (index compact persistant, voir sheet_index.py).
+    -> nombre d'URLs en erreur (0 = collecte complète).
+    """
+    stream = stream or _stream_settings(None)
+    block = block or {}
+    sheet_id = block.get("sheet_id", "").strip()
+    urls = block.get("urls", []) or []
+    if not sheet_id or not urls:
+        logger(f"⚠️ Bloc ignoré ({ecole}) — sheet_id ou urls manquants.")
+        return 0
+
+    logger(f"\n📚 Collecte pour {ecole}…")
+
+    # --- Préparer le sheet & les index existants
+    sheet = get_sheet(sheet_id)
+    ensure_headers(sheet)
+    header = sheet.row_values(1)
+    col_index = {name: header.index(name) + 1 for name in EXPECTED_HEADERS}  # 1-based
+
+    if store is not None:
+        writer = StoreSheetWriter(sheet, col_index, store, sheet_id)
+    else:
+        writer = SheetWriter(sheet, col_index)
+
+    # --- Point de reprise : écritures d'un run interrompu rejouées AVANT de relire l'index
+    previous = RunCheckpoint.load(ecole, sheet_id)
+    if previous is not None and resume:
+        checkpoint = previous
+        replayed = checkpoint.pending_count()
+        writer.restore(checkpoint.pending)
+        writer.flush()
+        checkpoint.save(writer.pending_state())
+        logger(
+            f"💾 {ecole} → reprise du run du {checkpoint.started} : {len(checkpoint.done_urls)} URL(s) déjà faites, "
+            f"{replayed} écriture(s) en attente rejouées"
+        )
+    else:
+        if previous is not None:
+            logger(f"💾 {ecole} → point de reprise du {previous.started} ignoré (relancer en mode reprise pour l'utiliser)")
+        checkpoint = RunCheckpoint(ecole, sheet_id)
+
+    near = NearDupIndex.from_settings(near_dup) if near_dup and near_dup["enabled"] else None
+    sheet_index = None
+    if index and index["enabled"]:
+        sheet_index = load_sheet_index(sheet, sheet_id, header, store, near, index["path"], logger)
+        existing_uid, existing_soft = UidView(sheet_index), SoftView(sheet_index)
+        writer.index = sheet_index
+    elif store is not None:
+        existing_uid, existing_soft = load_existing_index_from_store(store, sheet_id, sheet, header, logger, near)
+    else:
+        existing_uid, existing_soft = load_existing_index(sheet, header, near)
+    near_total = 0
+
+    # Totaux par école
+    total_found, total_new, total_updated = 0, 0, 0
+
+    # ➜ Uniques DU RUN (dédoublonnés via soft-key site+prenom+texte)
+    run_soft_seen = set()
+
+    # 1) Lance le scraping de toutes les URLs (parallèle entre hôtes, plafonné par hôte).
+    #    Les résultats sont consommés ci-dessous dans l'ordre du YAML -> même sortie qu'en série.
+    known, stop_after = None, DEFAULT_KNOWN_PAGES_STOP
+    if incremental:
+        known, stop_after = KnownReviews(existing_uid, existing_soft), incremental["stop_after"]
+        logger(f"⏩ {ecole} → mode incrémental (arrêt après {stop_after} page(s) déjà connues)")
+    streams = {
+        url: PageStream(pools, url, iter_url(url, pools.settings, known, stop_after), stream["buffer_pages"]).start()
+        for url in urls
+        if not checkpoint.is_done(url)
+    }
+
+    failed = 0
+    try:
         for i, url in enumerate(urls, start=1):
-            # 1) Scrape l'URL
-            reviews = []
-            try:
-                if "diplomeo.com" in url:
-                    reviews = scrape_diplomeo(url)
-                elif "capitainestudy" in url:
-                    reviews = scrape_capstudy(url)
-                elif "custplace" in url:
-                    reviews = scrape_cust(url)
-                else:
-                    reviews = []
-            except Exception as e:
-                logger(f"🌍 {url} → ⚠️ erreur: {e}")
-                # ✅ Progression même si erreur
-                logger(f"PROGRESS {i}/{len(urls)}")
+            pages = streams.get(url)
+            if pages is None:
+                logger(f"🌍 {url} → ⏭️ déjà traitée (reprise)")
+                logger(f"PROGRESS {i}/{len(urls)} {ecole}")
                 continue
 
-            # 2) dédoublonne localement
-            uniq_url, seen_local = [], set()
-            for r in reviews:
-                if r["uid"] in seen_local:
-                    continue
-                seen_local.add(r["uid"])
-                uniq_url.append(r)
-
-            found = len(uniq_url)
-            new_here, updated_here = 0, 0
-
-            # 3) logique nouveau / update / ignore
-            for r in uniq_url:
-                sk = soft_key_from_values(r.get("site", ""), r.get("prenom", ""), r.get("texte", ""))
-
-                if sk not in run_soft_seen:
-                    run_soft_seen.add(sk)
-
-                # déjà vu via uid exact
-                if r["uid"] in existing_uid:
-                    continue
-
-                # existe via soft key ?
-                if sk in existing_soft:
-                    info = existing_soft[sk]
-                    new_date = r.get("date", "") or ""
-                    new_annee = r.get("annee", "") or ""
-
-                    if new_date != info["date"] or new_annee != info["annee"]:
-                        rownum = info["row"]
-                        if rownum:
-                            pending_updates.append({
-                                "range": rowcol_to_a1(rownum, col_index["date"]),
-                                "values": [[new_date]],
-                            })
-                            pending_updates.append({
-                                "range": rowcol_to_a1(rownum, col_index["annee"]),
-                                "values": [[new_annee]],
-                            })
-                            updated_here += 1
-
-                            # update cache
-                            existing_soft[sk]["date"] = new_date
-                            existing_soft[sk]["annee"] = new_annee
-                    continue
-
-                # nouveau
-                pending_new_rows.append([r.get(k, "") for k in EXPECTED_HEADERS])
-                existing_uid.add(r["uid"])
-                existing_soft[sk] = {
-                    "row": None,
-                    "date": r.get("date", "") or "",
-                    "annee": r.get("annee", "") or "",
-                }
-                new_here += 1
+            found, new_here, updated_here = 0, 0, 0
+            seen_local = set()
+            for reviews in pages:
+                # 2) + 3) dédoublonnage local puis nouveau / update / ignore, page par page
+                f, n, u = diff_reviews(reviews, existing_uid, existing_soft, run_soft_seen, writer, seen_local, near)
+                found, new_here, updated_here = found + f, new_here + n, updated_here + u
+                # écritures envoyées par paquets pendant la collecte (le point de reprise suit)
+                if writer.flush_if_due(stream["flush_rows"], stream["flush_seconds"]):
+                    checkpoint.save(writer.pending_state())
+            error = pages.error
+            if error is None:
+                checkpoint.mark_done(url, writer.pending_state())
+            else:
+                failed += 1
 
             total_found += found
             total_new += new_here
             total_updated += updated_here
 
-            # 4) Log
-            logger(f"🌍 {url} → {found} avis | +{new_here} nouveaux, ♻️ {updated_here} MAJ")
-            # ✅ PROGRESS : à la fin
-            logger(f"PROGRESS {i}/{len(urls)}")
-
-        # 5) Appliquer d’abord les MAJ, puis les ajouts
-        if pending_updates:
-            sheet.batch_update(pending_updates, value_input_option="RAW")
-        if pending_new_rows:
-            sheet.append_rows(pending_new_rows, value_input_option="RAW")
+            # 4) Log (les pages lues avant une erreur sont conservées)
+            if error is not None and not found:
+                logger(f"🌍 {url} → ⚠️ erreur: {error}")
+            elif error is not None:
+                logger(f"🌍 {url} → ⚠️ erreur: {error} | {found} avis lus avant l'erreur, +{new_here} nouveaux, ♻️ {updated_here} MAJ")
+            else:
+                logger(f"🌍 {url} → {found} avis | +{new_here} nouveaux, ♻️ {updated_here} MAJ")
+            if near is not None:
+                near_total += _log_near_dups(url, near, logger)
+            # ✅ PROGRESS : à la fin, même si erreur (tagué par école : plusieurs écoles en parallèle)
+            logger(f"PROGRESS {i}/{len(urls)} {ecole}")
+
+        # 5) Dernier paquet : d'abord les MAJ, puis les ajouts
+        writer.flush()
+    except BaseException:
+        # interruption (erreur, quota, rerun Streamlit…) : on garde de quoi reprendre
+        checkpoint.save(writer.pending_state())
+        logger(f"💾 {ecole} → point de reprise enregistré ({len(checkpoint.done_urls)}/{len(urls)} URL(s) faites)")
+        raise
+    finally:
+        for pages in streams.values():
+            pages.close()
+
+    if sheet_index is not None:
+        # n° de ligne des avis poussés par le stock, puis jeton du sheet tel que nous l'avons laissé
+        if store is not None:
+            sheet_index.resolve_rows(store.rows_for_uids(sheet_id, sheet_index.new_uids()))
+            fingerprint = None if store.has_pending(sheet_id) else store.fingerprint(sheet_id)
+            sheet_index.token = f"store:{fingerprint}" if fingerprint else None
+        sheet_index.save(near)
+
+    if near_total:
+        verb = "non écrit(s)" if near.action == "skip" else "écrit(s) quand même"
+        logger(f"🔁 {ecole} → {near_total} quasi-doublon(s) de texte {verb} (seuil {near.threshold:.0%})")
+
+    if failed:
+        checkpoint.save(writer.pending_state())
+        logger(f"💾 {ecole} → {failed} URL(s) en erreur : relancer en mode reprise pour les retenter")
+    else:
+        checkpoint.clear()
 
-        # 6) Résumé par école
-        # ➜ Uniques DANS CE RUN (cross-plateformes)
-        uniques_in_run = len(run_soft_seen)
+    # 6) Résumé par école
+    # ➜ Uniques DANS CE RUN (cross-plateformes)
+    uniques_in_run = len(run_soft_seen)
 
-        # (A) Résumé complet
-        logger(
-            f"📊 {ecole} → brut {total_found} | écrit sheet {uniques_in_run} | +{total_new} nouveaux | maj +{total_updated}"
-        )
+    # (A) Résumé complet
+    logger(
+        f"📊 {ecole} → brut {total_found} | écrit sheet {uniques_in_run} | +{total_new} nouveaux | maj +{total_updated}"
+    )
+    return failed
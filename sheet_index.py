@@ -0,0 +1,316 @@
+# sheet_index.py
+# Index compact et persistant d'un onglet, utilisé par le diff de script_web
+# - empreintes binaires 64 bits (blake2b) des uid et des clés souples, triées dans des tableaux
+#   NumPy, avec pour chaque clé souple son n° de ligne (int32) et sa date / année
+# - sauvegardé en .npz (.cache/index/<sheet_id>.npz), avec les signatures MinHash de near_dup
+#   si elles sont activées ; rechargé tel quel au run suivant tant que le jeton de validité n'a
+#   pas bougé, reconstruit sinon (édition manuelle, dédup, tri… faits hors de nos scripts) :
+#     sheet direct : hauteur de la colonne uid + ses TAIL_SIZE derniers uid, prolongés au fil des
+#                    append_rows de nos propres écritures ; vérifié en relisant seulement la fin
+#                    de la colonne (coût fixe, quelle que soit la taille de l'historique). Une ligne
+#                    insérée / supprimée / triée change la fin de colonne ; un uid retouché au
+#                    milieu de l'onglet sans changer sa hauteur n'est pas vu (reconstruction forcée :
+#                    supprimer le .npz, ce que fait python_dedupe_web)
+#     stock SQLite : empreinte du stock (review_store), et aucune écriture en attente
+# - pendant un run : ajouts et MAJ vont dans de petits dicts par-dessus les tableaux (qui ne
+#   bougent pas, KnownReviews peut donc les partager), fusionnés à la sauvegarde
+# UidView / SoftView présentent l'index comme le set `existing_uid` et le dict `existing_soft`
+# attendus par diff_reviews.
+
+import os
+import hashlib
+
+import numpy as np
+
+DEFAULT_INDEX_DIR = os.path.join(".cache", "index")
+INDEX_VERSION = 2
+TAIL_SIZE = 64  # uid de fin de colonne relus pour valider l'index
+
+
+def digest(value) -> int:
+    return int.from_bytes(hashlib.blake2b(str(value).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def digests(values) -> np.ndarray:
+    return np.fromiter((digest(v) for v in values), dtype=np.uint64)
+
+
+def _strip_tail(uids):
+    uids = [str(u or "").strip() for u in uids]
+    while uids and not uids[-1]:
+        uids.pop()
+    return uids
+
+
+def column_token(count, tail) -> str:
+    """Jeton d'une colonne uid de `count` cellules (sans l'entête) finissant par `tail`."""
+    return f"col:{count}:{digest(chr(10).join(tail))}"
+
+
+def column_state(uids):
+    """Colonne uid complète (sans l'entête) -> (hauteur, TAIL_SIZE derniers uid)."""
+    uids = _strip_tail(uids)
+    return len(uids), uids[-TAIL_SIZE:]
+
+
+def tail_start(count) -> int:
+    """1re position (1 = ligne 2) à relire pour vérifier une colonne de `count` cellules."""
+    return max(1, count - TAIL_SIZE + 1)
+
+
+def tail_token(first_pos, values) -> str:
+    """Jeton d'après la fin de colonne relue à partir de la position first_pos."""
+    values = _strip_tail(values)
+    count = first_pos - 1 + len(values) if values else 0
+    return column_token(count, values[-TAIL_SIZE:])
+
+
+def _sorted_lookup(keys, d):
+    i = int(np.searchsorted(keys, np.uint64(d)))
+    return i if i < len(keys) and keys[i] == d else None
+
+
+class SheetIndex:
+    """Clés uid / soft key d'un onglet (voir l'en-tête du module)."""
+
+    def __init__(self, sheet_id, folder=DEFAULT_INDEX_DIR):
+        self.sheet_id = sheet_id
+        self.path = os.path.join(folder, f"{sheet_id}.npz")
+        self.token = None
+        self.tail = []              # derniers uid de la colonne (jeton "col:")
+        self.uid_keys = np.empty(0, dtype=np.uint64)
+        self.soft_keys = np.empty(0, dtype=np.uint64)
+        self.rows = np.empty(0, dtype=np.int32)
+        self.dates = np.empty(0, dtype="U1")
+        self.annees = np.empty(0, dtype="U1")
+        self.near = None            # (signatures, clés, réglages) enregistrés, voir restore_near
+        self._uids = set()          # empreintes uid ajoutées pendant le run
+        self._soft = {}             # empreinte soft key -> {"row", "date", "annee", "uid"} (run)
+
+    def count(self):
+        """Hauteur de la colonne uid couverte par le jeton "col:", sinon None."""
+        if not self.token or not self.token.startswith("col:"):
+            return None
+        return int(self.token.split(":")[1])
+
+    def __len__(self):
+        return len(self.soft_keys) + sum(1 for d in self._soft if _sorted_lookup(self.soft_keys, d) is None)
+
+    # ---- construction ---------------------------------------------------------
+    @classmethod
+    def build(cls, sheet_id, entries, token, folder=DEFAULT_INDEX_DIR, tail=()):
+        """
+        entries = [(row, uid, soft_key, date, annee)] dans l'ordre de l'onglet
+        (row None = avis pas encore dans le sheet). Même règle que l'index en dict :
+        pour une clé souple présente plusieurs fois, la dernière ligne l'emporte.
+        tail = derniers uid de la colonne (jeton "col:", voir column_state).
+        """
+        index = cls(sheet_id, folder)
+        index.token = token
+        index.tail = list(tail)
+        rows, uids, sks, dates, annees = [], [], [], [], []
+        for row, uid, sk, date, annee in entries:
+            uid = str(uid or "").strip()
+            if uid:
+                uids.append(uid)
+            if sk:
+                rows.append(-1 if row is None else int(row))
+                sks.append(sk)
+                dates.append(date or "")
+                annees.append(annee or "")
+        index.uid_keys = np.unique(digests(uids))
+        keys = digests(sks)
+        # dernière occurrence de chaque clé : np.unique sur l'ordre inversé garde la 1re rencontrée
+        uniq, first = np.unique(keys[::-1], return_index=True)
+        last = len(keys) - 1 - first
+        index.soft_keys = uniq
+        index.rows = np.asarray(rows, dtype=np.int32)[last] if len(keys) else index.rows
+        index.dates = np.asarray(dates)[last] if len(keys) else index.dates
+        index.annees = np.asarray(annees)[last] if len(keys) else index.annees
+        return index
+
+    @classmethod
+    def load(cls, sheet_id, folder=DEFAULT_INDEX_DIR):
+        """Index enregistré pour ce sheet, ou None (absent / illisible / autre version)."""
+        index = cls(sheet_id, folder)
+        try:
+            with np.load(index.path, allow_pickle=False) as data:
+                if int(data["version"]) != INDEX_VERSION:
+                    return None
+                index.token = str(data["token"])
+                index.tail = [str(u) for u in data["tail"]]
+                index.uid_keys = data["uid_keys"]
+                index.soft_keys = data["soft_keys"]
+                index.rows = data["rows"]
+                index.dates = data["dates"]
+                index.annees = data["annees"]
+                if "near_sigs" in data:
+                    index.near = (data["near_sigs"], data["near_keys"], tuple(data["near_params"]))
+        except (OSError, KeyError, ValueError):
+            return None
+        return index
+
+    # ---- lecture / écriture pendant le run -------------------------------------
+    def has_uid(self, uid) -> bool:
+        d = digest(str(uid).strip())
+        return d in self._uids or _sorted_lookup(self.uid_keys, d) is not None
+
+    def add_uid(self, uid):
+        self._uids.add(digest(str(uid).strip()))
+
+    def soft_get(self, sk):
+        d = digest(sk)
+        info = self._soft.get(d)
+        if info is not None:
+            return info
+        i = _sorted_lookup(self.soft_keys, d)
+        if i is None:
+            return None
+        row = int(self.rows[i])
+        info = {"row": row if row > 0 else None, "date": str(self.dates[i]), "annee": str(self.annees[i])}
+        return info
+
+    def soft_set(self, sk, info, uid=None):
+        entry = dict(info)
+        if uid is not None:
+            entry["uid"] = uid
+        self._soft[digest(sk)] = entry
+
+    def appended(self, entries, first_row):
+        """
+        Nos lignes ajoutées au sheet : entries = [(uid, soft_key)] dans l'ordre, à partir de
+        first_row (None = n° inconnus -> l'index sera reconstruit au prochain run).
+        """
+        if first_row is not None:
+            for k, (uid, sk) in enumerate(entries):
+                if sk and digest(sk) in self._soft:
+                    self._soft[digest(sk)]["row"] = first_row + k
+        count = self.count()
+        first_pos = first_row - 1 if first_row is not None else None  # ligne 2 = position 1
+        if count is None or first_pos is None or first_pos <= count:
+            self.token = None  # on ne sait plus où en est la colonne -> reconstruction au prochain run
+            return
+        # lignes sans uid entre l'ancienne fin de colonne et l'ajout, puis nos uid
+        added = [""] * (first_pos - count - 1) + [str(uid or "").strip() for uid, _ in entries]
+        known = len(self.tail)  # les `known` dernières cellules des `count` sont dans self.tail
+        height, self.tail = column_state(self.tail + added)
+        self.token = column_token(count - known + height, self.tail)
+
+    def resolve_rows(self, rows_by_uid):
+        """Renseigne les n° de ligne des avis ajoutés pendant le run ({uid: ligne})."""
+        for info in self._soft.values():
+            if info.get("row") is None and info.get("uid") in rows_by_uid:
+                info["row"] = rows_by_uid[info["uid"]]
+
+    def snapshot(self):
+        """Copie en lecture seule (tableaux partagés, ajouts du run copiés) pour les threads de scraping."""
+        snap = SheetIndex(self.sheet_id)
+        snap.uid_keys, snap.soft_keys = self.uid_keys, self.soft_keys
+        snap.rows, snap.dates, snap.annees = self.rows, self.dates, self.annees
+        snap._uids = set(self._uids)
+        snap._soft = {d: dict(info) for d, info in self._soft.items()}
+        return snap
+
+    def new_uids(self):
+        """uid des avis ajoutés pendant le run (pour retrouver leur ligne dans le stock)."""
+        return [info["uid"] for info in self._soft.values() if info.get("row") is None and info.get("uid")]
+
+    # ---- near_dup ----------------------------------------------------------------
+    def restore_near(self, near) -> bool:
+        """Recharge les signatures enregistrées dans `near` si elles ont été faites avec les mêmes réglages."""
+        if self.near is None or tuple(self.near[2]) != near.params():
+            return False
+        near.restore(self.near[0], self.near[1])
+        return True
+
+    # ---- sauvegarde --------------------------------------------------------------
+    def _merged(self):
+        uid_keys = np.union1d(self.uid_keys, np.fromiter(self._uids, dtype=np.uint64, count=len(self._uids)))
+        if not self._soft:
+            return uid_keys, self.soft_keys, self.rows, self.dates, self.annees
+        run_keys = np.fromiter(self._soft, dtype=np.uint64, count=len(self._soft))
+        run_rows = np.array([info["row"] or -1 for info in self._soft.values()], dtype=np.int32)
+        run_dates = np.array([info["date"] or "" for info in self._soft.values()])
+        run_annees = np.array([info["annee"] or "" for info in self._soft.values()])
+        keys = np.concatenate([self.soft_keys, run_keys])
+        uniq, first = np.unique(keys[::-1], return_index=True)
+        last = len(keys) - 1 - first  # les valeurs du run l'emportent sur les tableaux
+        return (
+            uid_keys, uniq,
+            np.concatenate([self.rows, run_rows])[last],
+            np.concatenate([self.dates.astype(str), run_dates.astype(str)])[last],
+            np.concatenate([self.annees.astype(str), run_annees.astype(str)])[last],
+        )
+
+    def save(self, near=None):
+        """Écrit l'index (et les signatures de `near`) ; sans jeton valide, supprime l'ancien fichier."""
+        if not self.token:
+            self.discard()
+            return False
+        uid_keys, soft_keys, rows, dates, annees = self._merged()
+        arrays = {
+            "version": np.array(INDEX_VERSION),
+            "token": np.array(self.token),
+            "tail": np.array(self.tail, dtype=str),
+            "uid_keys": uid_keys,
+            "soft_keys": soft_keys,
+            "rows": rows,
+            "dates": dates,
+            "annees": annees,
+        }
+        if near is not None:
+            # avis du run indexés sous leur uid -> n° de ligne maintenant connu
+            rows_by_uid = {info["uid"]: info["row"] for info in self._soft.values() if info.get("uid")}
+            sigs, keys = near.export(lambda k: rows_by_uid.get(k))
+            arrays.update(near_sigs=sigs, near_keys=keys, near_params=np.array(near.params()))
+
+        folder = os.path.dirname(self.path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, self.path)
+        return True
+
+    def discard(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class UidView:
+    """L'index vu comme le set existing_uid (in / add)."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def __contains__(self, uid):
+        return self.index.has_uid(uid)
+
+    def add(self, uid):
+        self.index.add_uid(uid)
+
+
+class SoftView:
+    """L'index vu comme le dict existing_soft (in / [] / get / affectation)."""
+
+    def __init__(self, index):
+        self.index = index
+
+    def __contains__(self, sk):
+        return self.index.soft_get(sk) is not None
+
+    def __getitem__(self, sk):
+        info = self.index.soft_get(sk)
+        if info is None:
+            raise KeyError(sk)
+        return info
+
+    def get(self, sk, default=None):
+        info = self.index.soft_get(sk)
+        return default if info is None else info
+
+    def __setitem__(self, sk, info):
+        self.index.soft_set(sk, info, info.get("uid"))
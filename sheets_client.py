@@ -0,0 +1,131 @@
+# sheets_client.py
+# Client gspread et handles de classeurs / onglets partagés par tous les modules
+# - un seul client autorisé par process (par source de credentials), jeton rafraîchi s'il a expiré
+# - open_by_key / worksheet() mis en cache par sheet_id : les métadonnées ne sont relues
+#   qu'une fois (ou après HANDLE_TTL secondes, ou invalidate() après un changement de structure)
+# read_columns() : lecture projetée de quelques colonnes en un seul batch_get (en-tête vérifié
+# dans le même appel si on ne l'a pas déjà lu).
+# Credentials : st.secrets["gcp_service_account"] sous Streamlit, sinon fichier service account
+# local ($GSPREAD_SA_JSON ou le chemin passé par le module appelant).
+
+import os
+import time
+import threading
+
+import gspread
+from gspread.utils import rowcol_to_a1
+from google.auth.transport.requests import Request
+
+DEFAULT_CREDENTIALS_FILE = "service_account.json"
+HANDLE_TTL = 15 * 60  # secondes avant de relire les métadonnées d'un classeur
+
+_lock = threading.RLock()
+_clients = {}       # source de credentials -> gspread.Client
+_spreadsheets = {}  # sheet_id -> (Spreadsheet, ouvert à)
+_worksheets = {}    # (sheet_id, titre) -> Worksheet
+
+
+def _streamlit_account():
+    try:
+        import streamlit as st  # import local pour éviter la dépendance hors Streamlit
+        if "gcp_service_account" in st.secrets:
+            return dict(st.secrets["gcp_service_account"])
+    except Exception:
+        # On ignore toute erreur et on retombe sur le mode local
+        pass
+    return None
+
+
+def _refresh_if_expired(client):
+    creds = getattr(getattr(client, "http_client", None), "auth", None)
+    if creds is not None and getattr(creds, "token", None) and getattr(creds, "expired", False):
+        creds.refresh(Request())
+
+
+def get_client(cred_path=None, use_streamlit=True):
+    """Client gspread partagé ; créé au premier appel puis réutilisé (jeton rafraîchi si expiré)."""
+    account = _streamlit_account() if use_streamlit else None
+    if account is not None:
+        key = ("streamlit", account.get("client_email", ""))
+    else:
+        key = ("file", os.getenv("GSPREAD_SA_JSON", cred_path or DEFAULT_CREDENTIALS_FILE))
+
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            if account is not None:
+                client = gspread.service_account_from_dict(account)
+            else:
+                client = gspread.service_account(filename=key[1])
+            _clients[key] = client
+        else:
+            _refresh_if_expired(client)
+        return client
+
+
+def open_spreadsheet(sheet_id, client=None):
+    """Spreadsheet de ce sheet_id (open_by_key une seule fois tant que le handle est frais)."""
+    with _lock:
+        cached = _spreadsheets.get(sheet_id)
+        if cached is not None and time.monotonic() - cached[1] < HANDLE_TTL:
+            return cached[0]
+        sh = (client or get_client()).open_by_key(sheet_id)
+        _spreadsheets[sheet_id] = (sh, time.monotonic())
+        for key in [k for k in _worksheets if k[0] == sheet_id]:
+            del _worksheets[key]
+        return sh
+
+
+def get_worksheet(sheet_id, title="TEST", client=None):
+    """Onglet `title` du classeur (handle mis en cache ; WorksheetNotFound si absent)."""
+    sh = open_spreadsheet(sheet_id, client)
+    with _lock:
+        ws = _worksheets.get((sheet_id, title))
+        if ws is None:
+            ws = sh.worksheet(title)
+            _worksheets[(sheet_id, title)] = ws
+        return ws
+
+
+def remember_worksheet(sheet_id, ws):
+    """Ajoute au cache un onglet créé par l'appelant (add_worksheet)."""
+    with _lock:
+        _worksheets[(sheet_id, ws.title)] = ws
+
+
+def invalidate(sheet_id=None):
+    """Oublie les handles d'un classeur (ou de tous) : métadonnées relues au prochain accès."""
+    with _lock:
+        if sheet_id is None:
+            _spreadsheets.clear()
+            _worksheets.clear()
+            return
+        _spreadsheets.pop(sheet_id, None)
+        for key in [k for k in _worksheets if k[0] == sheet_id]:
+            del _worksheets[key]
+
+
+def read_columns(sheet, header, names, check_header=False):
+    """
+    Lit seulement les colonnes `names` (sans l'en-tête) en un seul batch_get.
+    -> {nom: [valeurs...]} toutes de même longueur, ou None si une colonne manque dans `header`.
+    check_header=True : `header` est l'en-tête attendu, la ligne 1 est relue dans le même batch_get
+    et None est renvoyé si elle ne commence pas par `header` (colonnes déplacées / renommées).
+    """
+    if not header or any(n not in header for n in names):
+        return None
+    ranges = ["1:1"] if check_header else []
+    for n in names:
+        letter = rowcol_to_a1(1, header.index(n) + 1).rstrip("0123456789")
+        ranges.append(f"{letter}2:{letter}")
+    results = sheet.batch_get(ranges, major_dimension="COLUMNS")
+    if check_header:
+        # ligne 1 lue par colonnes : une liste (vide si cellule vide) par colonne
+        first = [str(c[0]).strip() if c else "" for c in results[0]]
+        if first[:len(header)] != list(header):
+            return None
+        results = results[1:]
+    # une colonne vide revient sans valeurs ; les cellules vides en fin de colonne sont omises
+    cols = [list(vr[0]) if vr else [] for vr in results]
+    height = max((len(c) for c in cols), default=0)
+    return {n: c + [""] * (height - len(c)) for n, c in zip(names, cols)}
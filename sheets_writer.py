@@ -0,0 +1,248 @@
+# sheets_writer.py
+# Ordonnanceur des écritures Google Sheets, partagé par tous les modules
+# - les écritures sont mises en file par classeur (spreadsheet) au lieu d'être envoyées une à une
+# - flush() fusionne les opérations consécutives de même nature :
+#     MAJ de valeurs       -> un seul values.batchUpdate
+#     requêtes structure   -> un seul spreadsheets.batchUpdate (deleteDimension, addSheet…)
+#   l'ordre relatif entre les deux natures est conservé
+# - quota suivi localement (écritures sur les 60 dernières secondes) : on attend juste ce qu'il
+#   faut avant de dépasser `writes_per_minute`, au lieu de se prendre un 429
+# - 429 / 5xx : nouvelle tentative après Retry-After, sinon quand la fenêtre de quota se libère
+#   (backoff exponentiel avec jitter pour les 5xx)
+# - append_rows (values.append, non idempotent) n'est retenté que sur 429 (requête refusée avant
+#   exécution) : après un 5xx les lignes ont pu être ajoutées, l'erreur remonte et c'est le point
+#   de reprise / le stock qui rejoue l'écriture
+# Réglages : section `sheets` du YAML (writes_per_minute, max_retries).
+
+import time
+import random
+import threading
+from collections import deque
+
+from gspread.exceptions import APIError
+from gspread.utils import absolute_range_name
+
+DEFAULT_WRITES_PER_MINUTE = 60   # quota Sheets par défaut : 60 écritures / minute / utilisateur
+DEFAULT_MAX_RETRIES = 5
+MAX_VALUE_RANGES = 5000          # ranges par values.batchUpdate
+MAX_REQUESTS = 500               # requêtes par spreadsheets.batchUpdate
+QUOTA_WINDOW = 60.0
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+APPEND_RETRY_STATUSES = (429,)   # seuls cas où l'on sait que values.append n'a rien écrit
+
+
+def _status_of(error):
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def _retry_after_of(error):
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class WriteQuota:
+    """Compteur glissant des écritures envoyées sur la dernière minute."""
+
+    def __init__(self, per_minute=DEFAULT_WRITES_PER_MINUTE, window=QUOTA_WINDOW):
+        self.per_minute = max(1, int(per_minute))
+        self.window = float(window)
+        self.sent = deque()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _purge(self, now):
+        while self.sent and now - self.sent[0] >= self.window:
+            self.sent.popleft()
+
+    def reserve(self):
+        """Attend le premier créneau libre puis compte l'écriture. -> secondes attendues."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._purge(now)
+                wait = self.blocked_until - now
+                if len(self.sent) >= self.per_minute:
+                    wait = max(wait, self.sent[0] + self.window - now)
+                if wait <= 0:
+                    self.sent.append(now)
+                    return waited
+            time.sleep(wait)
+            waited += wait
+
+    def block(self, seconds=None):
+        """Après un 429 : pause de `seconds`, ou jusqu'à libération de la plus ancienne écriture."""
+        with self._lock:
+            now = time.monotonic()
+            self._purge(now)
+            if seconds is None:
+                seconds = (self.sent[0] + self.window - now) if self.sent else 1.0
+            self.blocked_until = max(self.blocked_until, now + max(1.0, seconds))
+
+
+class WriteScheduler:
+    """File d'écritures par classeur ; voir l'en-tête du module."""
+
+    def __init__(self, writes_per_minute=DEFAULT_WRITES_PER_MINUTE, max_retries=DEFAULT_MAX_RETRIES):
+        self.quota = WriteQuota(writes_per_minute)
+        self.max_retries = int(max_retries)
+        self._lock = threading.Lock()
+        self.reset_stats()
+        self._queues = {}   # spreadsheet id -> (spreadsheet, [(kind, key, item)])
+
+    def reset_stats(self):
+        self.stats = {"queued": 0, "calls": 0, "retries": 0, "waited": 0.0}
+
+    def _count(self, key, n=1):
+        with self._lock:
+            self.stats[key] += n
+
+    # ---- mise en file ----------------------------------------------------
+    def _queue(self, spreadsheet, kind, key, items):
+        with self._lock:
+            _, ops = self._queues.setdefault(spreadsheet.id, (spreadsheet, []))
+            ops.extend((kind, key, item) for item in items)
+            self.stats["queued"] += len(items)
+
+    def update(self, ws, range_name, values, value_input_option="RAW"):
+        """Équivalent différé de ws.update(range_name, values)."""
+        self.batch_update(ws, [{"range": range_name, "values": values}], value_input_option)
+
+    def batch_update(self, ws, data, value_input_option="RAW"):
+        """Équivalent différé de ws.batch_update(data) (liste de {range, values})."""
+        items = [
+            {"range": absolute_range_name(ws.title, d["range"]), "values": d["values"]}
+            for d in data
+        ]
+        self._queue(ws.spreadsheet, "values", value_input_option, items)
+
+    def requests(self, spreadsheet, requests):
+        """Requêtes spreadsheets.batchUpdate différées (deleteDimension, updateSheetProperties…)."""
+        self._queue(spreadsheet, "requests", None, list(requests))
+
+    def pending(self, spreadsheet=None) -> int:
+        with self._lock:
+            if spreadsheet is not None:
+                return len(self._queues.get(spreadsheet.id, (None, []))[1])
+            return sum(len(ops) for _, ops in self._queues.values())
+
+    # ---- envoi -------------------------------------------------------------
+    def execute(self, fn, *args, retry_statuses=RETRY_STATUSES, **kwargs):
+        """
+        Appel d'écriture immédiat, soumis au quota et aux nouvelles tentatives.
+        retry_statuses : statuts HTTP retentés (à restreindre pour un appel non idempotent).
+        """
+        attempt = 0
+        while True:
+            self._count("waited", self.quota.reserve())
+            try:
+                result = fn(*args, **kwargs)
+                self._count("calls")
+                return result
+            except APIError as e:
+                status = _status_of(e)
+                if status not in retry_statuses or attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self._count("retries")
+                retry_after = _retry_after_of(e)
+                if status == 429:
+                    self.quota.block(retry_after)
+                else:
+                    time.sleep(retry_after or min(64.0, 2 ** attempt + random.random()))
+
+    def append_rows(self, ws, rows, value_input_option="RAW"):
+        """
+        ws.append_rows après envoi des écritures en attente du classeur (l'ordre est respecté).
+        Retenté seulement sur 429 : un 5xx peut arriver après l'ajout des lignes, le renvoyer les doublerait.
+        """
+        self.flush(ws.spreadsheet)
+        if not rows:
+            return None
+        self._count("queued")
+        return self.execute(ws.append_rows, rows, value_input_option=value_input_option,
+                            retry_statuses=APPEND_RETRY_STATUSES)
+
+    def _segments(self, ops):
+        """Regroupe les opérations consécutives de même nature (et même valueInputOption)."""
+        segments = []
+        for kind, key, item in ops:
+            if segments and segments[-1][0] == kind and segments[-1][1] == key:
+                segments[-1][2].append(item)
+            else:
+                segments.append((kind, key, [item]))
+        return segments
+
+    def flush(self, spreadsheet=None) -> int:
+        """Envoie les écritures en attente (d'un classeur, ou de tous). -> nombre d'appels API."""
+        with self._lock:
+            if spreadsheet is None:
+                queues = list(self._queues.values())
+                self._queues.clear()
+            else:
+                queue = self._queues.pop(spreadsheet.id, None)
+                queues = [queue] if queue else []
+
+        calls = 0
+        for n, (sh, ops) in enumerate(queues):
+            sent = 0
+            try:
+                for kind, key, items in self._segments(ops):
+                    size = MAX_VALUE_RANGES if kind == "values" else MAX_REQUESTS
+                    for start in range(0, len(items), size):
+                        chunk = items[start:start + size]
+                        if kind == "values":
+                            self.execute(sh.values_batch_update, {"valueInputOption": key, "data": chunk})
+                        else:
+                            self.execute(sh.batch_update, {"requests": chunk})
+                        sent += len(chunk)
+                        calls += 1
+            except Exception:
+                # rien n'est perdu : le reste repasse en tête de file, devant ce qui a été ajouté depuis
+                self._requeue([(sh, ops[sent:])] + queues[n + 1:])
+                raise
+        return calls
+
+    def _requeue(self, queues):
+        with self._lock:
+            merged = {sh.id: (sh, list(ops)) for sh, ops in queues if ops}
+            for sid, (sh, ops) in self._queues.items():
+                merged.setdefault(sid, (sh, []))[1].extend(ops)
+            self._queues = merged
+
+    def summary(self) -> str:
+        st = self.stats
+        return (
+            f"{st['queued']} écriture(s) en {st['calls']} appel(s), "
+            f"{st['retries']} nouvelle(s) tentative(s), attente quota {st['waited']:.0f}s"
+        )
+
+
+_SCHEDULER = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def configure_scheduler(cfg=None):
+    """Crée (ou ajuste) l'ordonnanceur du process d'après la section `sheets` du YAML."""
+    global _SCHEDULER
+    conf = (cfg or {}).get("sheets") or {}
+    per_minute = int(conf.get("writes_per_minute", DEFAULT_WRITES_PER_MINUTE))
+    max_retries = int(conf.get("max_retries", DEFAULT_MAX_RETRIES))
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            _SCHEDULER = WriteScheduler(per_minute, max_retries)
+        else:
+            # même compteur de quota pour tout le process : on n'ajuste que les réglages
+            _SCHEDULER.quota.per_minute = max(1, per_minute)
+            _SCHEDULER.max_retries = max_retries
+            _SCHEDULER.reset_stats()
+        return _SCHEDULER
+
+
+def get_scheduler() -> WriteScheduler:
+    return _SCHEDULER or configure_scheduler()
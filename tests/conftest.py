@@ -0,0 +1,7 @@
+# Tests hors-ligne (aucun accès réseau ni Google) : modules du repo importés depuis la racine.
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
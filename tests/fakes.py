@@ -0,0 +1,67 @@
+# Onglet Google Sheets en mémoire, juste ce que SheetWriter / sheets_writer / load_sheet_index appellent.
+from gspread.exceptions import APIError
+from gspread.utils import a1_to_rowcol
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status_code = status
+        self.headers = {"Retry-After": "0"}  # nouvelle tentative sans attendre la fenêtre de quota
+
+    def json(self):
+        return {"error": {"code": self.status_code, "message": "fake", "status": "FAKE"}}
+
+
+class FakeSpreadsheet:
+    id = "fake"
+
+    def __init__(self, ws):
+        self.ws = ws
+
+    def values_batch_update(self, body):
+        for item in body["data"]:
+            row, col = a1_to_rowcol(item["range"].split("!")[-1].split(":")[0])
+            for i, values in enumerate(item["values"]):
+                for j, value in enumerate(values):
+                    self.ws.set_cell(row + i, col + j, value)
+
+    def batch_update(self, body):
+        pass
+
+
+class FakeSheet:
+    title = "TEST"
+
+    def __init__(self, header, rows=()):
+        self.header = list(header)
+        self.rows = [list(r) for r in rows]
+        self.spreadsheet = FakeSpreadsheet(self)
+        self.fail_appends = []  # statuts HTTP renvoyés par les prochains append_rows
+
+    def set_cell(self, row, col, value):
+        while len(self.rows) < row - 1:
+            self.rows.append([""] * len(self.header))
+        self.rows[row - 2][col - 1] = value
+
+    def row_values(self, i):
+        return list(self.header)
+
+    def col_values(self, col):
+        return [self.header[col - 1]] + [r[col - 1] for r in self.rows]
+
+    def get(self, range_name, major_dimension=None):
+        row, col = a1_to_rowcol(range_name.split(":")[0])
+        values = [r[col - 1] for r in self.rows[row - 2:]]
+        while values and not values[-1]:
+            values.pop()
+        return [values] if values else []
+
+    def get_all_records(self):
+        return [dict(zip(self.header, r)) for r in self.rows]
+
+    def append_rows(self, rows, value_input_option="RAW"):
+        if self.fail_appends:
+            raise APIError(FakeResponse(self.fail_appends.pop(0)))
+        first = len(self.rows) + 2
+        self.rows.extend(list(r) for r in rows)
+        return {"updates": {"updatedRange": f"TEST!A{first}:N{first + len(rows) - 1}"}}
@@ -0,0 +1,66 @@
+import pytest
+from gspread.exceptions import APIError
+
+import script_web
+from checkpoint import RunCheckpoint
+from sheets_writer import configure_scheduler
+from fakes import FakeSheet
+
+HEADER = script_web.EXPECTED_HEADERS
+COL_INDEX = {name: i + 1 for i, name in enumerate(HEADER)}
+
+
+@pytest.fixture(autouse=True)
+def fast_scheduler():
+    configure_scheduler({"sheets": {"writes_per_minute": 100000, "max_retries": 2}})
+
+
+def review(i):
+    return {"uid": f"u{i}", "prenom": f"p{i}", "texte": f"texte {i}", "site": "diplomeo", "date": "d", "annee": "2024"}
+
+
+def test_round_trip(tmp_path):
+    cp = RunCheckpoint("ÉCOLE A", "sheet-1", folder=str(tmp_path))
+    cp.mark_done("https://a", {"updates": [], "new_rows": [["u1"]]})
+    cp.mark_done("https://b")
+
+    loaded = RunCheckpoint.load("ÉCOLE A", "sheet-1", folder=str(tmp_path))
+    assert loaded.done_urls == ["https://a", "https://b"]
+    assert loaded.pending == {"updates": [], "new_rows": [["u1"]]}
+    assert loaded.pending_count() == 1
+    assert loaded.is_done("https://a") and not loaded.is_done("https://c")
+
+    # autre sheet : le point de reprise ne s'applique pas
+    assert RunCheckpoint.load("ÉCOLE A", "sheet-2", folder=str(tmp_path)) is None
+
+    loaded.clear()
+    assert RunCheckpoint.load("ÉCOLE A", "sheet-1", folder=str(tmp_path)) is None
+
+
+def test_replay_after_failed_append(tmp_path):
+    sheet = FakeSheet(HEADER, [[f"old{i}"] + [""] * (len(HEADER) - 1) for i in range(3)])
+    writer = script_web.SheetWriter(sheet, COL_INDEX)
+    writer.update(2, {"date": "nouvelle"})
+    for i in range(2):
+        writer.append(review(i))
+
+    # 5xx sur l'ajout : pas de nouvelle tentative, les écritures restent en attente
+    sheet.fail_appends = [503]
+    with pytest.raises(APIError):
+        writer.flush()
+    cp = RunCheckpoint("ECOLE", "sheet-1", folder=str(tmp_path))
+    cp.save(writer.pending_state())
+    assert len(sheet.rows) == 3
+
+    # reprise : nouveau writer, écritures rejouées une seule fois
+    resumed = RunCheckpoint.load("ECOLE", "sheet-1", folder=str(tmp_path))
+    assert resumed.pending_count() == 3
+    replay = script_web.SheetWriter(sheet, COL_INDEX)
+    replay.restore(resumed.pending)
+    replay.flush()
+    resumed.save(replay.pending_state())
+
+    assert [r[0] for r in sheet.rows] == ["old0", "old1", "old2", "u0", "u1"]
+    assert sheet.rows[0][COL_INDEX["date"] - 1] == "nouvelle"
+    assert RunCheckpoint.load("ECOLE", "sheet-1", folder=str(tmp_path)).pending_count() == 0
+
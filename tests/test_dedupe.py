@@ -0,0 +1,15 @@
+from python_dedupe_web import plan_dedupe
+
+HEADER = ["uid", "site", "url", "prenom", "texte"]
+
+
+def test_numeric_cells_from_formula_render():
+    # rendu FORMULA : un prénom ou un avis purement numérique arrive en int/float
+    rows = [
+        ["u1", "", "https://diplomeo.com/a", 2024, 5],
+        ["u2", "", "https://diplomeo.com/a", "2024", "5"],
+        ["u3", "", "https://diplomeo.com/a", 2024, 4.5],
+    ]
+    plan = plan_dedupe(HEADER, rows)
+    assert plan["to_delete"] == [3]
+    assert [r[0] for r in plan["kept"]] == ["u1", "u3"]
@@ -0,0 +1,47 @@
+import pytest
+
+import script_web
+from fakes import FakeSheet
+
+URLS = ["https://diplomeo.com/avis-a", "https://fr.custplace.com/b"]
+
+
+@pytest.fixture
+def env(tmp_path, monkeypatch):
+    """Une école, deux URLs ; fichiers .cache/ dans tmp_path, sheet en mémoire."""
+    monkeypatch.chdir(tmp_path)
+    cfg = {
+        "ecoles": {"ECOLE": {"sheet_id": "sid", "urls": URLS}},
+        "scraping": {"incremental": {"enabled": True}, "rate_limit": {"enabled": False}},
+        "sheets": {"writes_per_minute": 100000},
+    }
+    sheet = FakeSheet(script_web.EXPECTED_HEADERS)
+    failing = set()
+
+    def fake_iter(url, settings=None, known=None, stop_after=None):
+        yield [script_web.review_record("diplomeo", url, "", "", prenom="p", texte=f"avis {url}")]
+        if url in failing:
+            raise RuntimeError("boom")
+
+    monkeypatch.setattr(script_web, "_load_yaml", lambda: cfg)
+    monkeypatch.setattr(script_web, "get_sheet", lambda sheet_id: sheet)
+    monkeypatch.setattr(script_web, "iter_url", fake_iter)
+    return sheet, failing
+
+
+def test_sweep_not_recorded_when_an_url_failed(env):
+    sheet, failing = env
+    failing.add(URLS[1])
+    logs = []
+    script_web.run(logger=logs.append, full_sweep=True)
+
+    assert any("erreur: boom" in line for line in logs)
+    assert len(sheet.rows) == 2  # pages lues avant l'erreur conservées
+    assert "ECOLE" not in script_web._load_sweep_state()
+    assert script_web._needs_full_sweep("ECOLE", script_web._incremental_settings(script_web._load_yaml()))
+
+
+def test_sweep_recorded_when_all_urls_succeeded(env):
+    script_web.run(logger=lambda line: None, full_sweep=True)
+    assert "ECOLE" in script_web._load_sweep_state()
+    assert not script_web._needs_full_sweep("ECOLE", script_web._incremental_settings(script_web._load_yaml()))
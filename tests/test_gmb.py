@@ -0,0 +1,63 @@
+import gmb
+
+ACCOUNT = "111"
+ITEMS = [(f"accounts/{ACCOUNT}/locations/{loc}", loc, "Paris") for loc in ("1", "2")]
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+class FakeSession:
+    """batchGetReviews : un avis pour la location 1, aucun pour la location 2."""
+
+    def __init__(self):
+        self.bodies = []
+
+    def post(self, url, json=None):
+        self.bodies.append(json)
+        review = {"name": "r1", "updateTime": "2024-05-01T10:00:00.000Z", "comment": "ok"}
+        return FakeResponse({"locationReviews": [{"name": f"accounts/{ACCOUNT}/locations/1", "review": review}]})
+
+
+def run_once(session, watermarks):
+    started = gmb.utc_now_ts()
+    fetched = gmb.fetch_account(session, ACCOUNT, ITEMS, watermarks)
+    gmb.save_watermarks({
+        resource: gmb.location_watermark(reviews, watermarks.get(resource), started)
+        for resource, (_, reviews) in fetched.items()
+    })
+    return fetched
+
+
+def test_location_watermark():
+    started = "2024-06-01T00:00:00.000Z"
+    assert gmb.location_watermark([], None, started) == started
+    assert gmb.location_watermark([], "2024-01-01T00:00:00Z", started) == "2024-01-01T00:00:00Z"
+    reviews = [{"updateTime": "2024-03-01T00:00:00Z"}, {"updateTime": "2024-04-01T00:00:00Z"}]
+    assert gmb.location_watermark(reviews, None, started) == "2024-04-01T00:00:00Z"
+
+
+def test_empty_location_keeps_batch_incremental(tmp_path, monkeypatch):
+    monkeypatch.setattr(gmb, "WATERMARK_FILE", str(tmp_path / "marks.json"))
+    session = FakeSession()
+
+    # 1er run : pas de filigrane -> flux complet
+    fetched = run_once(session, gmb.load_watermarks())
+    assert "orderBy" not in session.bodies[-1]
+    assert [len(fetched[r][1]) for r, _, _ in ITEMS] == [1, 0]
+
+    # la location sans avis a aussi son filigrane ...
+    marks = gmb.load_watermarks()
+    assert set(marks) == {r for r, _, _ in ITEMS}
+
+    # ... donc le run suivant reste incrémental pour tout le compte
+    run_once(session, marks)
+    assert session.bodies[-1]["orderBy"] == "updateTime desc"
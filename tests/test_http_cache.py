@@ -0,0 +1,64 @@
+import itertools
+
+import pytest
+
+import http_cache
+from http_cache import ResponseCache
+
+
+class Page:
+    def __init__(self, status, text="", headers=None):
+        self.status_code = status
+        self.text = text
+        self.headers = headers or {}
+
+
+class FakeHttp:
+    """session.get scriptée : une réponse par appel, en-têtes envoyés conservés."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.sent = []
+
+    def get(self, url, timeout=None, headers=None):
+        self.sent.append((url, headers))
+        return self.responses.pop(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = itertools.count(1000)
+    monkeypatch.setattr(http_cache.time, "time", lambda: next(now))
+
+
+def test_revalidation_serves_cached_body_on_304(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "c.sqlite"))
+    http = FakeHttp(Page(200, "<html>v1</html>", {"ETag": '"abc"'}), Page(304))
+    assert cache.get(http, "https://diplomeo.com/a").text == "<html>v1</html>"
+
+    r = cache.get(http, "https://diplomeo.com/a")
+    assert r.from_cache and r.text == "<html>v1</html>"
+    assert http.sent[1][1] == {"If-None-Match": '"abc"'}
+    assert cache.stats == {"fresh": 0, "revalidated": 1, "downloaded": 1}
+
+
+def test_lru_eviction(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "c.sqlite"), max_bytes=25)
+    etag = {"ETag": "x"}
+    http = FakeHttp(Page(200, "a" * 10, etag), Page(200, "b" * 10, etag), Page(304), Page(200, "c" * 10, etag))
+    cache.get(http, "https://h/a")
+    cache.get(http, "https://h/b")
+    cache.get(http, "https://h/a")  # a redevient la plus récente
+    cache.get(http, "https://h/c")  # dépasse 25 octets : b est évincée
+    assert cache._lookup("https://h/a") and cache._lookup("https://h/c")
+    assert cache._lookup("https://h/b") is None
+
+
+def test_host_ttl_skips_request(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "c.sqlite"), ttl_for=lambda host: 3600 if host == "fresh.test" else 0)
+    http = FakeHttp(Page(200, "f"), Page(200, "s", {"ETag": "e"}), Page(304))
+    cache.get(http, "https://fresh.test/p")
+    cache.get(http, "https://stale.test/p")
+    assert cache.get(http, "https://fresh.test/p").text == "f"
+    assert cache.get(http, "https://stale.test/p").text == "s"
+    assert [u for u, _ in http.sent] == ["https://fresh.test/p", "https://stale.test/p", "https://stale.test/p"]
@@ -0,0 +1,70 @@
+from near_dup import NearDupIndex, find_pairs, lsh_params, normalize_text
+
+BASE = (
+    "Très bonne école, les intervenants sont des professionnels et l'accompagnement pour trouver "
+    "une alternance a été efficace. Je recommande pour le campus de Lyon."
+)
+EDITED = (
+    "Très bonne école, les intervenants sont des professionnels et l'accompagnement pour trouver "
+    "une alternance a été très efficace. Je recommande pour le campus de Lyon !"
+)
+UNRELATED = [
+    "Administration injoignable, aucun suivi pendant le stage et des cours annulés sans prévenir.",
+    "Locaux modernes mais trop petits, la cafétéria est souvent fermée le soir après dix-huit heures.",
+    "Formation en design graphique complète, projets concrets avec des agences partenaires à Paris.",
+]
+
+
+def test_normalize_text():
+    assert normalize_text("  Élève très CONTENT !!  ") == "eleve tres content"
+
+
+def test_lsh_params_match_threshold():
+    bands, rows = lsh_params(0.8, 128)
+    assert bands * rows == 128
+    assert abs((1 / bands) ** (1 / rows) - 0.8) < 0.1
+
+
+def test_check_flags_light_edit():
+    index = NearDupIndex(threshold=0.8)
+    index.add(2, BASE)
+    match = index.check({"uid": "new", "texte": EDITED})
+    assert match is not None
+    key, sim = match
+    assert key == 2 and sim >= 0.8
+    assert [(r["uid"], k) for r, k, _ in index.pop_flagged()] == [("new", 2)]
+
+
+def test_check_ignores_unrelated_texts():
+    index = NearDupIndex(threshold=0.8)
+    index.add(2, BASE)
+    for i, texte in enumerate(UNRELATED):
+        assert index.check({"uid": f"u{i}", "texte": texte}) is None
+    assert index.pop_flagged() == []
+    assert len(index) == 1 + len(UNRELATED)  # indexés quand même pour la suite du run
+
+
+def test_short_texts_are_skipped():
+    index = NearDupIndex(min_chars=30)
+    assert index.signature("Top école") is None
+    assert index.check({"uid": "u", "texte": "Top école"}) is None
+    assert len(index) == 0
+
+
+def test_find_pairs_points_to_earlier_row():
+    pairs = find_pairs([(2, BASE), (3, UNRELATED[0]), (4, EDITED)], NearDupIndex())
+    assert [(row, first) for row, first, _ in pairs] == [(4, 2)]
+
+
+def test_export_restore_round_trip():
+    index = NearDupIndex()
+    index.add(2, BASE)
+    index.add("uid-du-run", UNRELATED[0])  # avis ajouté pendant le run, ligne connue après coup
+    index.add("sans-ligne", UNRELATED[1])  # jamais écrit (action skip) -> pas exporté
+    sigs, rows = index.export({"uid-du-run": 7}.get)
+    assert rows.tolist() == [2, 7]
+
+    restored = NearDupIndex()
+    restored.restore(sigs, rows)
+    assert restored.keys == [2, 7]
+    assert restored.query(EDITED)[0][0] == 2
@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+
+import pytest
+
+import rate_limit
+from rate_limit import HostLimiter, parse_retry_after
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Horloge figée ; les pauses de acquire() sont relevées au lieu d'être dormies."""
+    state = {"now": 100.0, "slept": []}
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: state["now"])
+    monkeypatch.setattr(rate_limit.time, "sleep", state["slept"].append)
+    return state
+
+
+def test_retry_after_blocks_host(clock):
+    limiter = HostLimiter("h", {"rate": 2.0, "burst": 5})
+    limiter.observe(429, 0.1, retry_after="7")
+    assert limiter.rate == 1.0
+    limiter.acquire()
+    assert clock["slept"] == [7.0]
+
+
+def test_backoff_without_retry_after_grows(clock):
+    limiter = HostLimiter("h", {"rate": 1.0, "min_rate": 1.0, "max_pause": 120})
+    limiter.observe(503, 0.1)
+    first = limiter.blocked_until - clock["now"]
+    limiter.observe(503, 0.1)
+    assert limiter.blocked_until - clock["now"] == 2 * first
+    limiter.observe(200, 0.1)
+    assert limiter.strikes == 0
+
+
+def test_retry_after_capped_by_max_pause(clock):
+    limiter = HostLimiter("h", {"max_pause": 30})
+    limiter.observe(429, 0.1, retry_after="3600")
+    assert limiter.blocked_until - clock["now"] == 30
+
+
+def test_parse_retry_after_http_date():
+    now = datetime(2024, 1, 1, 12, 0, 0, tzinfo=timezone.utc)
+    assert parse_retry_after("Mon, 01 Jan 2024 12:00:30 GMT", now=now) == 30
+    assert parse_retry_after("n/a") is None
@@ -0,0 +1,134 @@
+import numpy as np
+
+import script_web
+from near_dup import NearDupIndex
+from sheet_index import (
+    SheetIndex, SoftView, UidView, TAIL_SIZE, column_state, column_token, tail_start, tail_token,
+)
+from fakes import FakeSheet
+
+HEADER = script_web.EXPECTED_HEADERS
+COL = {name: i for i, name in enumerate(HEADER)}
+
+
+def row(i, date="2024-01", texte=None):
+    r = [""] * len(HEADER)
+    r[COL["uid"]] = f"uid{i}"
+    r[COL["prenom"]] = f"p{i}"
+    r[COL["site"]] = "diplomeo"
+    r[COL["texte"]] = texte or f"avis {i} : accompagnement sérieux et intervenants disponibles toute l'année"
+    r[COL["date"]] = date
+    r[COL["annee"]] = "2024"
+    return r
+
+
+def load(sheet, folder, near=None):
+    logs = []
+    index = script_web.load_sheet_index(sheet, "sid", HEADER, near=near, folder=str(folder), logger=logs.append)
+    return index, logs[-1]
+
+
+def test_build_last_occurrence_wins_and_lookup():
+    entries = [(2, "a", "k1", "d1", "2023"), (3, "b", "k2", "d2", "2023"), (4, "c", "k1", "d3", "2024")]
+    index = SheetIndex.build("sid", entries, "col:3:x")
+    assert index.has_uid("a") and index.has_uid("c") and not index.has_uid("z")
+    assert index.soft_get("k1") == {"row": 4, "date": "d3", "annee": "2024"}
+    assert index.soft_get("absent") is None
+    assert len(index) == 2
+
+
+def test_save_load_round_trip(tmp_path):
+    count, tail = column_state(["a", "b", ""])
+    entries = [(2, "a", "k1", "d1", "2023"), (3, "b", "k2", "d2", "2024")]
+    SheetIndex.build("sid", entries, column_token(count, tail), str(tmp_path), tail).save()
+
+    loaded = SheetIndex.load("sid", str(tmp_path))
+    assert loaded.token == column_token(2, ["a", "b"])
+    assert loaded.count() == 2 and loaded.tail == ["a", "b"]
+    assert loaded.soft_get("k2") == {"row": 3, "date": "d2", "annee": "2024"}
+    assert SheetIndex.load("autre", str(tmp_path)) is None
+
+
+def test_tail_token_matches_full_column():
+    uids = [f"u{i}" for i in range(200)]
+    count, tail = column_state(uids + ["", ""])
+    assert count == 200 and len(tail) == TAIL_SIZE
+    first = tail_start(count)
+    assert tail_token(first, uids[first - 1:]) == column_token(count, tail)
+    # ligne ajoutée / supprimée / uid de fin retouché : jeton différent
+    assert tail_token(first, uids[first - 1:] + ["x"]) != column_token(count, tail)
+    assert tail_token(first, uids[first - 1:-1]) != column_token(count, tail)
+    assert tail_token(first, uids[first - 1:-1] + ["autre"]) != column_token(count, tail)
+
+
+def test_appended_tracks_rows_and_token(tmp_path):
+    sheet = FakeSheet(HEADER, [row(i) for i in range(5)])
+    index, _ = load(sheet, tmp_path)
+    view = SoftView(index)
+
+    new = [row(10), row(11)]
+    sks = [script_web.soft_key_from_values(r[COL["site"]], r[COL["prenom"]], r[COL["texte"]]) for r in new]
+    for r, sk in zip(new, sks):
+        UidView(index).add(r[COL["uid"]])
+        view[sk] = {"row": None, "date": r[COL["date"]], "annee": "2024", "uid": r[COL["uid"]]}
+    resp = sheet.append_rows(new)
+    index.appended([(r[COL["uid"]], sk) for r, sk in zip(new, sks)], script_web.first_appended_row(resp))
+
+    assert [view[sk]["row"] for sk in sks] == [7, 8]
+    assert index.token == column_token(*column_state(sheet.col_values(1)[1:]))
+    assert index.new_uids() == []
+
+    # rangs inconnus (pas d'updatedRange) : l'index ne sait plus valider -> pas de sauvegarde
+    index.appended([("uid12", None)], None)
+    assert index.token is None
+    assert index.save() is False
+
+
+def test_reused_until_sheet_changes_outside(tmp_path):
+    sheet = FakeSheet(HEADER, [row(i) for i in range(100)])
+    index, log = load(sheet, tmp_path)
+    assert "reconstruit" in log
+    assert index.save()
+
+    index, log = load(sheet, tmp_path)
+    assert "rechargé" in log and len(index) == 100
+
+    # ligne insérée à la main en haut de l'onglet : les n° de ligne enregistrés sont faux
+    sheet.rows.insert(0, row(999))
+    index, log = load(sheet, tmp_path)
+    assert "reconstruit" in log
+    assert index.soft_get(script_web.soft_key_from_values("diplomeo", "p0", row(0)[COL["texte"]]))["row"] == 3
+    index.save()
+
+    # ligne ajoutée par un autre script (GMB, autre run) : rebâti aussi
+    sheet.rows.append(row(1000))
+    _, log = load(sheet, tmp_path)
+    assert "reconstruit" in log
+
+
+def test_near_signatures_restored_with_index(tmp_path):
+    texte = "Très bonne école, les intervenants sont des professionnels, je recommande le campus de Lyon."
+    sheet = FakeSheet(HEADER, [row(0, texte=texte), row(1)])
+    near = NearDupIndex()
+    index, _ = load(sheet, tmp_path, near)
+    index.save(near)
+
+    near2 = NearDupIndex()
+    _, log = load(sheet, tmp_path, near2)
+    assert "rechargé" in log
+    assert near2.keys == near.keys
+    np.testing.assert_array_equal(near2._sigs[:len(near2)], near._sigs[:len(near)])
+
+    # autres réglages near_dup : signatures inutilisables -> reconstruction
+    near3 = NearDupIndex(num_perm=64)
+    _, log = load(sheet, tmp_path, near3)
+    assert "reconstruit" in log and len(near3) == 2
+
+
+def test_known_reviews_snapshot_is_isolated(tmp_path):
+    sheet = FakeSheet(HEADER, [row(0)])
+    index, _ = load(sheet, tmp_path)
+    known = script_web.KnownReviews(UidView(index), SoftView(index))
+    UidView(index).add("plus-tard")
+    assert "plus-tard" not in known.uids
+    assert known.is_known({"uid": "uid0"})
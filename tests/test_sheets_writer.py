@@ -0,0 +1,65 @@
+import pytest
+from gspread.exceptions import APIError
+
+from sheets_writer import WriteScheduler
+from fakes import FakeResponse, FakeSheet
+
+HEADER = ["uid", "texte"]
+
+
+def test_append_retried_on_429():
+    sheet = FakeSheet(HEADER)
+    sheet.fail_appends = [429]
+    resp = WriteScheduler(100000, max_retries=2).append_rows(sheet, [["u0", "t"]])
+    assert resp["updates"]["updatedRange"] == "TEST!A2:N2"
+    assert [r[0] for r in sheet.rows] == ["u0"]
+
+
+@pytest.mark.parametrize("status", [500, 503])
+def test_append_not_retried_on_5xx(status):
+    # les lignes ont pu être ajoutées côté serveur : renvoyer les doublerait
+    sheet = FakeSheet(HEADER)
+    sheet.fail_appends = [status]
+    with pytest.raises(APIError):
+        WriteScheduler(100000, max_retries=2).append_rows(sheet, [["u0", "t"]])
+    assert sheet.fail_appends == []
+
+
+def test_values_update_retried_on_5xx(monkeypatch):
+    monkeypatch.setattr("sheets_writer.time.sleep", lambda seconds: None)
+    calls = []
+
+    def flaky(body):
+        calls.append(body)
+        if len(calls) == 1:
+            raise APIError(FakeResponse(503))
+
+    scheduler = WriteScheduler(100000, max_retries=2)
+    scheduler.execute(flaky, {"data": []})
+    assert len(calls) == 2
+
+
+def test_flush_requeues_unsent_segments():
+    sheet = FakeSheet(HEADER)
+    sent = []
+
+    def values_batch_update(body):
+        sent.append(body)
+        if len(sent) == 2:
+            raise APIError(FakeResponse(400))
+
+    sheet.spreadsheet.values_batch_update = values_batch_update
+    scheduler = WriteScheduler(100000, max_retries=0)
+    scheduler.update(sheet, "A2", [["raw"]])
+    scheduler.update(sheet, "B2", [["=1"]], value_input_option="USER_ENTERED")
+    scheduler.update(sheet, "A3", [["raw2"]])
+    with pytest.raises(APIError):
+        scheduler.flush()
+    assert scheduler.pending() == 2  # le segment en échec et le suivant restent en file
+
+    scheduler.update(sheet, "A4", [["later"]])
+    sent.clear()
+    sheet.spreadsheet.values_batch_update = sent.append
+    scheduler.flush()
+    assert [d["range"] for body in sent for d in body["data"]] == ["'TEST'!B2", "'TEST'!A3", "'TEST'!A4"]
+    assert scheduler.pending() == 0
@@ -0,0 +1,92 @@
+import threading
+import time
+
+import pytest
+
+from script_web import HostPools, PageStream, iter_pages_windowed
+
+URL = "https://diplomeo.com/avis"
+
+
+@pytest.fixture
+def pools():
+    p = HostPools()
+    yield p
+    p.shutdown()
+
+
+def test_stream_yields_pages_in_order(pools):
+    stream = PageStream(pools, URL, iter([[1], [2], [3], [4]]), max_pages=2).start()
+    assert list(stream) == [[1], [2], [3], [4]]
+    assert stream.error is None
+
+
+def test_stream_stops_after_error(pools):
+    def pages():
+        yield [1]
+        yield [2]
+        raise RuntimeError("boom")
+
+    stream = PageStream(pools, URL, pages()).start()
+    assert list(stream) == [[1], [2]]
+    assert str(stream.error) == "boom"
+
+
+def test_stream_buffer_is_bounded(pools):
+    produced = []
+
+    def pages():
+        for i in range(10):
+            produced.append(i)
+            yield [i]
+
+    stream = PageStream(pools, URL, pages(), max_pages=2).start()
+    time.sleep(0.2)
+    assert len(produced) == 2  # tampon plein : le générateur n'est plus relancé
+    assert list(stream) == [[i] for i in range(10)]
+
+
+def test_stream_close_closes_generator(pools):
+    closed = threading.Event()
+
+    def pages():
+        try:
+            for i in range(100):
+                yield [i]
+        finally:
+            closed.set()
+
+    stream = PageStream(pools, URL, pages(), max_pages=3).start()
+    it = iter(stream)
+    assert next(it) == [0]
+    stream.close()
+    assert closed.wait(2)
+    assert list(it) == []
+
+
+def test_window_bounds_requests_in_flight():
+    lock = threading.Lock()
+    state = {"now": 0, "max": 0}
+
+    def fetch(u):
+        with lock:
+            state["now"] += 1
+            state["max"] = max(state["max"], state["now"])
+        time.sleep(0.02)
+        with lock:
+            state["now"] -= 1
+        return [u]
+
+    assert list(iter_pages_windowed(fetch, range(12), window=3)) == [[u] for u in range(12)]
+    assert state["max"] <= 3
+
+
+def test_window_stops_on_first_empty_page():
+    fetched = []
+
+    def fetch(u):
+        fetched.append(u)
+        return [u] if u < 3 else []
+
+    assert list(iter_pages_windowed(fetch, range(100), window=4)) == [[0], [1], [2]]
+    assert max(fetched) < 3 + 4  # seules les pages déjà lancées au-delà de la fin ont été demandées
@@ -5,8 +5,16 @@
 import gspread
 import yaml
 import os
+from fractions import Fraction
 from statistics import mean
 
+import numpy as np
+import pandas as pd
+
+from review_store import open_store, ensure_fresh, COLUMNS
+from sheets_writer import configure_scheduler, get_scheduler
+import sheets_client
+
 # ------------------------------------------------
 # CONFIG
 # ------------------------------------------------
@@ -31,15 +39,9 @@ def _get_gspread_client():
     """
     - En mode Streamlit : utilise st.secrets["gcp_service_account"]
     - Sinon : lit un fichier service account local (via $GSPREAD_SA_JSON ou CREDENTIALS_FILE)
+    Client partagé par tout le process (voir sheets_client).
     """
-    try:
-        import streamlit as st
-        if "gcp_service_account" in st.secrets:
-            return gspread.service_account_from_dict(dict(st.secrets["gcp_service_account"]))
-    except Exception:
-        pass
-    cred_path = os.getenv("GSPREAD_SA_JSON", CREDENTIALS_FILE)
-    return gspread.service_account(filename=cred_path)
+    return sheets_client.get_client(CREDENTIALS_FILE)
 
 # ------------------------------------------------
 # YAML
@@ -57,79 +59,140 @@ def _load_yaml():
 # ------------------------------------------------
 def get_sheet(sheet_id, tab="TEST"):
     """Retourne un onglet Google Sheet."""
-    gc = _get_gspread_client()
-    return gc.open_by_key(sheet_id).worksheet(tab)
+    return sheets_client.get_worksheet(sheet_id, tab, _get_gspread_client())
 
 def get_or_create_summary(sheet_id):
-    """Retourne l’onglet SOMMAIRE ou le crée si absent + force l'entête."""
+    """Retourne l’onglet SOMMAIRE ou le crée si absent (l'entête est réécrite par SummaryWriter)."""
     gc = _get_gspread_client()
-    doc = gc.open_by_key(sheet_id)
 
     try:
-        ws = doc.worksheet("Sommaire")
+        ws = sheets_client.get_worksheet(sheet_id, "Sommaire", gc)
     except gspread.exceptions.WorksheetNotFound:
-        ws = doc.add_worksheet("Sommaire", rows=200, cols=10)
-
-    # Vérifie entête
-    header = ws.row_values(1)
-    if header != SUMMARY_HEADER:
-        ws.update("A1:F1", [SUMMARY_HEADER])
-
+        doc = sheets_client.open_spreadsheet(sheet_id, gc)  # même handle que pour TEST
+        ws = get_scheduler().execute(doc.add_worksheet, "Sommaire", rows=200, cols=10)
+        sheets_client.remember_worksheet(sheet_id, ws)
     return ws
 
+def read_summary_columns(ws):
+    """
+    Colonnes note / site de l'onglet (seules lues) ; l'en-tête attendu (COLUMNS) est vérifié dans
+    le même batch_get, get_all_records s'il a bougé.
+    """
+    cols = sheets_client.read_columns(ws, COLUMNS, ("note", "site"), check_header=True)
+    if cols is None:
+        return ws.get_all_records()
+    return pd.DataFrame(cols, columns=["note", "site"])
+
 # ------------------------------------------------
 # Calculs
 # ------------------------------------------------
+def _safe_float(v):
+    try:
+        v = str(v).replace(",", ".")
+        return float(v)
+    except:
+        return None
+
+def _exact_mean(values, counts):
+    """Moyenne de `values` répétées `counts` fois, identique à statistics.mean (somme exacte)."""
+    n = int(counts.sum())
+    if not np.isfinite(values).all():
+        return mean(np.repeat(values, counts).tolist())
+    total = sum(Fraction(float(v)) * int(c) for v, c in zip(values, counts))
+    return float(total / n)
+
 def compute_means(rows):
     """Calcule les moyennes par plateforme.
-       rows = [{"note": "...", "site": "..."}]
+       rows = [{"note": "...", "site": "..."}] ou DataFrame avec les colonnes note / site
+    Colonnaire : chaque valeur distincte de note n'est parsée qu'une fois, puis les moyennes
+    sont calculées à partir des effectifs (note distincte x site) — mêmes résultats que
+    la boucle ligne à ligne (float() Python + statistics.mean).
     """
-    def safe_float(v):
-        try:
-            v = str(v).replace(",", ".")
-            return float(v)
-        except:
-            return None
-
-    scores = {k: [] for k in EXPECTED_SITES}
-
-    for r in rows:
-        site = str(r.get("site", "")).lower()
-        note = safe_float(r.get("note", ""))
-
-        if note is not None and site in scores:
-            scores[site].append(note)
+    if isinstance(rows, pd.DataFrame):
+        df = rows
+    else:
+        df = pd.DataFrame(list(rows), columns=["note", "site"])
+    if df.empty:
+        return {**{k: "" for k in EXPECTED_SITES}, "general": ""}
+
+    notes = df["note"].fillna("").astype(str)
+    sites = df["site"].fillna("").astype(str).str.lower()
+
+    # parse chaque note distincte une seule fois (mêmes règles que float() : "4,5" -> 4.5)
+    note_codes, note_uniques = pd.factorize(notes)
+    parsed = [_safe_float(u) for u in note_uniques]
+    valid_note = np.array([p is not None for p in parsed], dtype=bool)
+    note_values = np.array([p if p is not None else np.nan for p in parsed], dtype=float)
+
+    site_codes = pd.Categorical(sites, categories=EXPECTED_SITES).codes
+    keep = (site_codes >= 0) & (note_codes >= 0)
+    keep[keep] = valid_note[note_codes[keep]]
+
+    # effectifs[site, note distincte]
+    counts = np.zeros((len(EXPECTED_SITES), len(note_uniques)), dtype=np.int64)
+    np.add.at(counts, (site_codes[keep], note_codes[keep]), 1)
 
-    # Moyenne par site
     res = {}
-    for k, arr in scores.items():
-        res[k] = round(mean(arr), 2) if arr else ""
+    for i, k in enumerate(EXPECTED_SITES):
+        nz = counts[i] > 0
+        res[k] = round(_exact_mean(note_values[nz], counts[i][nz]), 2) if nz.any() else ""
 
-    # Moyenne générale
-    all_notes = []
-    for arr in scores.values():
-        all_notes += arr
-
-    res["general"] = round(mean(all_notes), 2) if all_notes else ""
+    total = counts.sum(axis=0)
+    nz = total > 0
+    res["general"] = round(_exact_mean(note_values[nz], total[nz]), 2) if nz.any() else ""
 
     return res
 
 # ------------------------------------------------
-# Mise à jour d’une ligne SOMMAIRE
+# Écriture du SOMMAIRE (une fois par classeur)
 # ------------------------------------------------
-def update_row(ws, row, ecole, means):
-    """Met à jour une ligne (force toutes colonnes)."""
-    ws.update(
-        f"A{row}:F{row}",
-        [[
-            ecole,
-            means.get("diplomeo", ""),
-            means.get("capitainestudy", ""),
-            means.get("custplace", ""),
-            means.get("gmb", ""),
-            means.get("general", ""),
-        ]]
-    )
+def summary_row(ecole, means):
+    """Ligne SOMMAIRE d'une école (force toutes colonnes)."""
+    return [
+        ecole,
+        means.get("diplomeo", ""),
+        means.get("capitainestudy", ""),
+        means.get("custplace", ""),
+        means.get("gmb", ""),
+        means.get("general", ""),
+    ]
+
+class SummaryWriter:
+    """
+    Onglet SOMMAIRE d'un classeur : index Ecole -> ligne lu une seule fois,
+    puis entête + lignes de toutes les écoles envoyées en un seul values.batchUpdate.
+    Les écoles ne sont regroupées que si elles partagent un sheet_id : avec un classeur par
+    école (cas d'ecole.yaml), cela reste un batchUpdate par école.
+    """
+
+    def __init__(self, sheet_id):
+        self.ws = get_or_create_summary(sheet_id)
+        values = self.ws.get("A1:F")  # entête + lignes existantes
+        self.rows = {}
+        for i, r in enumerate(values[1:], start=2):
+            name = str(r[0] if r else "").strip().lower()
+            if name and name not in self.rows:
+                self.rows[name] = i
+        # nouvelles écoles : à la suite de la dernière ligne remplie
+        self.next_row = max(len(values), 1) + 1
+        self.pending = {}
+
+    def set(self, ecole, means):
+        key = ecole.strip().lower()
+        row = self.rows.get(key)
+        if row is None:
+            row = self.next_row
+            self.next_row += 1
+            self.rows[key] = row
+        self.pending[row] = summary_row(ecole, means)
+
+    def flush(self):
+        data = [{"range": "A1:F1", "values": [SUMMARY_HEADER]}]
+        data += [{"range": f"A{row}:F{row}", "values": [values]} for row, values in sorted(self.pending.items())]
+        scheduler = get_scheduler()
+        scheduler.batch_update(self.ws, data)
+        scheduler.flush(self.ws.spreadsheet)
+        self.pending = {}
 
 # ------------------------------------------------
 # Main
@@ -141,6 +204,19 @@ def run(logger=print, school_filter=None):
 
     logger("🔎 Mise à jour du SOMMAIRE…")
 
+    store = open_store(cfg)  # stock SQLite local (None si désactivé dans le YAML)
+    configure_scheduler(cfg)
+    try:
+        _update_all(ECOLES, store, logger, school_filter)
+    finally:
+        if store is not None:
+            store.close()
+
+    logger("✅ Mise à jour SOMMAIRE — Terminé !")
+
+def _update_all(ECOLES, store, logger=print, school_filter=None):
+    # écoles à traiter, regroupées par classeur (un SOMMAIRE par classeur)
+    by_sheet = {}
     for ecole, block in ECOLES.items():
 
         sheet_id = block.get("sheet_id", "").strip()
@@ -152,37 +228,32 @@ def run(logger=print, school_filter=None):
             if ecole.strip().lower() != school_filter.strip().lower():
                 continue
 
+        by_sheet.setdefault(sheet_id, []).append(ecole)
+
+    for sheet_id, ecoles in by_sheet.items():
         # Récupération TEST
         try:
             test_ws = get_sheet(sheet_id, "TEST")
         except Exception:
-            logger(f"⚠️ {ecole} → feuille TEST introuvable, ignorée.")
+            logger(f"⚠️ {', '.join(ecoles)} → feuille TEST introuvable, ignorée.")
             continue
 
-        rows = test_ws.get_all_records()
+        if store is not None:
+            # le stock local ne relit le sheet que s'il a changé, et on ne lit que note/site
+            ensure_fresh(store, sheet_id, test_ws, logger=logger)
+            rows = pd.DataFrame(store.column_values(sheet_id, ["note", "site"]), columns=["note", "site"])
+        else:
+            rows = read_summary_columns(test_ws)
 
         means = compute_means(rows)
 
-        sum_ws = get_or_create_summary(sheet_id)
-
-        # Recherche ligne existante
-        data = sum_ws.get_all_records()
-        found_row = None
-
-        for i, r in enumerate(data, start=2):
-            if str(r.get("Ecole", "")).strip().lower() == ecole.strip().lower():
-                found_row = i
-                break
-
-        # Si absente → nouvelle ligne
-        if found_row is None:
-            found_row = len(data) + 2
+        summary = SummaryWriter(sheet_id)
+        for ecole in ecoles:
+            summary.set(ecole, means)
+        summary.flush()
 
-        update_row(sum_ws, found_row, ecole, means)
-
-        logger(f"✅ SOMMAIRE mis à jour pour {ecole}")
-
-    logger("✅ Mise à jour SOMMAIRE — Terminé !")
+        for ecole in ecoles:
+            logger(f"✅ SOMMAIRE mis à jour pour {ecole}")
 
 if __name__ == "__main__":
     run()